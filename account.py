@@ -1,34 +1,59 @@
+from bank.money import Money, ZERO
+from bank.pins import hash_pin, verify_pin
+
+
 class Account:
-    def __init__(self, account_number, pincode, balance=0):
+    # Only a salted hash of the PIN is kept. Pass pin_hash instead of pincode
+    # to restore a stored account, or to share one hash across bulk test data.
+    # __slots__ keeps each instance free of a per-object __dict__; for
+    # millions of accounts see bank.account_table.AccountTable.
+    __slots__ = ("account_number", "pin_hash", "balance", "locked", "locked_at",
+                 "failed_attempts", "failed_at", "frozen")
+
+    def __init__(self, account_number, pincode=None, balance=0, pin_hash=None):
         self.account_number = account_number
-        self.pincode = pincode
-        self.balance = balance
+        self.pin_hash = pin_hash if pincode is None else hash_pin(pincode)
+        self.balance = Money.from_dollars(balance)
         self.locked = False
+        self.locked_at = None  # time.time() of the lockout, for lock decay
         self.failed_attempts = 0
+        self.failed_at = None  # time.time() of the last failed attempt
+        self.frozen = False  # Set by an admin; kept by storage
 
     def get_balance(self):
         return self.balance
 
     def deposit(self, amount):
-        if amount > 0:
+        amount = Money.from_dollars(amount)
+        if amount > ZERO:
             self.balance += amount
             return True
         return False
 
     def withdraw(self, amount):
-        if 0 < amount <= self.balance:
+        amount = Money.from_dollars(amount)
+        if ZERO < amount <= self.balance:
             self.balance -= amount
             return True
         return False
 
+    def check_pin(self, pincode):
+        return self.pin_hash is not None and verify_pin(pincode, self.pin_hash)
+
     def update_pincode(self, new_pincode):
-        self.pincode = new_pincode
+        self.pin_hash = hash_pin(new_pincode)
         return True
 
+
 class User:
+    __slots__ = ("username", "accounts", "registry")
+
     def __init__(self, username):
         self.username = username
         self.accounts = []  # List of Account objects
+        self.registry = None  # AccountRegistry that indexes these accounts, if any
 
     def add_account(self, account):
-        self.accounts.append(account)
\ No newline at end of file
+        if self.registry is not None:
+            self.registry.register(self, account)
+        self.accounts.append(account)
@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from bank.account import Account, User
+from bank.money import Money
+
+# Struct-of-arrays account table for bulk data (millions of accounts): one
+# typed NumPy column per field instead of an Account object per account.
+#
+#   number   S16    account number, ASCII; rows are kept sorted by it
+#   owner    int32  index into table.owners (usernames)
+#   cents    int64  balance
+#   flags    uint8  LOCKED | FROZEN
+#   failed   uint8  failed PIN attempts
+#   pin      S<n>   PIN hash (optional; absent for tables loaded without one)
+#
+# Lockout times are kept only for locked rows, in the locked_at dict, so a
+# lock lifts after Authenticator.lockout_seconds like an Account's does. That
+# is 30 bytes per account before PIN hashes, where an Account object,
+# its Money, its number string and a registry entry take a few hundred.
+# Lookups binary-search the sorted number column. The table is for loading,
+# scanning and batch updates; account(row) builds an ordinary Account when
+# one is needed for the interactive paths, and to_users() builds the whole
+# users dict for tables small enough to hold that way.
+#
+# Binary file layout, like the ledger segments (bank.segments):
+#
+#   MAGIC | records | PIN hashes | footer JSON | footer length (uint64) | MAGIC
+#
+# Records are fixed-width little-endian (RECORD), sorted by number. PIN
+# hashes, when present, are one fixed-width field per record. The footer has
+# the account count, the owner names, the PIN hash width (0 for none) and the
+# lockout times of the locked accounts by number.
+MAGIC = b"BANKACT1"
+NUMBER_WIDTH = 16
+RECORD = np.dtype({
+    "names": ["number", "cents", "owner", "failed", "flags"],
+    "formats": [f"S{NUMBER_WIDTH}", "<i8", "<i4", "u1", "u1"],
+    "offsets": [0, 16, 24, 28, 29],
+    "itemsize": 32,
+})
+LOCKED = 1
+FROZEN = 2
+CSV_CHUNK_ROWS = 1 << 20
+TRUE = frozenset(("1", "true", "t", "yes", "y"))
+FALSE = frozenset(("0", "false", "f", "no", "n", ""))
+
+
+def bool_column(series):
+    # A pandas column of booleans as a NumPy bool array. Text is read as
+    # true/false, yes/no or 1/0 (any case, empty for false); anything else
+    # is a ValueError, where astype(bool) would call every non-empty string
+    # (even "False") true.
+    if series.dtype == bool:
+        return series.to_numpy()
+    text = series.astype(str).str.strip().str.lower()
+    true = text.isin(TRUE).to_numpy()
+    bad = ~(true | text.isin(FALSE).to_numpy())
+    if bad.any():
+        raise ValueError(f"{series.name} must be true or false, not {series[bad].iloc[0]!r}")
+    return true
+
+
+def _sort_order(numbers):
+    # argsort of the number column. Compared as two big-endian uint64 words,
+    # which orders them the same as the bytes but sorts several times faster.
+    words = numbers.view(">u8").reshape(-1, NUMBER_WIDTH // 8)
+    if not words[:, 1].any():  # Numbers of up to 8 characters
+        return np.argsort(words[:, 0], kind="stable")
+    return np.lexsort((words[:, 1], words[:, 0]))
+
+
+class AccountTable:
+    def __init__(self, numbers, owner, owners, cents, flags=None, failed=None, pin=None, locked_at=None):
+        # Columns in any order; they are sorted by account number here.
+        # locked_at: lockout times (epoch seconds, None/NaN where unknown);
+        # a locked row without one is locked from now. Account numbers longer
+        # than NUMBER_WIDTH or repeated are a ValueError.
+        numbers = np.asarray(numbers, dtype="S")
+        if numbers.dtype.itemsize > NUMBER_WIDTH:
+            long = numbers[np.char.str_len(numbers) > NUMBER_WIDTH][0].decode()
+            raise ValueError(f"Account number {long} is longer than {NUMBER_WIDTH} characters.")
+        numbers = numbers.astype(f"S{NUMBER_WIDTH}", copy=False)
+        order = None
+        if len(numbers) > 1 and not (numbers[1:] > numbers[:-1]).all():
+            order = _sort_order(numbers)
+            numbers = numbers[order]
+            repeated = numbers[1:] == numbers[:-1]
+            if repeated.any():
+                raise ValueError(f"Account number {numbers[1:][repeated][0].decode()} already exists.")
+
+        def column(values, dtype):
+            values = np.zeros(len(numbers), dtype=dtype) if values is None else np.asarray(values, dtype=dtype)
+            return values if order is None else values[order]
+        self.numbers = numbers
+        self.owner = column(owner, np.int32)
+        self.owners = list(owners)  # List: owner id -> username
+        self.cents = column(cents, np.int64)
+        self.flags = column(flags, np.uint8)
+        self.failed = column(failed, np.uint8)
+        self.pin = None if pin is None else column(pin, np.asarray(pin).dtype)
+        times = None if locked_at is None else column(locked_at, np.float64)
+        now = time.time()
+        self.locked_at = {  # Dict: row -> time.time() of the lockout, locked rows only
+            row: now if times is None or np.isnan(times[row]) else float(times[row])
+            for row in np.flatnonzero(self.flags & LOCKED).tolist()
+        }
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def nbytes(self):
+        # Bytes held by the columns (owner names not counted)
+        columns = (self.numbers, self.owner, self.cents, self.flags, self.failed, self.pin)
+        return sum(col.nbytes for col in columns if col is not None)
+
+    def find(self, account_number):
+        # Row of the account, or None
+        key = account_number.encode() if isinstance(account_number, str) else account_number
+        row = int(np.searchsorted(self.numbers, key))
+        if row < len(self.numbers) and self.numbers[row] == key:
+            return row
+        return None
+
+    def rows(self, account_numbers):
+        # Rows of many accounts at once; -1 where there is no such account
+        keys = np.asarray(account_numbers, dtype=f"S{NUMBER_WIDTH}")
+        rows = np.searchsorted(self.numbers, keys)
+        found = rows < len(self.numbers)
+        found[found] = self.numbers[rows[found]] == keys[found]
+        return np.where(found, rows, -1)
+
+    def balance(self, row):
+        return Money(int(self.cents[row]))
+
+    def locked(self, row):
+        return bool(self.flags[row] & LOCKED)
+
+    def frozen(self, row):
+        return bool(self.flags[row] & FROZEN)
+
+    def set_flag(self, row, flag, on):
+        if on:
+            if flag & LOCKED and not self.flags[row] & LOCKED:
+                self.locked_at[row] = time.time()
+            self.flags[row] |= flag
+        else:
+            if flag & LOCKED:
+                self.locked_at.pop(row, None)
+            self.flags[row] &= ~np.uint8(flag)
+
+    def credit(self, rows, cents):
+        # Add cents (negative to debit) to each row; a row may appear more than once
+        np.add.at(self.cents, rows, cents)
+
+    def account(self, row):
+        # An Account for one row, for code that works on Account objects
+        pin_hash = None if self.pin is None else self.pin[row].decode() or None
+        acc = Account(self.numbers[row].decode(), balance=self.balance(row), pin_hash=pin_hash)
+        acc.locked = self.locked(row)
+        acc.locked_at = self.locked_at.get(row)
+        acc.frozen = self.frozen(row)
+        acc.failed_attempts = int(self.failed[row])
+        return acc
+
+    def to_users(self):
+        # Dict: username -> User, with an Account per row
+        users = {name: User(name) for name in self.owners}
+        for row in range(len(self)):
+            users[self.owners[self.owner[row]]].add_account(self.account(row))
+        return users
+
+    @classmethod
+    def from_users(cls, users):
+        owners = list(users)
+        accounts = [(i, acc) for i, user in enumerate(users.values()) for acc in user.accounts]
+        pins = [acc.pin_hash or "" for _, acc in accounts]
+        return cls(
+            [acc.account_number for _, acc in accounts],
+            [i for i, _ in accounts],
+            owners,
+            [acc.balance.cents for _, acc in accounts],
+            [(LOCKED if acc.locked else 0) | (FROZEN if acc.frozen else 0) for _, acc in accounts],
+            [min(acc.failed_attempts, 255) for _, acc in accounts],
+            np.array(pins, dtype="S") if any(pins) else None,
+            [acc.locked_at for _, acc in accounts],
+        )
+
+    def save(self, path):
+        records = np.empty(len(self), dtype=RECORD)
+        records["number"], records["owner"], records["cents"] = self.numbers, self.owner, self.cents
+        records["failed"], records["flags"] = self.failed, self.flags
+        pin_width = 0 if self.pin is None else self.pin.dtype.itemsize
+        footer = json.dumps({"accounts": len(self), "owners": self.owners, "pin_width": pin_width,
+                             "locked_at": {self.numbers[row].decode(): when
+                                           for row, when in self.locked_at.items()}}).encode()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            records.tofile(f)
+            if self.pin is not None:
+                self.pin.tofile(f)
+            f.write(footer)
+            f.write(struct.pack("<Q", len(footer)))
+            f.write(MAGIC)
+        os.replace(tmp, path)
+
+
+def load_binary(path):
+    # AccountTable from a file written by AccountTable.save()
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an account table file")
+        f.seek(-(8 + len(MAGIC)), os.SEEK_END)
+        size, = struct.unpack("<Q", f.read(8))
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is truncated")
+        f.seek(-(8 + len(MAGIC) + size), os.SEEK_END)
+        footer = json.loads(f.read(size))
+        count, width = footer["accounts"], footer["pin_width"]
+        f.seek(len(MAGIC))
+        records = np.fromfile(f, dtype=RECORD, count=count)
+        pin = np.fromfile(f, dtype=f"S{width}", count=count) if width else None
+    table = AccountTable.__new__(AccountTable)  # Records are stored sorted: no need to sort again
+    table.numbers = records["number"].copy()
+    table.owner = records["owner"].copy()
+    table.owners = footer["owners"]
+    table.cents = records["cents"].copy()
+    table.flags = records["flags"].copy()
+    table.failed = records["failed"].copy()
+    table.pin = pin
+    # Files from before lockout times were kept: locked from now
+    times = footer.get("locked_at", {})
+    now = time.time()
+    table.locked_at = {}
+    for row in np.flatnonzero(table.flags & LOCKED).tolist():
+        table.locked_at[row] = times.get(table.numbers[row].decode(), now)
+    return table
+
+
+def load_csv(path, chunk_rows=CSV_CHUNK_ROWS):
+    # AccountTable from a CSV with a header row and the columns
+    # account_number, user, balance (dollars, e.g. 12.30), and optionally
+    # pin_hash, locked, frozen (true/false, yes/no or 1/0), locked_at (epoch
+    # seconds) and failed_attempts. Read chunk_rows rows at a time, so only
+    # one chunk is ever held as Python strings.
+    import pandas as pd
+
+    parts = {name: [] for name in ("numbers", "owner", "cents", "flags", "failed", "pin", "locked_at", "names")}
+    for frame in pd.read_csv(path, dtype={"account_number": str, "user": str, "pin_hash": str},
+                             keep_default_na=False, chunksize=chunk_rows):
+        missing = {"account_number", "user", "balance"} - set(frame.columns)
+        if missing:
+            raise ValueError(f"{path} has no {', '.join(sorted(missing))} column")
+        numbers = frame["account_number"].to_numpy(dtype="S")
+        if numbers.dtype.itemsize > NUMBER_WIDTH:
+            raise ValueError(f"Account numbers in {path} are longer than {NUMBER_WIDTH} characters")
+        parts["numbers"].append(numbers.astype(f"S{NUMBER_WIDTH}"))
+        # Owners are numbered per chunk here and across chunks below
+        codes, names = pd.factorize(frame["user"])
+        parts["owner"].append(codes.astype(np.int32) + sum(len(chunk) for chunk in parts["names"]))
+        parts["names"].append(names.to_numpy())
+        # Two-decimal amounts are exact after rounding the float back to cents
+        parts["cents"].append(np.rint(frame["balance"].to_numpy(dtype=np.float64) * 100).astype(np.int64))
+        flags = np.zeros(len(frame), dtype=np.uint8)
+        for name, flag in (("locked", LOCKED), ("frozen", FROZEN)):
+            if name in frame:
+                flags |= np.where(bool_column(frame[name]), flag, 0).astype(np.uint8)
+        parts["flags"].append(flags)
+        if "locked_at" in frame:
+            parts["locked_at"].append(pd.to_numeric(frame["locked_at"].replace("", np.nan)).to_numpy(np.float64))
+        if "failed_attempts" in frame:
+            parts["failed"].append(frame["failed_attempts"].to_numpy(dtype=np.uint8))
+        if "pin_hash" in frame:
+            parts["pin"].append(frame["pin_hash"].to_numpy(dtype="S"))
+    if not parts["numbers"]:
+        return AccountTable([], [], [], [])
+    columns = {name: np.concatenate(chunks) if chunks else None for name, chunks in parts.items()}
+    ids, owners = pd.factorize(columns.pop("names"))
+    return AccountTable(columns["numbers"], ids.astype(np.int32)[columns["owner"]], owners.tolist(),
+                        columns["cents"], columns["flags"], columns["failed"], columns["pin"],
+                        columns["locked_at"])
+
+
+def load(path):
+    # load_binary() or load_csv(), by the file's first bytes
+    with open(path, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return load_binary(path) if binary else load_csv(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an accounts CSV to the binary account table format")
+    parser.add_argument("source", help="accounts CSV (or a table file)")
+    parser.add_argument("target", help="table file to write")
+    args = parser.parse_args()
+    began = time.perf_counter()
+    table = load(args.source)
+    loaded = time.perf_counter()
+    table.save(args.target)
+    print(f"{len(table):,} accounts loaded in {loaded - began:.2f} s, written in "
+          f"{time.perf_counter() - loaded:.2f} s ({table.nbytes() / max(len(table), 1):.1f} bytes per account)")
+
+
+if __name__ == "__main__":
+    main()
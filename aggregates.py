@@ -0,0 +1,202 @@
+from bisect import bisect_right
+from contextlib import nullcontext
+import datetime
+import threading
+
+from bank.money import Money
+from bank.txtypes import DEPOSIT, WITHDRAWAL, for_code
+
+# Balance histogram bins (dollars) and labels, shared with the reports
+balance_bins = [0, 1, 5, 10, 50, 100, float('inf')]
+balance_labels = ['0-0.99', '1-4.99', '5-9.99', '10-49.99', '50-99.99', '>100']
+_EDGES = [int(edge * 100) for edge in balance_bins[1:-1]]  # Cents; a balance on an edge is in the upper bin
+
+# Slots of a totals list: cents per kind of movement, then the row count
+TOTALS = ("deposits", "withdrawals", "transfers_in", "transfers_out", "transactions")
+DEPOSITS, WITHDRAWALS, TRANSFERS_IN, TRANSFERS_OUT, TRANSACTIONS = range(len(TOTALS))
+_DAY_MICROS = 86400 * 10 ** 6
+
+
+def slot(tx_type):
+    # Totals slot a ledger row's amount counts towards (None: count only)
+    if tx_type is DEPOSIT:
+        return DEPOSITS
+    if tx_type is WITHDRAWAL:
+        return WITHDRAWALS
+    if tx_type.tx_class == 2:  # Transfer
+        return TRANSFERS_IN if tx_type.sign > 0 else TRANSFERS_OUT
+    return None
+
+
+def bucket(cents):
+    return bisect_right(_EDGES, cents)
+
+
+class Aggregates:
+    # Totals kept current by every change instead of recomputed by scanning
+    # accounts or the ledger: per account and per day (deposits,
+    # withdrawals, transfers in and out, in cents, and the number of ledger
+    # rows), the money supply and the number of accounts per balance bin.
+    # Writers report what they did with record() while they still hold the
+    # account locks; rebuild() recomputes everything from the ledger and the
+    # balances, and check() compares the two.
+    def __init__(self):
+        self.accounts = {}  # Dict: account_number -> totals list (see TOTALS)
+        self.days = {}  # Dict: day number (days since 1970-01-01) -> totals list
+        self.money_supply = 0  # Cents, all balances together
+        self.account_count = 0
+        self.transactions = 0  # Ledger rows
+        self.balance_counts = [0] * len(balance_labels)
+        self._lock = threading.Lock()
+
+    def _move(self, old, new):
+        self.money_supply += new - old
+        a, b = bucket(old), bucket(new)
+        if a != b:
+            self.balance_counts[a] -= 1
+            self.balance_counts[b] += 1
+
+    def add_account(self, cents):
+        with self._lock:
+            self.account_count += 1
+            self.money_supply += cents
+            self.balance_counts[bucket(cents)] += 1
+
+    def record(self, rows=(), ts=None, moves=()):
+        # rows: (account_number, tx_type, cents) ledger rows written at ts
+        # (epoch microseconds); moves: (old cents, new cents) per balance changed
+        with self._lock:
+            if rows:
+                day = self.days.get(ts // _DAY_MICROS)
+                if day is None:
+                    day = self.days[ts // _DAY_MICROS] = [0] * len(TOTALS)
+                for number, tx_type, cents in rows:
+                    totals = self.accounts.get(number)
+                    if totals is None:
+                        totals = self.accounts[number] = [0] * len(TOTALS)
+                    i = slot(tx_type)
+                    if i is not None:
+                        totals[i] += cents
+                        day[i] += cents
+                    totals[TRANSACTIONS] += 1
+                    day[TRANSACTIONS] += 1
+                self.transactions += len(rows)
+            for old, new in moves:
+                self._move(old, new)
+
+    def record_totals(self, totals_by_account, ts, moves=()):
+        # Bulk form of record(): per-account totals lists already summed by
+        # the caller, all dated ts
+        with self._lock:
+            day = self.days.setdefault(ts // _DAY_MICROS, [0] * len(TOTALS))
+            for number, added in totals_by_account:
+                totals = self.accounts.setdefault(number, [0] * len(TOTALS))
+                for i, value in enumerate(added):
+                    totals[i] += value
+                    day[i] += value
+                self.transactions += added[TRANSACTIONS]
+            for old, new in moves:
+                self._move(old, new)
+
+    def rebuild(self, ledger, accounts):
+        # Recompute everything from the ledger rows and current balances
+        fresh = _compute(ledger, [account.balance.cents for account in accounts])
+        with self._lock:
+            self.accounts, self.days = fresh.accounts, fresh.days
+            self.money_supply, self.account_count = fresh.money_supply, fresh.account_count
+            self.transactions = fresh.transactions
+            self.balance_counts = fresh.balance_counts
+
+    def check(self, ledger, accounts, engine=None):
+        # Differences between the running totals and a rebuild, as messages
+        # (empty when they agree). Writers record while holding their
+        # account locks, so with the engine given the check takes every
+        # account's lock and the ledger's just long enough to note the
+        # ledger length, the balances and a copy of the totals; the rebuild
+        # from those ledger rows then runs with writes going on again.
+        accounts = list(accounts)
+        with engine.locked(*accounts) if engine is not None else nullcontext(), ledger.locked():
+            rows = len(ledger)
+            balances = [account.balance.cents for account in accounts]
+            with self._lock:
+                kept = self._copy()
+        return kept._differences(_compute(ledger, balances, rows))
+
+    def _copy(self):
+        copy = Aggregates()
+        copy.accounts = {number: list(totals) for number, totals in self.accounts.items()}
+        copy.days = {day: list(totals) for day, totals in self.days.items()}
+        copy.money_supply, copy.account_count = self.money_supply, self.account_count
+        copy.transactions = self.transactions
+        copy.balance_counts = list(self.balance_counts)
+        return copy
+
+    def _differences(self, fresh):
+        problems = []
+        if self.money_supply != fresh.money_supply:
+            problems.append(f"Money supply is {Money(self.money_supply)}, balances add up to "
+                            f"{Money(fresh.money_supply)}.")
+        if self.transactions != fresh.transactions:
+            problems.append(f"Transaction count is {self.transactions}, the ledger has {fresh.transactions}.")
+        if self.account_count != fresh.account_count:
+            problems.append(f"Account count is {self.account_count}, found {fresh.account_count}.")
+        if self.balance_counts != fresh.balance_counts:
+            problems.append(f"Balance bins are {self.balance_counts}, found {fresh.balance_counts}.")
+        for name, kept, found in (("Account", self.accounts, fresh.accounts),
+                                  ("Day", self.days, fresh.days)):
+            for key in sorted(set(kept) | set(found), key=str):
+                if kept.get(key, [0] * len(TOTALS)) != found.get(key, [0] * len(TOTALS)):
+                    label = datetime.date(1970, 1, 1) + datetime.timedelta(days=key) if name == "Day" else key
+                    problems.append(f"{name} {label}: totals are {kept.get(key)}, ledger has {found.get(key)}.")
+        return problems
+
+    def account_totals(self, account_number):
+        return dict(zip(TOTALS, self.accounts.get(account_number, [0] * len(TOTALS))))
+
+    def day_totals(self, date):
+        day = (date - datetime.date(1970, 1, 1)).days
+        return dict(zip(TOTALS, self.days.get(day, [0] * len(TOTALS))))
+
+    def summary(self):
+        with self._lock:
+            return {
+                "accounts": self.account_count,
+                "money_supply": Money(self.money_supply),
+                "balance_counts": dict(zip(balance_labels, self.balance_counts)),
+                "transactions": self.transactions,
+            }
+
+
+def _compute(ledger, balances, rows=None):
+    # Aggregates computed from scratch, from balances in cents and the first
+    # `rows` ledger rows (all of them if None)
+    fresh = Aggregates()
+    for cents in balances:
+        fresh.account_count += 1
+        fresh.money_supply += cents
+        fresh.balance_counts[bucket(cents)] += 1
+    rows = len(ledger) if rows is None else rows
+    fresh.transactions = rows
+    if not rows:
+        return fresh
+    import numpy as np
+    width = len(TOTALS)
+    for cols, accounts, _ in ledger.chunks(0, rows):
+        codes = cols["type"]
+        if not len(codes):
+            continue
+        slots = np.array([TRANSACTIONS] + [TRANSACTIONS if slot(for_code(code)) is None else slot(for_code(code))
+                                           for code in range(1, int(codes.max()) + 1)], dtype=np.int64)[codes]
+        cents = np.where(slots == TRANSACTIONS, 0, cols["cents"])
+        for keys, target, names in ((cols["account"], fresh.accounts, accounts),
+                                    (cols["ts"] // _DAY_MICROS, fresh.days, None)):
+            ids, inverse = np.unique(keys, return_inverse=True)
+            sums = np.zeros(len(ids) * width, dtype=np.int64)  # Summed as integers: float weights round past 2**53
+            np.add.at(sums, inverse * width + slots, cents)
+            sums = sums.reshape(len(ids), width)
+            sums[:, TRANSACTIONS] = np.bincount(inverse, minlength=len(ids))
+            for key, totals in zip(ids.tolist(), sums.tolist()):
+                key = names[key] if names is not None else key
+                seen = target.get(key)
+                target[key] = totals if seen is None else [a + b for a, b in zip(seen, totals)]
+    return fresh
@@ -0,0 +1,46 @@
+import threading
+
+FIELDS = ("account_number", "user", "datetime")
+
+
+class AuditLog:
+    # The PIN-change history, stored as one list per field instead of a dict
+    # per entry. Reads hand out entries as dicts built on the spot, like
+    # Ledger.entry(), so callers use it like the list of dicts it replaces.
+    # Keys other than FIELDS (the old_pin/new_pin of older data) are dropped
+    # on the way in.
+    def __init__(self, entries=()):
+        self.columns = tuple([] for _ in FIELDS)  # account numbers, users, datetimes
+        self._lock = threading.Lock()  # Keeps the three lists the same length
+        self.extend(entries)
+
+    def append(self, entry):
+        with self._lock:
+            for column, name in zip(self.columns, FIELDS):
+                column.append(entry[name])
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def extend_columns(self, account_numbers, users, datetimes):
+        # Bulk append of three equally long lists, without building entries
+        if not len(account_numbers) == len(users) == len(datetimes):
+            raise ValueError("Audit columns differ in length.")
+        with self._lock:
+            for column, values in zip(self.columns, (account_numbers, users, datetimes)):
+                column.extend(values)
+
+    def clear(self):
+        with self._lock:
+            for column in self.columns:
+                column.clear()
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, index):
+        return {name: column[index] for name, column in zip(FIELDS, self.columns)}
+
+    def __iter__(self):
+        return (dict(zip(FIELDS, values)) for values in zip(*self.columns))
@@ -1,20 +1,205 @@
+from collections import OrderedDict
+from contextlib import nullcontext
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+from bank import metrics
+from bank.registry import build_registry
+
+MAX_ATTEMPTS = 3
+
+
+class RateLimiter:
+    # Token bucket per key: `capacity` attempts at once, refilled at `rate`
+    # per second. Keys are kept in least-recently-used order and the oldest
+    # are dropped past `max_keys`; a dropped key simply starts full again.
+    def __init__(self, capacity, rate, max_keys=100000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, time of last refill]
+        self.refused = 0  # Attempts allow() turned down
+        self._lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                self.refused += 1
+                return False
+            bucket[0] -= 1
+            return True
+
+    def retry_after(self, key, now=None):
+        # Seconds until `key` has an attempt available again
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0.0
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        return max(0.0, (1 - tokens) / self.rate)
+
+
+class VerificationCache:
+    # Bounded LRU of recently verified (account, PIN) pairs, so a client that
+    # logs in again, or re-enters its PIN, skips the slow hash. Keys are an
+    # HMAC of the pair under a per-process secret, never the PIN itself, and
+    # an entry only counts while the account still has the PIN hash it was
+    # verified against, so a PIN change invalidates it.
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()  # key -> (pin_hash, expiry time)
+        self._lock = threading.Lock()
+
+    def _key(self, account_number, pincode):
+        return hmac.new(self._secret, f"{account_number}\0{pincode}".encode(), hashlib.sha256).digest()
+
+    def get(self, account, pincode, now):
+        key = self._key(account.account_number, pincode)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == account.pin_hash and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False
+
+    def put(self, account, pincode, now):
+        key = self._key(account.account_number, pincode)
+        with self._lock:
+            self._entries[key] = (account.pin_hash, now + self.ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class Authenticator:
-    def __init__(self, users):
+    # PIN checks against the accounts' salted hashes, with
+    #   - a token bucket per account and per source (client address, or
+    #     "console" for the CLI), so guessing is slow even across accounts;
+    #   - lockouts after MAX_ATTEMPTS failures that lift after
+    #     `lockout_seconds`, and failures older than `failure_window` forgotten;
+    #   - a VerificationCache (cache=None disables it).
+    # Pass account_limiter/source_limiter=None to switch a limiter off. With
+    # an `engine`, an account's lockout state is read and changed under its
+    # account lock, so concurrent logins cannot lose a failure or a lockout.
+    _DEFAULT = object()
+
+    def __init__(self, users, registry=None, lockout_seconds=900, failure_window=900,
+                 account_limiter=_DEFAULT, source_limiter=_DEFAULT, cache=_DEFAULT, engine=None):
         self.users = users  # Dict: username -> User
+        self.registry = registry if registry is not None else build_registry(users)
+        self.engine = engine  # TransactionEngine whose account locks guard the lockout state
+        self.lockout_seconds = lockout_seconds
+        self.failure_window = failure_window
+        self.account_limiter = RateLimiter(5, 5 / 60) if account_limiter is self._DEFAULT else account_limiter
+        self.source_limiter = RateLimiter(30, 1) if source_limiter is self._DEFAULT else source_limiter
+        self.cache = VerificationCache() if cache is self._DEFAULT else cache
+        self.lockouts = 0
+        self.failed_logins = 0  # Wrong PINs, including the ones that caused a lockout
+        self._counts_lock = threading.Lock()  # Guards lockouts and failed_logins across accounts
+
+    @property
+    def rate_limited(self):
+        # Attempts refused by either limiter, counted under the limiters' locks
+        return sum(limiter.refused for limiter in (self.account_limiter, self.source_limiter)
+                   if limiter is not None)
+
+    @metrics.timed("verify_pin")
+    def verify_pin(self, account, pincode, now=None):
+        now = time.time() if now is None else now
+        if self.cache is not None and self.cache.get(account, pincode, now):
+            return True
+        if account.check_pin(pincode):
+            if self.cache is not None:
+                self.cache.put(account, pincode, now)
+            return True
+        return False
+
+    def _throttled(self, limiter, key, now):
+        if limiter is None or limiter.allow(key, now):
+            return None
+        return f"Too many login attempts. Try again in {limiter.retry_after(key, now):.0f} seconds."
+
+    def throttle(self, source, now=None):
+        # Spend one of the source's login attempts on some other secret check
+        # (the server's admin token); the refusal message, or None
+        return self._throttled(self.source_limiter, source, time.time() if now is None else now)
+
+    @metrics.timed("login")
+    def login(self, account_number, pincode, source="console", now=None):
+        now = time.time() if now is None else now
+        msg = self._throttled(self.source_limiter, source, now)
+        if msg:
+            return None, msg
+        user, account = self.registry.lookup(account_number)
+        if account is None:
+            return None, "Account not found."
+        with self._locked(account):
+            if self._still_locked(account, now):
+                return None, "Account is locked due to too many failed attempts."
+        msg = self._throttled(self.account_limiter, account_number, now)
+        if msg:
+            return None, msg
+        # The hash is checked without the account lock, so a login does not
+        # hold up the account's transactions; the outcome is applied under it
+        verified = self.verify_pin(account, pincode, now)
+        with self._locked(account):
+            if self._still_locked(account, now):
+                return None, "Account is locked due to too many failed attempts."  # By a concurrent login
+            if verified:
+                account.failed_attempts = 0
+                account.failed_at = None
+                return user, None
+            if account.failed_at is not None and now - account.failed_at >= self.failure_window:
+                account.failed_attempts = 0
+            account.failed_attempts += 1
+            account.failed_at = now
+            locked = account.failed_attempts >= MAX_ATTEMPTS
+            if locked:
+                account.locked = True
+                account.locked_at = now
+            attempts = account.failed_attempts
+        with self._counts_lock:
+            self.failed_logins += 1
+            self.lockouts += locked
+        if locked:
+            return None, f"Account locked after {MAX_ATTEMPTS} failed attempts."
+        return None, f"Incorrect pincode. Attempt {attempts}/{MAX_ATTEMPTS}."
+
+    def _locked(self, account):
+        return self.engine.locked(account) if self.engine is not None else nullcontext()
 
-    def login(self, account_number, pincode):
-        for user in self.users.values():
-            for account in user.accounts:
-                if account.account_number == account_number:
-                    if account.locked:
-                        return None, "Account is locked due to too many failed attempts."
-                    if account.pincode == pincode:
-                        account.failed_attempts = 0
-                        return user, None
-                    else:
-                        account.failed_attempts += 1
-                        if account.failed_attempts >= 3:
-                            account.locked = True
-                            return None, "Account locked after 3 failed attempts."
-                        return None, f"Incorrect pincode. Attempt {account.failed_attempts}/3."
-        return None, "Account not found."
\ No newline at end of file
+    def _still_locked(self, account, now):
+        # Whether a lockout holds; one older than lockout_seconds is lifted
+        if not account.locked:
+            return False
+        if account.locked_at is not None and now - account.locked_at >= self.lockout_seconds:
+            account.locked = False
+            account.locked_at = None
+            account.failed_attempts = 0
+            return False
+        return True
@@ -0,0 +1,261 @@
+import argparse
+import csv
+import datetime
+import json
+import sys
+
+import numpy as np
+
+from bank import main as bank
+from bank import metrics
+from bank.aggregates import TOTALS, TRANSFERS_IN, TRANSFERS_OUT, TRANSACTIONS
+from bank.columnar import to_micros
+from bank.money import Money, MIN_BALANCE
+from bank.service import Receipt
+from bank.txtypes import TRANSFER_OWN_OUT, TRANSFER_OWN_IN, TRANSFER_OUT, TRANSFER_IN
+
+# Reasons a row can be rejected, by code
+REASONS = {
+    1: "Unknown FROM account.",
+    2: "Unknown TO account.",
+    3: "Cannot transfer to the same account.",
+    4: "Amount must be positive.",
+    5: "Amount must be in valid denominations or multiples of 0.05.",
+    6: "Insufficient funds. Minimum balance of $0.05 must remain.",
+    7: "Batch rejected: another row is invalid.",
+    8: "Malformed row: expected from, to and amount.",
+    9: "Invalid amount.",
+}
+JOURNAL_ROWS = 1024  # Transfers per journal record
+
+
+class BatchResult:
+    def __init__(self, applied, reasons, lines=None):
+        self.applied = applied  # Bool array, one entry per row
+        self.reasons = reasons  # Int8 array of REASONS codes, 0 where applied
+        self.lines = lines  # Int array: each row's line in the file, if read from one
+
+    @property
+    def applied_count(self):
+        return int(self.applied.sum())
+
+    def rejected(self):
+        # (row index, line, reason code, message) for every rejected row;
+        # line is None for rows that did not come from a file
+        return [(int(i), None if self.lines is None else int(self.lines[i]), int(self.reasons[i]),
+                 REASONS[int(self.reasons[i])]) for i in np.flatnonzero(~self.applied)]
+
+
+def read_transfers(path):
+    # CSV with from,to,amount columns (header optional) or JSONL objects with
+    # "from", "to" and "amount". Amounts are parsed exactly into cents.
+    # Returns (from numbers, to numbers, cents, lines, errors): a row that
+    # cannot be read is kept, with REASONS code 8 or 9 in errors (0 for the
+    # rest), so it is reported with its line number instead of stopping the
+    # file.
+    from_numbers, to_numbers, cents, lines, errors = [], [], [], [], []
+    parse = Money.parse
+
+    def add(line, source, target, amount):
+        try:
+            cents.append(parse(str(amount)).cents)
+            errors.append(0)
+        except ValueError:
+            cents.append(0)
+            errors.append(9)
+        from_numbers.append(str(source).strip())
+        to_numbers.append(str(target).strip())
+        lines.append(line)
+
+    def malformed(line):
+        from_numbers.append("")
+        to_numbers.append("")
+        cents.append(0)
+        lines.append(line)
+        errors.append(8)
+
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    try:
+                        row = json.loads(text)
+                        source, target, amount = row["from"], row["to"], row["amount"]
+                    except (ValueError, KeyError, TypeError):
+                        malformed(line)
+                    else:
+                        add(line, source, target, amount)
+        else:
+            reader = csv.reader(f)
+            for row in reader:
+                line = reader.line_num
+                if line == 1 and row and row[0].strip().lower() == "from":
+                    continue
+                if not row:
+                    continue
+                if len(row) < 3:
+                    malformed(line)
+                else:
+                    add(line, row[0], row[1], row[2])
+    return (from_numbers, to_numbers, np.array(cents, dtype=np.int64), np.array(lines, dtype=np.int64),
+            np.array(errors, dtype=np.int8))
+
+
+def _net(index, cents, size):
+    # Per-slot sums of cents, exact in int64
+    totals = np.zeros(size, dtype=np.int64)
+    np.add.at(totals, index, cents)
+    return totals
+
+
+@metrics.timed("batch_transfer")
+def apply_transfers(from_numbers, to_numbers, cents, lines=None, errors=None, atomic=True, service=None):
+    # atomic=True applies every row or none; otherwise rows are applied in
+    # order and each one that would break the minimum balance is skipped.
+    # lines and errors are what read_transfers() returns: rows with an
+    # error code are rejected with it. Goes through `service` (default
+    # bank.service) for its locks, ledger, running totals, journal and
+    # notifier, like the single transfers do.
+    service = service or bank.service
+    registry = service.registry
+    cents = np.asarray(cents, dtype=np.int64)
+    n = len(cents)
+
+    # Intern the accounts the batch touches
+    slots = {}
+    accounts, owners = [], []
+
+    def slot(number):
+        index = slots.get(number)
+        if index is None:
+            user, account = registry.lookup(number)
+            if account is None:
+                return -1
+            index = slots[number] = len(accounts)
+            accounts.append(account)
+            owners.append(user)
+        return index
+
+    src = np.fromiter((slot(number) for number in from_numbers), dtype=np.int64, count=n)
+    dst = np.fromiter((slot(number) for number in to_numbers), dtype=np.int64, count=n)
+
+    # Rules that do not depend on balances, checked for all rows at once
+    errors = np.zeros(n, dtype=np.int8) if errors is None else np.asarray(errors, dtype=np.int8)
+    reasons = np.select(
+        [errors != 0, src < 0, dst < 0, src == dst, cents <= 0, cents % 5 != 0],
+        [errors, 1, 2, 3, 4, 5], 0
+    ).astype(np.int8)
+    valid = reasons == 0
+    min_balance = MIN_BALANCE.cents
+
+    with service.engine.locked(*accounts):
+        balances = np.fromiter((acc.balance.cents for acc in accounts), dtype=np.int64,
+                               count=len(accounts))
+        if atomic:
+            if valid.all():
+                final = balances + _net(dst, cents, len(accounts)) - _net(src, cents, len(accounts))
+                senders = np.unique(src)
+                short = senders[final[senders] < min_balance]
+                if len(short):
+                    reasons[np.isin(src, short)] = 6
+            if reasons.any():
+                reasons[reasons == 0] = 7
+                return BatchResult(np.zeros(n, dtype=bool), reasons, lines)
+            applied = valid
+        else:
+            # Balance checks depend on row order, so walk the valid rows
+            applied = valid.copy()
+            running = balances.tolist()
+            for i, s, d, c in zip(np.flatnonzero(valid).tolist(), src[valid].tolist(),
+                                  dst[valid].tolist(), cents[valid].tolist()):
+                if running[s] - c < min_balance:
+                    applied[i] = False
+                    reasons[i] = 6
+                else:
+                    running[s] -= c
+                    running[d] += c
+            final = np.array(running, dtype=np.int64)
+
+        changed = np.flatnonzero(final != balances)
+        for index in changed.tolist():
+            accounts[index].balance = Money(int(final[index]))
+        rows = np.flatnonzero(applied)
+        if not len(rows):
+            return BatchResult(applied, reasons, lines)
+        now = datetime.datetime.now()
+        ts = to_micros(now)
+        numbers = [acc.account_number for acc in accounts]
+        names = [owner.username for owner in owners]
+        ledger_rows = []
+        for s, d, c in zip(src[rows].tolist(), dst[rows].tolist(), cents[rows].tolist()):
+            own = owners[s] is owners[d]
+            ledger_rows.append((numbers[s], names[s], ts,
+                                TRANSFER_OWN_OUT if own else TRANSFER_OUT, c))
+            ledger_rows.append((numbers[d], names[d], ts,
+                                TRANSFER_OWN_IN if own else TRANSFER_IN, c))
+        first = service.ledger.extend_micros(ledger_rows)
+        if service.aggregates is not None:
+            # Running totals: per-account sums of the applied rows, in one update
+            sent = _net(src[rows], cents[rows], len(accounts))
+            received = _net(dst[rows], cents[rows], len(accounts))
+            moved = (np.bincount(src[rows], minlength=len(accounts))
+                     + np.bincount(dst[rows], minlength=len(accounts)))
+            totals = []
+            for index in np.flatnonzero(moved).tolist():
+                added = [0] * len(TOTALS)
+                added[TRANSFERS_IN] = int(received[index])
+                added[TRANSFERS_OUT] = int(sent[index])
+                added[TRANSACTIONS] = int(moved[index])
+                totals.append((numbers[index], added))
+            service.aggregates.record_totals(totals, ts, zip(balances[changed].tolist(),
+                                                             final[changed].tolist()))
+        if service.storage:
+            # One record per JOURNAL_ROWS transfers, each with the balances
+            # as of its last row, so no record grows with the batch
+            running = balances.copy()
+            for start in range(0, len(rows), JOURNAL_ROWS):
+                part = rows[start:start + JOURNAL_ROWS]
+                running += _net(dst[part], cents[part], len(accounts)) - _net(src[part], cents[part], len(accounts))
+                touched = np.unique(np.concatenate((src[part], dst[part]))).tolist()
+                service.storage.record_transaction(
+                    [accounts[i] for i in touched],
+                    range(first + 2 * start, first + 2 * (start + len(part))),
+                    balances=running[touched].tolist())
+    if service.notifier is not None:
+        # The notification each transfer would have sent on its own
+        running = balances.tolist()
+        for s, d, c in zip(src[rows].tolist(), dst[rows].tolist(), cents[rows].tolist()):
+            running[s] -= c
+            running[d] += c
+            service.notifier.submit(str(Receipt("transfer", names[s], numbers[s], Money(c), Money(running[s]), now,
+                                                names[d], numbers[d], Money(running[d]))))
+    return BatchResult(applied, reasons, lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a file of transfers (from,to,amount)")
+    parser.add_argument("path", help="CSV (from,to,amount) or .jsonl file")
+    parser.add_argument("--mode", choices=("atomic", "per-row"), default="atomic")
+    parser.add_argument("--rejects", help="write rejected rows (row,line,code,reason) to this CSV file")
+    args = parser.parse_args()
+    bank.open_storage()
+    try:
+        result = apply_transfers(*read_transfers(args.path), atomic=args.mode == "atomic")
+    finally:
+        if bank.storage:
+            bank.storage.close()
+        if bank.notifier:
+            bank.notifier.close()
+    rejected = result.rejected()
+    print(f"Applied {result.applied_count} transfers, rejected {len(rejected)}.")
+    if rejected and args.rejects:
+        with open(args.rejects, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "line", "code", "reason"])
+            writer.writerows(rejected)
+    if rejected and args.mode == "atomic":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
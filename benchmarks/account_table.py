@@ -0,0 +1,123 @@
+# Memory per account and bulk load time for the compact account model.
+#
+# Memory: --objects accounts built as Account objects without __slots__ (a
+# copy of the class as it was, with a __dict__ per instance), as the current
+# slotted Account, and as an AccountTable, measured with tracemalloc
+# (objects, their Money, their number strings and the list holding them).
+#
+# Load time: --accounts rows are written to a CSV in random account order,
+# loaded into an AccountTable (parse, intern owners, sort), saved in the
+# binary format and loaded back. A sample of rows is checked against the
+# generated data after each load.
+#
+#   python -m bank.benchmarks.account_table --accounts 10000000
+import argparse
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from bank.account import Account
+from bank.account_table import AccountTable, load_binary, load_csv
+from bank.money import Money
+
+
+class DictAccount:
+    # Account before __slots__: the same attributes, kept in a __dict__
+    def __init__(self, account_number, balance, pin_hash):
+        self.account_number = account_number
+        self.pin_hash = pin_hash
+        self.balance = Money(balance)
+        self.locked = False
+        self.locked_at = None
+        self.failed_attempts = 0
+        self.failed_at = None
+        self.frozen = False
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def memory(count):
+    numbers = [10 ** 9 + i for i in range(count)]  # Made into strings by each build, so those count too
+    cents = [(i * 7919) % 1000000 for i in range(count)]
+    rows = list(zip(numbers, cents))
+    print(f"memory, {count:,} accounts (no PIN hashes)")
+    for name, build in (
+            ("Account with __dict__", lambda: [DictAccount(str(n), c, None) for n, c in rows]),
+            ("Account with __slots__", lambda: [Account(str(n), balance=Money(c)) for n, c in rows]),
+            ("AccountTable", lambda: AccountTable([str(n) for n in numbers], np.zeros(count), ["user"], cents))):
+        used = measure(build)
+        print(f"  {name:<24} {used / count:>8.1f} bytes per account")
+
+
+def check(table, numbers, owners, cents, sample):
+    rows = table.rows(numbers[sample].astype(str))
+    assert (rows >= 0).all(), "accounts missing after load"
+    assert (table.cents[rows] == cents[sample]).all(), "balances differ after load"
+    names = [table.owners[i] for i in table.owner[rows]]
+    assert names == [f"user{owner}" for owner in owners[sample]], "owners differ after load"
+
+
+def loading(count, users, seed):
+    rng = np.random.default_rng(seed)
+    numbers = 10 ** 9 + rng.permutation(count)
+    owners = rng.integers(0, users, count)
+    cents = rng.integers(5, 10 ** 7, count)
+    directory = tempfile.mkdtemp()
+    csv_path, table_path = os.path.join(directory, "accounts.csv"), os.path.join(directory, "accounts.bin")
+    began = time.perf_counter()
+    step = 1 << 20  # Written a slice at a time so the generator does not set the peak RSS
+    for start in range(0, count, step):
+        part = slice(start, start + step)
+        pd.DataFrame({"account_number": numbers[part], "user": np.char.add("user", owners[part].astype(str)),
+                      "balance": cents[part] / 100}).to_csv(csv_path, mode="a", header=start == 0, index=False,
+                                                            float_format="%.2f")
+    print(f"load, {count:,} accounts of {users:,} users")
+    print(f"  CSV written in {time.perf_counter() - began:.1f} s, {os.path.getsize(csv_path) / 1e6:,.0f} MB")
+    sample = rng.integers(0, count, 10000)
+
+    began = time.perf_counter()
+    table = load_csv(csv_path)
+    print(f"  {'CSV -> AccountTable':<24} {time.perf_counter() - began:>7.2f} s")
+    check(table, numbers, owners, cents, sample)
+    began = time.perf_counter()
+    table.save(table_path)
+    print(f"  {'AccountTable -> binary':<24} {time.perf_counter() - began:>7.2f} s, "
+          f"{os.path.getsize(table_path) / 1e6:,.0f} MB")
+    del table
+    began = time.perf_counter()
+    table = load_binary(table_path)
+    print(f"  {'binary -> AccountTable':<24} {time.perf_counter() - began:>7.2f} s")
+    check(table, numbers, owners, cents, sample)
+    print(f"  table columns: {table.nbytes() / len(table):.1f} bytes per account, "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB")
+    os.remove(csv_path)
+    os.remove(table_path)
+    os.rmdir(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per account and bulk load time of AccountTable")
+    parser.add_argument("--objects", type=int, default=500000, help="accounts for the memory comparison")
+    parser.add_argument("--accounts", type=int, default=10000000, help="accounts for the load test")
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    memory(args.objects)
+    loading(args.accounts, args.users, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Admin dashboard reads, recomputed by scanning vs. read from the running
+# Aggregates, and what keeping them current adds to each deposit/transfer.
+# "scan" is what the admin views did before: sum and bin every balance and
+# count every account's ledger rows. Ends with a consistency check of the
+# running totals against a rebuild from the ledger.
+#
+#   python -m bank.benchmarks.aggregates --accounts 200000 --rows 1000000
+import argparse
+import datetime
+import random
+import time
+
+from bank import main as bank
+from bank.account import Account, User
+from bank.aggregates import balance_labels, bucket
+from bank.columnar import to_micros
+from bank.money import Money
+from bank.txtypes import DEPOSIT, WITHDRAWAL, TRANSFER_OUT, TRANSFER_IN
+
+
+def scan_dashboard():
+    supply = 0
+    counts = [0] * len(balance_labels)
+    accounts = 0
+    for user in bank.users.values():
+        for acc in user.accounts:
+            supply += acc.balance.cents
+            counts[bucket(acc.balance.cents)] += 1
+            accounts += 1
+    return accounts, supply, counts, sum(bank.transaction_log.counts().values())
+
+
+def aggregate_dashboard():
+    summary = bank.service.summary()
+    return summary["accounts"], summary["money_supply"].cents, list(summary["balance_counts"].values()), \
+        summary["transactions"]
+
+
+def timed(call, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = call()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin totals: full scans vs. running aggregates")
+    parser.add_argument("--accounts", type=int, default=200000)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--ops", type=int, default=100000)
+    args = parser.parse_args()
+    bank.init()
+    rng = random.Random(5)
+    users = []
+    for i in range(args.accounts // 2):
+        user = bank.users[f"agg{i}"] = User(f"agg{i}")
+        bank.registry.add_user(user)
+        user.add_account(Account(str(700000 + 2 * i), balance=rng.randrange(0, 200)))
+        user.add_account(Account(str(700001 + 2 * i), balance=rng.randrange(0, 200)))
+        users.append(user)
+    start_ts = to_micros(datetime.datetime.now() - datetime.timedelta(days=90))
+    step = 90 * 86400 * 10 ** 6 // max(args.rows, 1)
+    bank.transaction_log.extend_micros(
+        (str(700000 + rng.randrange(args.accounts)), "agg", start_ts + i * step,
+         rng.choice((DEPOSIT, WITHDRAWAL, TRANSFER_OUT, TRANSFER_IN)), rng.randrange(1, 40) * 5)
+        for i in range(args.rows))
+    began = time.perf_counter()
+    bank.aggregates.rebuild(bank.transaction_log, (acc for _, acc in bank.registry))
+    rebuild = time.perf_counter() - began
+    print(f"accounts: {len(bank.registry)}, ledger rows: {len(bank.transaction_log)}, rebuild {rebuild:.2f}s")
+
+    scan_time, scanned = timed(scan_dashboard, 3)
+    agg_time, kept = timed(aggregate_dashboard, 1000)
+    assert scanned == kept, (scanned, kept)
+    print(f"dashboard totals: scan {scan_time * 1e3:.1f} ms, aggregates {agg_time * 1e6:.1f} us")
+
+    amount = Money(5)
+    plan = [(rng.choice(users), rng.random() < 0.5) for _ in range(args.ops)]
+    for name, aggregates in (("without aggregates", None), ("with aggregates", bank.aggregates)):
+        bank.service.aggregates = aggregates
+        start = time.perf_counter()
+        for user, deposit in plan:
+            a, b = user.accounts
+            if deposit:
+                bank.service.deposit(user, a.account_number, amount)
+            else:
+                bank.service.transfer(user, a.account_number, b.account_number, amount)
+        print(f"deposits/transfers {name}: {args.ops / (time.perf_counter() - start):,.0f} ops/s")
+    # The first round ran without aggregates, so they are behind until rebuilt
+    stale = len(bank.service.check_aggregates())
+    bank.aggregates.rebuild(bank.transaction_log, (acc for _, acc in bank.registry))
+    bank.service.aggregates = bank.aggregates
+    for user, deposit in plan[:1000]:
+        bank.service.deposit(user, user.accounts[1].account_number, amount)
+    began = time.perf_counter()
+    problems = bank.service.check_aggregates()
+    print(f"consistency check: {time.perf_counter() - began:.2f}s, {len(problems)} mismatches "
+          f"({stale} before the rebuild, after the untracked round)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Logins per second against real PIN hashes: every login paying the hash vs.
+# the verification cache, for a pool of accounts that log in repeatedly.
+# Rate limits are off for the timing runs; a last run shows how many of a
+# burst of wrong-PIN guesses the limits and lockouts let through.
+#
+#   python -m bank.benchmarks.auth --accounts 50 --logins 500
+import argparse
+import random
+import time
+
+from bank.account import Account, User
+from bank.authentication import Authenticator, VerificationCache
+from bank.pins import hash_pin
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput with and without the verification cache")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=500)
+    args = parser.parse_args()
+    users = {"bench": User("bench")}
+    pin_hash = hash_pin("1234")
+    for i in range(args.accounts):
+        users["bench"].add_account(Account(str(700000 + i), balance=100, pin_hash=pin_hash))
+    rng = random.Random(11)
+    numbers = [str(700000 + rng.randrange(args.accounts)) for _ in range(args.logins)]
+
+    for name, cache in (("no cache", None), ("with cache", VerificationCache())):
+        auth = Authenticator(users, account_limiter=None, source_limiter=None, cache=cache)
+        start = time.perf_counter()
+        for number in numbers:
+            user, msg = auth.login(number, "1234")
+            assert user is not None, msg
+        elapsed = time.perf_counter() - start
+        hits = f", {cache.hits} hits / {cache.misses} misses" if cache is not None else ""
+        print(f"{name:<11} {args.logins / elapsed:>10,.0f} logins/s{hits}")
+
+    # 1000 wrong guesses spread over every account from one source
+    auth = Authenticator(users)
+    allowed = 0
+    for i in range(1000):
+        user, msg = auth.login(str(700000 + i % args.accounts), "0000", source="10.0.0.1", now=1000.0)
+        allowed += msg.startswith("Incorrect") or msg.startswith("Account locked after")
+    print(f"guesses checked: {allowed}/1000, rate limited: {auth.rate_limited}, lockouts: {auth.lockouts}")
+
+
+if __name__ == "__main__":
+    main()
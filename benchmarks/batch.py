@@ -0,0 +1,50 @@
+# Bulk transfer throughput: read a CSV of transfers and apply it in one batch.
+#
+#   python -m bank.benchmarks.batch --rows 1000000 --accounts 100000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bank import main as bank
+from bank.account import Account, User
+from bank.batch import apply_transfers, read_transfers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch transfer throughput")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=100000)
+    parser.add_argument("--mode", choices=("atomic", "per-row"), default="atomic")
+    args = parser.parse_args()
+    bank.init()
+
+    for i in range(args.accounts):
+        user = bank.users[f"batch{i}"] = User(f"batch{i}")
+        bank.registry.add_user(user)
+        user.add_account(Account(str(500000 + i), balance=1000))
+    bank.aggregates.rebuild(bank.transaction_log, (acc for _, acc in bank.registry))
+    rng = random.Random(7)
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write("from,to,amount\n")
+        for _ in range(args.rows):
+            a, b = rng.sample(range(args.accounts), 2)
+            f.write(f"{500000 + a},{500000 + b},{rng.choice(('0.05', '0.10', '0.25', '1.15'))}\n")
+    try:
+        start = time.perf_counter()
+        rows = read_transfers(path)
+        parsed = time.perf_counter()
+        result = apply_transfers(*rows, atomic=args.mode == "atomic")
+        done = time.perf_counter()
+    finally:
+        os.remove(path)
+    print(f"rows: {args.rows}, applied: {result.applied_count}, mode: {args.mode}")
+    print(f"read {parsed - start:.2f}s, apply {done - parsed:.2f}s")
+    print(f"throughput: {args.rows / (done - start) * 60:,.0f} transfers/minute")
+    print(f"running totals match the ledger: {not bank.service.check_aggregates()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Bulk export/import of accounts, ledger and audit history (bank.bulk)
+# against writing the ledger a dict per row with csv.DictWriter, the way the
+# admin log view materializes it. Every format is round-tripped into a fresh
+# ledger, users dict and history list and compared with the original; the
+# audit export is checked to hold no PINs although half of the synthetic
+# entries carry old_pin/new_pin when they are added. Parquet runs only when pyarrow is
+# installed.
+#
+#   python -m bank.benchmarks.bulk --rows 5000000 --accounts 200000
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from bank import bulk
+from bank.account import Account, User
+from bank.audit import AuditLog
+from bank.ledger import Ledger
+from bank.registry import build_registry
+from bank.txtypes import label_table
+
+TYPES = ["+Deposit", "-Withdrawal", "-Transfer (own)", "+Transfer (own)",
+         "-Transfer (to other)", "+Transfer (from other)"]
+
+
+def build(rows, accounts, audit, seed):
+    rng = np.random.default_rng(seed)
+    users = {}
+    for i in range(accounts):
+        name = f"user{i // 2}"
+        user = users.get(name) or users.setdefault(name, User(name))
+        acc = Account(str(1000000 + i), balance=int(rng.integers(0, 5000)), pin_hash=f"hash{i}")
+        acc.frozen = i % 97 == 0
+        user.accounts.append(acc)
+    ledger = Ledger()
+    numbers = (1000000 + rng.integers(0, accounts, rows)).tolist()
+    ts = (1704067200 * 10 ** 6 + np.arange(rows, dtype=np.int64) * 1000).tolist()
+    types = [TYPES[t] for t in rng.integers(0, len(TYPES), rows).tolist()]
+    cents = (rng.integers(1, 400, rows) * 5).tolist()
+    ledger.extend_micros((str(n), f"user{(n - 1000000) // 2}", t, k, c)
+                         for n, t, k, c in zip(numbers, ts, types, cents))
+    history = []
+    for i in range(audit):
+        entry = {"account_number": str(1000000 + i % accounts), "user": f"user{i % accounts // 2}",
+                 "datetime": f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}"}
+        if i % 2:
+            entry.update(old_pin=f"{i % 10000:04d}", new_pin=f"{(i + 1) % 10000:04d}")  # Pre-scrub entries
+        history.append(entry)
+    return users, ledger, AuditLog(history)
+
+
+def dict_rows(path, ledger):
+    # The per-row baseline: one dict per ledger row, then csv.DictWriter
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["account_number", "user", "datetime", "type", "amount"])
+        writer.writeheader()
+        for entry in ledger:
+            writer.writerow(entry)
+    return len(ledger)
+
+
+def same(users, ledger, history, users2, ledger2, history2):
+    a, b = ledger.store.numpy_range(), ledger2.store.numpy_range()
+    assert len(ledger2) == len(ledger), "ledger row count differs"
+    assert (a["ts"] == b["ts"]).all() and (a["cents"] == b["cents"]).all(), "ledger times/amounts differ"
+    for column, names, names2 in (("account", ledger.store.accounts.values, ledger2.store.accounts.values),
+                                  ("user", ledger.store.users.values, ledger2.store.users.values)):
+        assert (np.array(names, dtype=object)[a[column]] == np.array(names2, dtype=object)[b[column]]).all(), \
+            f"ledger {column} differs"
+    labels = label_table()
+    assert (labels[a["type"]] == labels[b["type"]]).all(), "ledger types differ"
+    before = {acc.account_number: (user.username, acc.balance, acc.frozen, acc.pin_hash)
+              for user in users.values() for acc in user.accounts}
+    after = {acc.account_number: (user.username, acc.balance, acc.frozen, acc.pin_hash)
+             for user in users2.values() for acc in user.accounts}
+    assert before == after, "accounts differ"
+    assert list(history2) == list(history), "audit differs"
+    assert all("old_pin" not in entry and "new_pin" not in entry for entry in history2), "PINs imported"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked CSV/Parquet export and import vs. per-row dicts")
+    parser.add_argument("--rows", type=int, default=5000000, help="ledger rows")
+    parser.add_argument("--accounts", type=int, default=200000)
+    parser.add_argument("--audit", type=int, default=200000, help="PIN change history entries")
+    parser.add_argument("--chunk-rows", type=int, default=bulk.CHUNK_ROWS)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    users, ledger, history = build(args.rows, args.accounts, args.audit, args.seed)
+    directory = tempfile.mkdtemp()
+    print(f"ledger rows: {args.rows:,}, accounts: {args.accounts:,}, audit entries: {args.audit:,}")
+    print(f"{'export':<30} {'seconds':>8} {'rows/s':>12} {'MB':>8} {'MB/s':>8}")
+
+    def report(name, path, rows, seconds):
+        size = os.path.getsize(path) / 1e6
+        print(f"{name:<30} {seconds:>8.2f} {rows / seconds:>12,.0f} {size:>8,.0f} {size / seconds:>8,.1f}")
+
+    path = os.path.join(directory, "dicts.csv")
+    began = time.perf_counter()
+    rows = dict_rows(path, ledger)
+    report("ledger, dict per row", path, rows, time.perf_counter() - began)
+    os.remove(path)
+
+    formats = ["csv"]
+    try:
+        bulk._pyarrow()
+        formats.append("parquet")
+    except ImportError as e:
+        print(f"parquet: skipped ({e})")
+    for fmt in formats:
+        paths = {table: os.path.join(directory, f"{table}.{fmt}") for table in bulk.TABLES}
+        for table, export in (("ledger", lambda: bulk.export_ledger(paths["ledger"], ledger, args.chunk_rows)),
+                              ("accounts", lambda: bulk.export_accounts(paths["accounts"], users, args.chunk_rows,
+                                                                        pin_hashes=True)),
+                              ("audit", lambda: bulk.export_audit(paths["audit"], history, args.chunk_rows))):
+            began = time.perf_counter()
+            rows = export()
+            report(f"{table}, {fmt} chunks", paths[table], rows, time.perf_counter() - began)
+        if fmt == "csv":
+            with open(paths["audit"]) as f:
+                assert "pin" not in f.readline(), "audit export has PIN columns"
+
+        users2, ledger2, history2 = {}, Ledger(), AuditLog()
+        registry2 = build_registry(users2)
+        timings = []
+        for table, load in (("ledger", lambda: bulk.import_ledger(paths["ledger"], ledger2, args.chunk_rows)),
+                            ("accounts", lambda: bulk.import_accounts(paths["accounts"], users2, registry2,
+                                                                      args.chunk_rows)),
+                            ("audit", lambda: bulk.import_audit(paths["audit"], history2, args.chunk_rows))):
+            began = time.perf_counter()
+            load()
+            timings.append(f"{table} {time.perf_counter() - began:.2f} s")
+        print(f"import, {fmt}: {', '.join(timings)}")
+        same(users, ledger, history, users2, ledger2, history2)
+        print(f"round trip, {fmt}: ledger, accounts and audit match; audit holds no PINs")
+        for path in paths.values():
+            os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Analytics pass over a synthetic log: per-row string classification
+# (Series.apply(classify_type) + label prefix checks) vs. array lookups on
+# the int8 type codes the ledger stores.
+#
+#   python -m bank.benchmarks.classify --rows 10000000
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bank import txtypes
+from bank.txtypes import TX_CLASSES, classify_type, class_table, label_table, sign_table
+
+CODES = [t.code for t in (txtypes.DEPOSIT, txtypes.WITHDRAWAL, txtypes.TRANSFER_OWN_OUT,
+                          txtypes.TRANSFER_OWN_IN, txtypes.TRANSFER_OUT, txtypes.TRANSFER_IN)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction classification throughput")
+    parser.add_argument("--rows", type=int, default=10000000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(3)
+    codes = rng.choice(np.array(CODES, dtype=np.int8), size=args.rows)
+    cents = rng.integers(1, 400, size=args.rows, dtype=np.int64) * 5
+    days = rng.integers(19000, 19365, size=args.rows, dtype=np.int64)
+
+    # Before: the log holds label strings and every row is classified in Python
+    labels = pd.Series(label_table()[codes])
+    start = time.perf_counter()
+    tx_class = labels.apply(classify_type)
+    signed = np.where(labels.str.startswith("+"), cents, -cents)
+    before_counts = pd.DataFrame({"day": days, "tx_class": tx_class}).groupby(["day", "tx_class"]).size()
+    before = time.perf_counter() - start
+
+    # After: class and sign are lookups on the stored codes
+    start = time.perf_counter()
+    classes = class_table()[codes]
+    signed_codes = cents * sign_table()[codes]
+    keys, counts = np.unique(days * len(TX_CLASSES) + classes, return_counts=True)
+    after = time.perf_counter() - start
+
+    assert (signed == signed_codes).all()
+    assert counts.sum() == before_counts.sum()
+    print(f"rows: {args.rows}")
+    print(f"string classify: {before:.2f}s ({args.rows / before:,.0f} rows/s)")
+    print(f"code lookups:    {after:.2f}s ({args.rows / after:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# One page of history for "account X between two dates" and "all accounts
+# between two dates": materializing every row and filtering (what the menus
+# did) vs. Ledger.query, which bisects the time-sorted index.
+#
+#   python -m bank.benchmarks.history_query --rows 1000000 --accounts 10000
+import argparse
+import datetime
+import random
+import time
+
+from bank import txtypes
+from bank.columnar import to_micros
+from bank.ledger import Ledger
+
+YEAR_MICROS = 365 * 86400 * 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paginated history query latency")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(9)
+    ledger = Ledger()
+    base = to_micros(datetime.datetime(2025, 1, 1))
+    step = YEAR_MICROS // args.rows
+    ledger.extend_micros(
+        (str(100000 + rng.randrange(args.accounts)), "user", base + i * step,
+         rng.choice((txtypes.DEPOSIT, txtypes.WITHDRAWAL, txtypes.TRANSFER_OUT)), 25)
+        for i in range(args.rows)
+    )
+    ranges = []
+    for _ in range(args.queries):
+        start = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=rng.randrange(300))
+        ranges.append((str(100000 + rng.randrange(args.accounts)), start, start + datetime.timedelta(days=30)))
+
+    def scan(number, start, end):
+        label_start, label_end = start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')
+        rows = ledger.for_account(number) if number is not None else ledger
+        return [tx for tx in rows if label_start <= tx["datetime"] < label_end][:args.page]
+
+    print(f"rows: {args.rows}, accounts: {args.accounts}, page: {args.page}")
+    for name, per_account, queries in (("one account", True, args.queries), ("all accounts", False, 3)):
+        timings = {}
+        for method in ("scan", "query"):
+            start_time = time.perf_counter()
+            for number, start, end in ranges[:queries]:
+                number = number if per_account else None
+                if method == "scan":
+                    page = scan(number, start, end)
+                else:
+                    page, _ = ledger.query([number] if number else None, start, end, limit=args.page)
+            timings[method] = (time.perf_counter() - start_time) / queries
+        print(f"{name:<13} scan {timings['scan'] * 1e3:>10.3f} ms/page   "
+              f"query {timings['query'] * 1e3:>8.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# Cost of request ids: BankService deposits/s without request ids, with a
+# new id each, and replays of one id. The cache's behaviour (eviction,
+# expiry, concurrent replays) is covered by tests/test_idempotency.py.
+#
+#   python -m bank.benchmarks.idempotency --ops 100000
+import argparse
+import time
+
+from bank import main as bank
+
+
+def throughput(ops):
+    service, alice = bank.service, bank.users["alice"]
+    print(f"{'deposits':<22} {'ops/s':>10}")
+    for name, request_id in (("no request id", lambda i: None),
+                             ("new request id each", lambda i: f"bench-{i}"),
+                             ("replay of one id", lambda i: "bench-replay")):
+        began = time.perf_counter()
+        for i in range(ops):
+            service.deposit(alice, "1002", "0.05", request_id=request_id(i))
+        print(f"{name:<22} {ops / (time.perf_counter() - began):>10,.0f}")
+    print(f"cache: {len(bank.idempotency):,} entries, {bank.idempotency.replays:,} replays, "
+          f"{bank.idempotency.evictions:,} evictions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request id overhead")
+    parser.add_argument("--ops", type=int, default=100000)
+    args = parser.parse_args()
+    bank.init()
+    throughput(args.ops)
+
+
+if __name__ == "__main__":
+    main()
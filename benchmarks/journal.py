@@ -0,0 +1,66 @@
+# Durable transactions per second for each journal sync policy.
+#
+#   python -m bank.benchmarks.journal --records 5000 --dir /var/tmp/bank-bench
+#
+# "always" fsyncs before every commit returns; with several threads the
+# commits queued behind one fsync share it (group commit). "batch" fsyncs
+# once per batch_size records, and "none" leaves syncing to the OS.
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from bank.journal import Journal
+
+
+def record(i):
+    return {"t": "tx", "bal": {"1001": 50000 - i, "2001": 80000 + i},
+            "ledger": [[2 * i, "1001", "alice", 1719223200000000 + i, "-Transfer (to other)", 5],
+                       [2 * i + 1, "2001", "bob", 1719223200000000 + i, "+Transfer (from other)", 5]]}
+
+
+def run(directory, records, sync, batch_size=64, threads=1):
+    journal = Journal(directory, sync=sync, batch_size=batch_size)
+    per_thread = records // threads
+
+    def worker(base):
+        for i in range(base, base + per_thread):
+            journal.commit(record(i))
+
+    workers = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    journal.sync()
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return per_thread * threads / elapsed, journal.fsyncs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal throughput by sync policy")
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--dir", default=None, help="directory on the disk to measure")
+    args = parser.parse_args()
+    if args.dir:
+        os.makedirs(args.dir, exist_ok=True)
+
+    cases = [("always", 1, 1), ("always", 1, 4), ("always", 1, 16)]
+    cases += [("batch", size, 1) for size in (8, 64, 512)]
+    cases += [("none", 1, 1)]
+    print(f"{'sync':<8} {'batch':>6} {'threads':>8} {'tx/s':>12} {'fsyncs':>8}")
+    for sync, batch_size, threads in cases:
+        directory = tempfile.mkdtemp(dir=args.dir)
+        try:
+            rate, fsyncs = run(directory, args.records, sync, batch_size, threads)
+        finally:
+            shutil.rmtree(directory)
+        print(f"{sync:<8} {batch_size:>6} {threads:>8} {rate:>12,.0f} {fsyncs:>8}")
+
+
+if __name__ == "__main__":
+    main()
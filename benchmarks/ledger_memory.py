@@ -0,0 +1,70 @@
+# Bytes per transaction: list of dicts (the old transaction_log) vs. Ledger.
+#
+#   python -m bank.benchmarks.ledger_memory --rows 1000000
+import argparse
+import datetime
+import gc
+import random
+import tracemalloc
+
+from bank.ledger import Ledger
+from bank.money import Money
+
+TYPES = ["+Deposit", "-Withdrawal", "-Transfer (own)", "+Transfer (own)",
+         "-Transfer (to other)", "+Transfer (from other)"]
+
+
+def rows(n, accounts):
+    start = datetime.datetime(2024, 1, 1)
+    rng = random.Random(42)
+    for i in range(n):
+        number = 1000 + rng.randrange(accounts)
+        yield (str(number), f"user{number // 2}", start + datetime.timedelta(seconds=i),
+               rng.choice(TYPES), rng.randrange(1, 400) * 5)
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def build_dicts(n, accounts):
+    log = []
+    for account_number, user, now, tx_type, cents in rows(n, accounts):
+        log.append({
+            "account_number": account_number,
+            "user": user,
+            "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
+            "type": tx_type,
+            "amount": cents / 100
+        })
+    return log
+
+
+def build_ledger(n, accounts):
+    ledger = Ledger()
+    for account_number, user, now, tx_type, cents in rows(n, accounts):
+        ledger.append(account_number, user, now, tx_type, Money(cents))
+    return ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ledger memory per transaction")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=10000)
+    args = parser.parse_args()
+
+    dict_bytes = measure(lambda: build_dicts(args.rows, args.accounts))
+    ledger_bytes = measure(lambda: build_ledger(args.rows, args.accounts))
+    print(f"rows: {args.rows}, accounts: {args.accounts}")
+    print(f"list of dicts: {dict_bytes / args.rows:8.1f} bytes/transaction")
+    print(f"Ledger:        {ledger_bytes / args.rows:8.1f} bytes/transaction")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Withdrawal limit checks over simulated days of traffic: the old
+# {(account_number, date): total} dict vs. LimitTracker with daily, hourly and
+# rolling 24-hour limits. Reports check+record throughput and how many entries
+# each keeps once the simulated days have passed.
+#
+#   python -m bank.benchmarks.limits --accounts 10000 --days 30
+import argparse
+import datetime
+import random
+import time
+
+from bank.limits import DAY, HOUR, ROLLING_24H, Limit, LimitTracker
+from bank.money import Money
+
+LIMIT = Money(90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Withdrawal limit tracking throughput and footprint")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=20000, help="withdrawals per simulated day")
+    args = parser.parse_args()
+    rng = random.Random(5)
+    numbers = [str(100000 + i) for i in range(args.accounts)]
+    start_day = datetime.datetime(2026, 1, 1)
+    events = [
+        (rng.choice(numbers), start_day + datetime.timedelta(days=day, seconds=rng.randrange(86400)))
+        for day in range(args.days) for _ in range(args.per_day)
+    ]
+    events.sort(key=lambda event: event[1])
+    amount = Money(5)
+
+    daily = {}
+    start = time.perf_counter()
+    for number, now in events:
+        key = (number, now.date().isoformat())
+        total = daily.get(key, Money(0))
+        if amount + total <= LIMIT:
+            daily[key] = total + amount
+    before = time.perf_counter() - start
+
+    print(f"withdrawals: {len(events)} over {args.days} days, {args.accounts} accounts")
+    print(f"dict, daily only:      {len(events) / before:,.0f} ops/s, {len(daily):,} entries kept")
+    for name, limits in (
+        ("daily only", [Limit(LIMIT, DAY)]),
+        ("3 limits", [Limit(LIMIT, DAY), Limit(Money(50), HOUR), Limit(Money(150), ROLLING_24H)]),
+    ):
+        tracker = LimitTracker(limits)
+        start = time.perf_counter()
+        for number, now in events:
+            if tracker.check(number, amount, now) is None:
+                tracker.record(number, amount, now)
+        elapsed = time.perf_counter() - start
+        tracker.expire(events[-1][1])
+        print(f"tracker, {name + ':':12}  {len(events) / elapsed:,.0f} ops/s, {len(tracker):,} accounts kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Async load generator for bank.server: many concurrent sessions, each
+# logging in and then sending a mix of balance, deposit, transfer and
+# history requests. Reports requests/s and p50/p99 latency.
+#
+#   python -m bank.benchmarks.load_client --sessions 1000 --requests 20
+#   python -m bank.benchmarks.load_client --connect 127.0.0.1:8765 --accounts 1001:1234
+#
+# Without --connect an in-process server is started on an ephemeral port
+# with one synthetic account per session.
+import argparse
+import asyncio
+import json
+import random
+import time
+
+MIX = ("balance", "balance", "deposit", "transfer", "history")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def session(host, port, account, pin, peers, requests, latencies, errors, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def call(request):
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if not reply["ok"]:
+            errors.append(reply["error"])
+        return reply
+
+    try:
+        await call({"op": "login", "account": account, "pin": pin})
+        for _ in range(requests):
+            op = rng.choice(MIX)
+            if op == "balance":
+                await call({"op": "balance", "account": account})
+            elif op == "deposit":
+                await call({"op": "deposit", "account": account, "amount": "0.25"})
+            elif op == "transfer":
+                await call({"op": "transfer", "from": account, "to": rng.choice(peers), "amount": "0.05"})
+            else:
+                await call({"op": "history", "account": account})
+    finally:
+        writer.close()
+
+
+def seed_accounts(count):
+    from bank import main as bank
+    from bank.account import Account, User
+    from bank.pins import hash_pin
+
+    bank.init()
+    # Every session connects from 127.0.0.1, so the per-source limit is off
+    bank.auth.source_limiter = None
+    pin_hash = hash_pin("1234")
+    accounts = []
+    for i in range(count):
+        user = bank.users[f"load{i}"] = User(f"load{i}")
+        bank.registry.add_user(user)
+        number = str(900000 + i)
+        user.add_account(Account(number, balance=100, pin_hash=pin_hash))
+        accounts.append((number, "1234"))
+    bank.aggregates.rebuild(bank.transaction_log, (acc for _, acc in bank.registry))
+    return accounts
+
+
+async def run(args):
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        port = int(port)
+        accounts = [tuple(spec.split(":")) for spec in args.accounts]
+        server_task = None
+    else:
+        from bank.server import serve
+
+        host = "127.0.0.1"
+        accounts = seed_accounts(args.sessions)
+        ready = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(serve(host, 0, ready=ready))
+        port = await ready
+    peers = [number for number, _ in accounts]
+    latencies, errors = [], []
+    rng = random.Random(1)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        session(host, port, *accounts[i % len(accounts)], peers, args.requests,
+                latencies, errors, random.Random(rng.random()))
+        for i in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - start
+    if server_task is not None:
+        server_task.cancel()
+    latencies.sort()
+    print(f"sessions: {args.sessions}, requests: {len(latencies)}, errors: {len(errors)}")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency p50: {percentile(latencies, 0.50) * 1e3:.2f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1e3:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for bank.server")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20, help="requests per session after login")
+    parser.add_argument("--connect", help="host:port of a running server")
+    parser.add_argument("--accounts", nargs="+", default=["1001:1234", "2001:4321"],
+                        help="account:pin pairs to log in with when using --connect")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
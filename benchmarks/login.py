@@ -0,0 +1,75 @@
+# Login latency vs. number of accounts.
+#
+#   python -m bank.benchmarks.login
+#   python -m bank.benchmarks.login --sizes 1000 100000 10000000
+#
+# Accounts are added to one growing pool, so the largest size dominates the
+# setup time and memory (roughly 0.5 GB per million accounts). They share a
+# single-iteration PIN hash and rate limits are off, so this times the account
+# lookup; benchmarks/auth.py times the real hash, with and without the cache.
+import argparse
+import random
+import time
+
+from bank.account import Account, User
+from bank.authentication import Authenticator
+from bank.pins import hash_pin
+
+ACCOUNTS_PER_USER = 4
+PIN_HASH = hash_pin("1234", iterations=1)
+
+
+def grow(users, registry, start, stop):
+    for n in range(start, stop):
+        username = f"user{n // ACCOUNTS_PER_USER}"
+        user = users.get(username)
+        if user is None:
+            user = users[username] = User(username)
+            registry.add_user(user)
+        user.add_account(Account(str(1000000 + n), balance=100, pin_hash=PIN_HASH))
+
+
+def linear_login(users, account_number, pincode):
+    # The pre-index lookup: walk every user and account
+    for user in users.values():
+        for account in user.accounts:
+            if account.account_number == account_number:
+                return user if account.check_pin(pincode) else None
+    return None
+
+
+def time_logins(login, size, samples):
+    numbers = [str(1000000 + random.randrange(size)) for _ in range(samples)]
+    start = time.perf_counter()
+    for number in numbers:
+        login(number, "1234")
+    return (time.perf_counter() - start) / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login latency vs. number of accounts")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000, 1000000, 10000000])
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--linear-max", type=int, default=100000,
+                        help="largest size to also time the old linear scan at")
+    args = parser.parse_args()
+
+    users = {}
+    auth = Authenticator(users, account_limiter=None, source_limiter=None, cache=None)
+    built = 0
+    print(f"{'accounts':>12} {'indexed us/login':>18} {'linear us/login':>17}")
+    for size in sorted(args.sizes):
+        grow(users, auth.registry, built, size)
+        built = size
+        indexed = time_logins(auth.login, size, args.samples)
+        linear = ""
+        if size <= args.linear_max:
+            samples = max(10, args.samples // size)
+            per = time_logins(lambda a, p: linear_login(users, a, p), size, samples)
+            linear = f"{per * 1e6:.2f}"
+        print(f"{size:>12} {indexed * 1e6:>18.3f} {linear:>17}")
+
+
+if __name__ == "__main__":
+    main()
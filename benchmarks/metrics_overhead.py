@@ -0,0 +1,63 @@
+# What instrumentation costs on the hot path: the same loop of BankService
+# deposits and transfers and Operations deposits, run in a fresh process
+# with BANK_METRICS unset and with BANK_METRICS=1 (the switch is read at
+# import, so each setting needs its own interpreter). Prints ops/s for both,
+# the overhead, and the size of a Prometheus snapshot.
+#
+#   python -m bank.benchmarks.metrics_overhead --ops 200000
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def child(ops):
+    from bank import main as bank, metrics
+    from bank.operations import Operations
+
+    bank.init()
+    user = bank.users["alice"]
+    ops_acc = Operations(user.accounts[1], bank.engine)
+    deposit, transfer = bank.service.deposit, bank.service.transfer
+    results = {}
+    for name, call in (("service deposit", lambda: deposit(user, "1001", "0.25")),
+                       ("service transfer", lambda: transfer(user, "1001", "2001", "0.05")),
+                       ("Operations.deposit", lambda: ops_acc.deposit(1))):
+        start = time.perf_counter()
+        for _ in range(ops):
+            call()
+        results[name] = ops / (time.perf_counter() - start)
+    began = time.perf_counter()
+    snapshot = metrics.render() if metrics.ENABLED else ""
+    results["snapshot"] = [len(snapshot), time.perf_counter() - began]
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path cost of BANK_METRICS")
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.ops)
+        return
+    runs = {}
+    for setting in ("", "1"):
+        env = {**os.environ, "BANK_METRICS": setting}
+        env.pop("BANK_DATA_DIR", None)
+        out = subprocess.run([sys.executable, "-m", "bank.benchmarks.metrics_overhead", "--child",
+                              "--ops", str(args.ops)], env=env, capture_output=True, text=True, check=True)
+        runs[setting] = json.loads(out.stdout)
+    off, on = runs[""], runs["1"]
+    print(f"ops per loop: {args.ops}")
+    print(f"{'operation':<20} {'off ops/s':>12} {'on ops/s':>12} {'overhead':>9}")
+    for name in ("service deposit", "service transfer", "Operations.deposit"):
+        print(f"{name:<20} {off[name]:>12,.0f} {on[name]:>12,.0f} {off[name] / on[name] - 1:>8.1%}")
+    size, seconds = on["snapshot"]
+    print(f"snapshot: {size:,} bytes rendered in {seconds * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
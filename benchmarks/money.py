@@ -0,0 +1,120 @@
+# Deposit/withdraw/transfer throughput: float balances (before) vs. Money (after).
+#
+#   python -m bank.benchmarks.money --ops 200000
+import argparse
+import time
+
+from bank.account import Account
+from bank.money import Money, ZERO, MIN_BALANCE, DENOMINATIONS
+from bank.operations import Operations
+
+
+class FloatAccount:
+    # Balance handling as it was before Money
+    def __init__(self, balance):
+        self.balance = balance
+
+    def deposit(self, amount):
+        if amount > 0:
+            self.balance += amount
+            return True
+        return False
+
+    def withdraw(self, amount):
+        if 0 < amount <= self.balance:
+            self.balance -= amount
+            return True
+        return False
+
+
+def float_transfer(from_acc, to_acc, amount):
+    if amount <= 0:
+        return False
+    if amount not in [0.05, 0.10, 0.25] and amount % 0.05 != 0:
+        return False
+    if from_acc.balance - amount < 0.05:
+        return False
+    from_acc.balance -= amount
+    to_acc.balance += amount
+    return True
+
+
+def money_transfer(from_acc, to_acc, amount):
+    if amount <= ZERO:
+        return False
+    if amount.cents % 5 != 0:
+        return False
+    if from_acc.balance - amount < MIN_BALANCE:
+        return False
+    from_acc.balance -= amount
+    to_acc.balance += amount
+    return True
+
+
+def rate(ops, fn):
+    start = time.perf_counter()
+    fn()
+    return ops / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Money arithmetic throughput")
+    parser.add_argument("--ops", type=int, default=200000)
+    args = parser.parse_args()
+    n = args.ops
+    coins_f = [0.05, 0.10, 0.25] * (n // 3 + 1)
+    coins_m = [Money(c) for c in (5, 10, 25)] * (n // 3 + 1)
+
+    def float_deposits():
+        acc = FloatAccount(500.0)
+        for coin in coins_f[:n]:
+            if coin in [0.05, 0.10, 0.25]:
+                acc.deposit(coin)
+
+    def money_deposits():
+        acc = Account("1", balance=500)
+        for coin in coins_m[:n]:
+            if coin.cents in DENOMINATIONS:
+                acc.deposit(coin)
+
+    def float_withdrawals():
+        acc = FloatAccount(1e9)
+        for coin in coins_f[:n]:
+            acc.withdraw(coin)
+
+    def money_withdrawals():
+        acc = Account("1", balance=10 ** 7)
+        for coin in coins_m[:n]:
+            acc.withdraw(coin)
+
+    def operations_receipts():
+        ops = Operations(Account("1", balance=10 ** 7))
+        for coin in coins_m[:n]:
+            ops.withdraw(coin)
+
+    def float_transfers():
+        a, b = FloatAccount(1e9), FloatAccount(1e9)
+        for amount in coins_f[:n]:
+            float_transfer(a, b, amount)
+
+    def money_transfers():
+        a, b = Account("1", balance=10 ** 7), Account("2", balance=10 ** 7)
+        for amount in coins_m[:n]:
+            money_transfer(a, b, amount)
+
+    # Float rounding drift: repeated $0.10 deposits no longer sum exactly
+    drift = FloatAccount(0.0)
+    for _ in range(1000):
+        drift.deposit(0.10)
+    print(f"1000 x $0.10 with floats: {drift.balance!r}, with Money: {sum((Money(10),) * 1000, ZERO)}")
+    print(f"float 0.15 % 0.05 == {0.15 % 0.05!r} (valid transfer rejected); Money(15).cents % 5 == {15 % 5}")
+    print(f"{'operation':<12} {'float ops/s':>14} {'Money ops/s':>14}")
+    for name, before, after in (("deposit", float_deposits, money_deposits),
+                                ("withdraw", float_withdrawals, money_withdrawals),
+                                ("transfer", float_transfers, money_transfers)):
+        print(f"{name:<12} {rate(n, before):>14,.0f} {rate(n, after):>14,.0f}")
+    print(f"Operations.withdraw with receipt string: {rate(n, operations_receipts):,.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
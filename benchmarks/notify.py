@@ -0,0 +1,81 @@
+# Cost of a notification on the caller's side: a synchronous print per event
+# (the old notify()) vs. queueing it on a Notifier whose worker writes the
+# events to the same file in batches. The "slow sink" rows add a fixed delay
+# per write, like a terminal or a remote listener: called synchronously every
+# event pays it (only --slow-events of them are run), queued it is paid once
+# per batch. When even batching cannot keep up, the full-queue policy decides:
+# "block" pushes the delay back onto callers, the drop policies keep callers
+# fast and count what they lost.
+#
+#   python -m bank.benchmarks.notify --events 200000
+import argparse
+import os
+import tempfile
+import time
+
+from bank.notification import FileSink, Notifier
+
+
+class SlowSink(FileSink):
+    def __init__(self, path, delay):
+        super().__init__(path)
+        self.delay = delay
+
+    def write(self, messages):
+        time.sleep(self.delay)
+        super().write(messages)
+
+
+def run(submit, events):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(events):
+        began = time.perf_counter_ns()
+        submit(f"Deposit of $0.25 on account {100000 + i % 5000}; balance ${i % 1000}.00")
+        latencies.append(time.perf_counter_ns() - began)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return events / elapsed, latencies[len(latencies) // 2] / 1e3, latencies[int(len(latencies) * 0.99)] / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronous notifications vs. the queued Notifier")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--capacity", type=int, default=10000)
+    parser.add_argument("--slow-delay", type=float, default=0.002, help="seconds per write in the slow sink")
+    parser.add_argument("--slow-events", type=int, default=1000, help="events for the synchronous slow sink")
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "notifications.log")
+    print(f"events: {args.events}, queue capacity: {args.capacity}")
+    print(f"{'mode':<31} {'events/s':>11} {'p50 us':>8} {'p99 us':>9} {'delivered':>10} {'dropped':>9} "
+          f"{'max lag ms':>11}")
+
+    with open(path, "a") as f:
+        def sync(message):
+            print(f"Notification: {message}", file=f, flush=True)
+        rate, p50, p99 = run(sync, args.events)
+    print(f"{'sync print, flush per event':<31} {rate:>11,.0f} {p50:>8.1f} {p99:>9.1f} {args.events:>10} {0:>9} "
+          f"{0:>11.1f}")
+    slow = SlowSink(path, args.slow_delay)
+    rate, p50, p99 = run(lambda message: slow.write([message]), args.slow_events)
+    slow.close()
+    print(f"{'sync, slow sink':<31} {rate:>11,.0f} {p50:>8.1f} {p99:>9.1f} {args.slow_events:>10} {0:>9} "
+          f"{0:>11.1f}")
+
+    modes = [("queued, file", lambda: FileSink(path), "drop_oldest")]
+    modes += [(f"queued, slow sink, {policy}", lambda: SlowSink(path, args.slow_delay), policy)
+              for policy in ("block", "drop_newest", "drop_oldest")]
+    for name, sink, policy in modes:
+        notifier = Notifier([sink()], capacity=args.capacity, policy=policy).start()
+        rate, p50, p99 = run(notifier.submit, args.events)
+        notifier.close(timeout=60)
+        stats = notifier.stats()
+        print(f"{name:<31} {rate:>11,.0f} {p50:>8.1f} {p99:>9.1f} {stats['delivered']:>10} "
+              f"{stats['dropped']:>9} {stats['lag_max'] * 1e3:>11.1f}")
+    os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
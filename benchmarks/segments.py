@@ -0,0 +1,125 @@
+# Scan throughput over an archived ledger: JSON lines and CSV dumps of the
+# same rows (parsed line by line) vs. mmap'd segments read as NumPy arrays.
+# Three queries: net amount over everything, over one month, and one
+# account's rows for that month. Files are read warm from the page cache.
+#
+#   python -m bank.benchmarks.segments --rows 2000000 --accounts 100000
+import argparse
+import csv
+import datetime
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bank import txtypes
+from bank.columnar import to_micros
+from bank.ledger import Ledger
+from bank.money import Money
+from bank.segments import SegmentReader, SegmentWriter
+from bank.txtypes import sign_table
+
+YEAR_MICROS = 365 * 86400 * 1000000
+TYPES = (txtypes.DEPOSIT, txtypes.WITHDRAWAL, txtypes.TRANSFER_OUT, txtypes.TRANSFER_IN)
+
+
+def dump(ledger, directory):
+    json_path, csv_path = os.path.join(directory, "ledger.jsonl"), os.path.join(directory, "ledger.csv")
+    with open(json_path, "w") as jf, open(csv_path, "w", newline="") as cf:
+        writer = csv.writer(cf)
+        writer.writerow(("account_number", "user", "datetime", "type", "amount"))
+        for tx in ledger:
+            tx["amount"] = str(tx["amount"])
+            jf.write(json.dumps(tx) + "\n")
+            writer.writerow(tx.values())
+    return json_path, csv_path
+
+
+def text_query(rows, start, end, account):
+    # rows: (account_number, datetime, type, amount) tuples parsed from a dump
+    net = 0
+    matched = 0
+    for number, when, label, amount in rows:
+        if start <= when < end and (account is None or number == account):
+            cents = Money.parse(amount).cents
+            net += cents if label.startswith("+") else -cents
+            matched += 1
+    return net, matched
+
+
+def json_rows(path):
+    with open(path) as f:
+        for line in f:
+            tx = json.loads(line)
+            yield tx["account_number"], tx["datetime"], tx["type"], tx["amount"]
+
+
+def csv_rows(path):
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for number, _, when, label, amount in reader:
+            yield number, when, label, amount
+
+
+def segment_query(reader, start, end, account):
+    signs = sign_table()
+    if account is not None:
+        records = reader.account_records(account, start, end)
+        return int((records["cents"] * signs[records["type"]]).sum()), len(records)
+    net = matched = 0
+    for records in reader.scan(start, end):
+        net += int((records["cents"] * signs[records["type"]]).sum())
+        matched += len(records)
+    return net, matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archived ledger scans: JSON/CSV dumps vs. mmap segments")
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--accounts", type=int, default=100000)
+    args = parser.parse_args()
+    rng = random.Random(4)
+    base = datetime.datetime(2025, 1, 1)
+    step = YEAR_MICROS // args.rows
+    ledger = Ledger()
+    ledger.extend_micros(
+        (str(100000 + rng.randrange(args.accounts)), f"user{rng.randrange(1000)}",
+         to_micros(base) + i * step, rng.choice(TYPES), rng.randrange(1, 400) * 5)
+        for i in range(args.rows)
+    )
+    directory = tempfile.mkdtemp()
+    try:
+        json_path, csv_path = dump(ledger, directory)
+        SegmentWriter(os.path.join(directory, "segments")).write(ledger)
+        reader = SegmentReader(os.path.join(directory, "segments"))
+        seg_bytes = sum(os.path.getsize(segment.path) for segment in reader.segments)
+        print(f"rows: {args.rows}, accounts: {args.accounts}")
+        print(f"size: jsonl {os.path.getsize(json_path) / 1e6:.0f} MB, csv {os.path.getsize(csv_path) / 1e6:.0f} MB, "
+              f"segments {seg_bytes / 1e6:.0f} MB")
+        month = (datetime.datetime(2025, 6, 1), datetime.datetime(2025, 7, 1))
+        account = ledger.entry(args.rows * 165 // 365)["account_number"]  # Active in June
+        queries = (("everything", (datetime.datetime(1970, 1, 1), datetime.datetime(9999, 1, 1)), None),
+                   ("one month", month, None), ("one account, one month", month, account))
+        print(f"{'query':<24} {'jsonl':>10} {'csv':>10} {'segments':>10}   (seconds; matched rows)")
+        for name, (start, end), number in queries:
+            labels = (start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'))
+            timings = []
+            results = []
+            for run in (lambda: text_query(json_rows(json_path), *labels, number),
+                        lambda: text_query(csv_rows(csv_path), *labels, number),
+                        lambda: segment_query(reader, start, end, number)):
+                began = time.perf_counter()
+                results.append(run())
+                timings.append(time.perf_counter() - began)
+            assert len(set(results)) == 1, results
+            print(f"{name:<24} {timings[0]:>10.3f} {timings[1]:>10.3f} {timings[2]:>10.4f}   {results[0][1]:,}")
+        reader.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Transactions per second through ShardedEngine as the number of worker
+# processes grows, on a synthetic mix of deposits, withdrawals and
+# transfers (a share of them across shards, via two-phase commit). Ops are
+# sent in batches, one round trip per shard per phase. Every run checks that
+# balances add up to the opening total plus deposits minus withdrawals.
+#
+#   python -m bank.benchmarks.shards --shards 1 2 4 8 --ops 400000
+#
+# Scaling needs free cores: with fewer cores than shards the workers only
+# take turns. "coordinator" is the CPU share of the calling process; the
+# workers can at best speed things up until that side is saturated.
+import argparse
+import os
+import random
+import sys
+import time
+
+from bank.money import Money
+from bank.shards import ShardedEngine
+
+
+def workload(accounts, ops, rng):
+    numbers = [str(300000 + i) for i in range(accounts)]
+    batch = []
+    for _ in range(ops):
+        kind = rng.random()
+        number = rng.choice(numbers)
+        if kind < 0.25:
+            batch.append(("deposit", number, 25))
+        elif kind < 0.45:
+            batch.append(("withdraw", number, 10, 5))
+        else:
+            batch.append(("transfer", number, rng.choice(numbers), 5))
+    return numbers, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShardedEngine throughput by shard count")
+    parser.add_argument("--shards", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=400000)
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+    numbers, ops = workload(args.accounts, args.ops, random.Random(2))
+    print(f"cores: {os.cpu_count()}, accounts: {args.accounts}, ops: {args.ops}")
+    print(f"{'shards':>6} {'tx/s':>12} {'speedup':>8} {'cross-shard':>12} {'coordinator':>12} {'conserved':>10}")
+    base = None
+    failed = False
+    for shards in args.shards:
+        engine = ShardedEngine(shards)
+        try:
+            engine.run_batch([("open", number, "bench", 100000) for number in numbers])
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            results = []
+            for i in range(0, len(ops), args.batch):
+                results += engine.run_batch(ops[i:i + args.batch])
+            elapsed = time.perf_counter() - start
+            coordinator = (time.process_time() - cpu_start) / elapsed
+            net = sum(op[2] if op[0] == "deposit" else -op[2]
+                      for op, ok in zip(ops, results) if ok and op[0] != "transfer")
+            conserved = engine.total() == Money(len(numbers) * 100000 + net)
+            cross = sum(op[0] == "transfer" and engine.shard_for(op[1]) != engine.shard_for(op[2])
+                        for op in ops) / len(ops)
+        finally:
+            engine.close()
+        rate = len(ops) / elapsed
+        base = base or rate
+        failed = failed or not conserved
+        print(f"{shards:>6} {rate:>12,.0f} {rate / base:>7.2f}x {cross:>11.0%} {coordinator:>11.0%} "
+              f"{str(conserved):>10}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
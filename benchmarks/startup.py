@@ -0,0 +1,71 @@
+# Time from process start to the teller CLI's first prompt, against a budget,
+# plus the slowest imports reported by `python -X importtime`.
+#
+#   python -m bank.benchmarks.startup --budget-ms 250
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import bank
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(bank.__file__)))
+PROMPT = b"Login as"
+
+
+def child_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    env.pop("BANK_DATA_DIR", None)
+    return env
+
+
+def time_to_prompt():
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "bank.main"], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=child_env())
+    seen = b""
+    while PROMPT not in seen:
+        data = proc.stdout.read1(4096)
+        if not data:
+            break
+        seen += data
+    elapsed = time.perf_counter() - start
+    proc.kill()
+    proc.wait()
+    if PROMPT not in seen:
+        raise RuntimeError("CLI exited before showing its first prompt")
+    return elapsed
+
+
+def slowest_imports(count):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bank.main"],
+                            capture_output=True, text=True, env=child_env())
+    rows = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teller CLI start-up time")
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    times = sorted(time_to_prompt() for _ in range(args.runs))
+    median = times[len(times) // 2] * 1e3
+    print("slowest imports of bank.main (cumulative us):")
+    for cumulative, name in slowest_imports(8):
+        print(f"  {cumulative:>8} {name}")
+    print(f"time to first prompt: median {median:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if median > args.budget_ms:
+        print("FAILED: over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
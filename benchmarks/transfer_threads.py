@@ -0,0 +1,86 @@
+# Multi-threaded transfer stress test and throughput by thread count.
+#
+#   python -m bank.benchmarks.transfer_threads --accounts 1000 --transfers 200000
+#
+# Every run checks that the sum of balances is unchanged and exits non-zero
+# if money was created or lost. --unsafe adds a run without locks to show
+# the lost updates the engine prevents.
+import argparse
+from contextlib import contextmanager
+import random
+import sys
+import threading
+import time
+
+from bank.account import Account
+from bank.engine import TransactionEngine
+from bank.money import Money, ZERO
+
+
+class GlobalLockEngine(TransactionEngine):
+    def __init__(self):
+        super().__init__()
+        self._global = threading.Lock()
+
+    @contextmanager
+    def locked(self, *accounts):
+        with self._global:
+            yield
+
+
+class UnlockedEngine(TransactionEngine):
+    @contextmanager
+    def locked(self, *accounts):
+        yield
+
+
+def run(engine, accounts, transfers, threads):
+    per_thread = transfers // threads
+
+    def worker(seed):
+        rng = random.Random(seed)
+        amounts = [Money(c) for c in (5, 10, 25)]
+        for _ in range(per_thread):
+            a, b = rng.sample(accounts, 2)
+            engine.transfer(a, b, rng.choice(amounts), min_balance=ZERO)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent transfer stress test")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--transfers", type=int, default=200000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--unsafe", action="store_true")
+    args = parser.parse_args()
+    # Switch threads often so races surface quickly
+    sys.setswitchinterval(1e-6)
+
+    engines = [("per-account", TransactionEngine), ("global lock", GlobalLockEngine)]
+    if args.unsafe:
+        engines.append(("no locks", UnlockedEngine))
+    failed = False
+    print(f"{'engine':<12} {'threads':>8} {'transfers/s':>12} {'conserved':>10}")
+    for name, engine_class in engines:
+        for threads in args.threads:
+            accounts = [Account(str(1000 + i), balance=100) for i in range(args.accounts)]
+            expected = sum((acc.balance for acc in accounts), ZERO)
+            rate = run(engine_class(), accounts, args.transfers, threads)
+            conserved = sum((acc.balance for acc in accounts), ZERO) == expected
+            if not conserved and engine_class is not UnlockedEngine:
+                failed = True
+            print(f"{name:<12} {threads:>8} {rate:>12,.0f} {str(conserved):>10}")
+    if failed:
+        print("FAILED: total balance changed under a locking engine")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# Synthetic workload over the bank core: N users with M accounts each and a
+# weighted mix of operations, driven through the same code the CLI uses.
+#
+#   deposit, withdraw  Operations on the account, with the shared engine
+#   transfer           main.transfer_between_own_accounts / transfer_to_other_user,
+#                      answering their prompts from a script instead of input()
+#   login              main.auth (Authenticator) with a correct or wrong PIN
+#   history            main.view_transaction_history, first page
+#
+# --path service sends the same mix straight to main.service (BankService),
+# without prompts or receipts, which is what a batch job or the server pays.
+#
+# Reports ops/s and latency percentiles per operation and the peak RSS, and
+# writes them as JSON; --compare prints the change against an earlier file.
+#
+#   python -m bank.benchmarks.workload --users 1000 --accounts-per-user 3 --ops 200000 \
+#       --out results.json --compare baseline.json
+#   python -m bank.benchmarks.workload --path service
+import argparse
+import datetime
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from bank import main as bank
+from bank.account import Account, User
+from bank.money import Money
+from bank.operations import Operations
+from bank.pins import hash_pin
+
+DEFAULT_MIX = "deposit=30,withdraw=20,transfer=25,login=15,history=10"
+PIN = "1234"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"deposit", "withdraw", "transfer", "login", "history"}
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def populate(users, accounts_per_user, pin_iterations):
+    # Add synthetic users to the CLI's state; every account shares one PIN hash
+    pin_hash = hash_pin(PIN, iterations=pin_iterations)
+    generated = []
+    for u in range(users):
+        user = bank.users[f"load{u}"] = User(f"load{u}")
+        bank.registry.add_user(user)
+        for a in range(accounts_per_user):
+            user.add_account(Account(str(4000000 + u * accounts_per_user + a), balance=50,
+                                     pin_hash=pin_hash))
+        generated.append(user)
+    bank.aggregates.rebuild(bank.transaction_log, (acc for _, acc in bank.registry))
+    return generated
+
+
+def scripted(answers):
+    # input() replacement: the given answers, then "q" for any further prompt
+    answers = iter(answers)
+    return lambda prompt="": next(answers, "q")
+
+
+def make_ops(users, rng):
+    coins = ("0.05", "0.10", "0.25")
+    all_numbers = [acc.account_number for user in users for acc in user.accounts]
+
+    def deposit():
+        Operations(rng.choice(rng.choice(users).accounts), bank.engine).deposit(Money.parse(rng.choice(coins)))
+
+    def withdraw():
+        Operations(rng.choice(rng.choice(users).accounts), bank.engine).withdraw(Money.parse(rng.choice(coins)))
+
+    def transfer():
+        user = rng.choice(users)
+        amount = rng.choice(coins)
+        if len(user.accounts) > 1 and rng.random() < 0.5:
+            a, b = rng.sample(range(len(user.accounts)), 2)
+            bank.input = scripted([str(a + 1), str(b + 1), amount])
+            bank.transfer_between_own_accounts(user)
+        else:
+            bank.input = scripted([str(rng.randrange(len(user.accounts)) + 1), rng.choice(all_numbers), amount])
+            bank.transfer_to_other_user(user)
+
+    def login():
+        pin = PIN if rng.random() < 0.95 else "0000"
+        bank.auth.login(rng.choice(all_numbers), pin, source="workload")
+
+    def history():
+        bank.input = scripted(["", "", "", "", "q"])
+        bank.view_transaction_history(rng.choice(users))
+
+    return {"deposit": deposit, "withdraw": withdraw, "transfer": transfer, "login": login, "history": history}
+
+
+def make_service_ops(users, rng):
+    coins = (Money(5), Money(10), Money(25))
+    all_numbers = [acc.account_number for user in users for acc in user.accounts]
+    service = bank.service
+
+    def deposit():
+        user = rng.choice(users)
+        service.deposit(user, rng.choice(user.accounts).account_number, rng.choice(coins))
+
+    def withdraw():
+        user = rng.choice(users)
+        service.withdraw(user, rng.choice(user.accounts).account_number, rng.choice(coins))
+
+    def transfer():
+        user = rng.choice(users)
+        if len(user.accounts) > 1 and rng.random() < 0.5:
+            a, b = rng.sample(user.accounts, 2)
+            service.transfer(user, a.account_number, b.account_number, rng.choice(coins))
+        else:
+            service.transfer(user, rng.choice(user.accounts).account_number, rng.choice(all_numbers),
+                             rng.choice(coins))
+
+    def login():
+        pin = PIN if rng.random() < 0.95 else "0000"
+        service.login(rng.choice(all_numbers), pin, source="workload")
+
+    def history():
+        user = rng.choice(users)
+        service.history([acc.account_number for acc in user.accounts], limit=bank.HISTORY_PAGE_SIZE)
+
+    return {"deposit": deposit, "withdraw": withdraw, "transfer": transfer, "login": login, "history": history}
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] if sorted_values else 0
+
+
+def summarize(latencies, elapsed):
+    results = {}
+    for name, values in latencies.items():
+        values.sort()
+        results[name] = {
+            "count": len(values),
+            "ops_per_sec": len(values) / (sum(values) / 1e9) if values else 0.0,
+            "p50_us": percentile(values, 0.50) / 1e3,
+            "p90_us": percentile(values, 0.90) / 1e3,
+            "p99_us": percentile(values, 0.99) / 1e3,
+            "max_us": values[-1] / 1e3 if values else 0.0,
+        }
+    total = sum(len(values) for values in latencies.values())
+    results["total"] = {"count": total, "ops_per_sec": total / elapsed}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    print(f"\nvs. {baseline.get('commit') or 'baseline'}:")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before and before["ops_per_sec"]:
+            change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+            print(f"  {name:<9} ops/s {change:+7.1%}", end="")
+            if "p99_us" in result and before.get("p99_us"):
+                print(f"   p99 {result['p99_us'] / before['p99_us'] - 1:+7.1%}", end="")
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic workload over Account/Operations/Authenticator/main.py")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--accounts-per-user", type=int, default=3)
+    parser.add_argument("--ops", type=int, default=100000)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weights per operation (default {DEFAULT_MIX})")
+    parser.add_argument("--pin-iterations", type=int, default=1000,
+                        help="PBKDF2 iterations of the synthetic PINs (production uses 100000)")
+    parser.add_argument("--path", choices=("cli", "service"), default="cli",
+                        help="drive the CLI functions (default) or BankService directly")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    bank.init()
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    # One synthetic source would trip the per-source login limit at once
+    bank.auth.source_limiter = None
+    bank.auth.account_limiter = None
+    users = populate(args.users, args.accounts_per_user, args.pin_iterations)
+    ops = (make_service_ops if args.path == "service" else make_ops)(users, rng)
+    names = list(mix)
+    plan = rng.choices(names, weights=[mix[name] for name in names], k=args.ops)
+    latencies = {name: [] for name in names}
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")  # The CLI paths print receipts
+    start = time.perf_counter()
+    try:
+        for name in plan:
+            began = time.perf_counter_ns()
+            ops[name]()
+            latencies[name].append(time.perf_counter_ns() - began)
+    finally:
+        elapsed = time.perf_counter() - start
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "params": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+        "results": summarize(latencies, elapsed),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "ledger_rows": len(bank.transaction_log),
+    }
+    print(f"path: {args.path}, users: {args.users}, accounts: {args.users * args.accounts_per_user}, "
+          f"ops: {args.ops}, ledger rows: {report['ledger_rows']}")
+    print(f"{'op':<9} {'count':>8} {'ops/s':>10} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'max us':>10}")
+    for name in names:
+        r = report["results"][name]
+        print(f"{name:<9} {r['count']:>8} {r['ops_per_sec']:>10,.0f} {r['p50_us']:>9.1f} "
+              f"{r['p90_us']:>9.1f} {r['p99_us']:>9.1f} {r['max_us']:>10.1f}")
+    print(f"total: {report['results']['total']['ops_per_sec']:,.0f} ops/s, "
+          f"peak RSS {report['peak_rss_mb']:.0f} MB")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
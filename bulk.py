@@ -0,0 +1,300 @@
+import argparse
+from itertools import islice
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from bank.account import Account, User
+from bank.account_table import FROZEN, LOCKED, bool_column
+from bank.audit import FIELDS as AUDIT_COLUMNS
+from bank.money import Money
+from bank.txtypes import label_table
+
+# Bulk export and import of accounts, the ledger and the PIN-change audit
+# history, as CSV or Parquet (picked by the file extension), a chunk of
+# `chunk_rows` rows at a time. Each chunk is a set of NumPy/pandas columns
+# written or read in one call, never a dict per row.
+#
+#   accounts  account_number, user, balance, locked, frozen, locked_at,
+#             failed_attempts (+ pin_hash with pin_hashes=True), the same columns that
+#             bank.account_table.load_csv() reads
+#   ledger    ts (epoch microseconds), account_number, user, type (label), cents
+#   audit     account_number, user, datetime
+#
+# The audit history (bank.audit.AuditLog) holds only those three columns, so
+# PINs never leave. Account PIN hashes are left out unless asked for (a
+# backup that is to be restored with working logins needs them).
+#
+# Importing accounts updates ones that already exist (balance, status, PIN
+# hash if the file has one) and adds the rest. Ledger rows and audit entries
+# are appended, and only into an empty ledger or history, so importing the
+# same files twice cannot double them. Import into a new BANK_DATA_DIR to
+# restore or migrate.
+#
+# Parquet needs pyarrow, which is optional; CSV works without it.
+#
+#   python -m bank.bulk export DIR [--format parquet] [--pin-hashes]
+#   python -m bank.bulk import DIR
+CHUNK_ROWS = 1 << 20
+TABLES = ("accounts", "ledger", "audit")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet files need pyarrow (pip install pyarrow); use CSV without it") from None
+    return pyarrow, pyarrow.parquet
+
+
+def _is_parquet(path):
+    return path.endswith(".parquet")
+
+
+class _Writer:
+    # Appends column chunks to a CSV or Parquet file; the file appears under
+    # its name only once close() has written all of it
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._tmp = path + ".tmp"
+        if _is_parquet(path):
+            self._pa, self._pq = _pyarrow()
+            self._parquet = None  # ParquetWriter, opened with the first chunk's schema
+        else:
+            self._csv = open(self._tmp, "w", newline="")
+
+    def write(self, columns):
+        # columns: Dict: name -> NumPy array or list, all the same length
+        if _is_parquet(self.path):
+            table = self._pa.table(columns)
+            if self._parquet is None:
+                self._parquet = self._pq.ParquetWriter(self._tmp, table.schema)
+            self._parquet.write_table(table)
+        else:
+            pd.DataFrame(columns).to_csv(self._csv, header=self.rows == 0, index=False, float_format="%.2f")
+        self.rows += len(next(iter(columns.values())))
+
+    def close(self, header=None):
+        # header: column names, for a file that got no chunks
+        if _is_parquet(self.path):
+            if self._parquet is None:
+                self.write({name: [] for name in header})
+            self._parquet.close()
+        else:
+            if self.rows == 0 and header:
+                self._csv.write(",".join(header) + "\n")
+            self._csv.close()
+        os.replace(self._tmp, self.path)
+
+
+def _chunks(path, chunk_rows, strings):
+    # DataFrames of up to chunk_rows rows; `strings` are read as text
+    if _is_parquet(path):
+        _, pq = _pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, dtype={name: str for name in strings}, keep_default_na=False,
+                               chunksize=chunk_rows)
+
+
+def export_accounts(path, users, chunk_rows=CHUNK_ROWS, pin_hashes=False):
+    writer = _Writer(path)
+    pairs = ((user.username, acc) for user in list(users.values()) for acc in list(user.accounts))
+    while True:
+        chunk = list(islice(pairs, chunk_rows))
+        if not chunk:
+            break
+        columns = {
+            "account_number": [acc.account_number for _, acc in chunk],
+            "user": [name for name, _ in chunk],
+            "balance": np.array([acc.balance.cents for _, acc in chunk], dtype=np.int64) / 100,
+            "locked": np.array([acc.locked for _, acc in chunk], dtype=bool),
+            "frozen": np.array([acc.frozen for _, acc in chunk], dtype=bool),
+            "locked_at": np.array([acc.locked_at for _, acc in chunk], dtype=np.float64),
+            "failed_attempts": np.array([acc.failed_attempts for _, acc in chunk], dtype=np.int64),
+        }
+        if pin_hashes:
+            columns["pin_hash"] = [acc.pin_hash or "" for _, acc in chunk]
+        writer.write(columns)
+    writer.close(["account_number", "user", "balance", "locked", "frozen", "locked_at", "failed_attempts"]
+                 + (["pin_hash"] if pin_hashes else []))
+    return writer.rows
+
+
+def export_ledger(path, ledger, chunk_rows=CHUNK_ROWS):
+    # Rows present when the export starts; later appends are left for the next one
+    labels = label_table()
+    writer = _Writer(path)
+    tables = {}  # Name arrays by the id of the list they were made from
+    for cols, accounts, users in ledger.chunks(0, len(ledger)):
+        for names in (accounts, users):
+            if id(names) not in tables or len(tables[id(names)]) < len(names):
+                tables[id(names)] = np.array(names, dtype=object)
+        for start in range(0, len(cols["ts"]), chunk_rows):
+            part = {name: column[start:start + chunk_rows] for name, column in cols.items()}
+            writer.write({
+                "ts": part["ts"],
+                "account_number": tables[id(accounts)][part["account"]],
+                "user": tables[id(users)][part["user"]],
+                "type": labels[part["type"]],
+                "cents": part["cents"],
+            })
+    writer.close(["ts", "account_number", "user", "type", "cents"])
+    return writer.rows
+
+
+def export_audit(path, update_history, chunk_rows=CHUNK_ROWS):
+    # update_history: an AuditLog; entries present when the export starts
+    rows = len(update_history)
+    writer = _Writer(path)
+    for start in range(0, rows, chunk_rows):
+        writer.write({name: column[start:min(start + chunk_rows, rows)]
+                      for name, column in zip(AUDIT_COLUMNS, update_history.columns)})
+    writer.close(AUDIT_COLUMNS)
+    return writer.rows
+
+
+def import_accounts(path, users, registry, chunk_rows=CHUNK_ROWS):
+    # (accounts added, accounts updated)
+    added = updated = 0
+    for frame in _chunks(path, chunk_rows, ("account_number", "user", "pin_hash")):
+        n = len(frame)
+        cents = np.rint(frame["balance"].to_numpy(dtype=np.float64) * 100).astype(np.int64).tolist()
+        flags = np.zeros(n, dtype=np.uint8)
+        for name, flag in (("locked", LOCKED), ("frozen", FROZEN)):
+            if name in frame:
+                flags |= np.where(bool_column(frame[name]), flag, 0).astype(np.uint8)
+        # Lockout times; a lock without one (or from a file without them) starts now
+        locked_at = (pd.to_numeric(frame["locked_at"].replace("", np.nan)).to_numpy(np.float64)
+                     if "locked_at" in frame else np.full(n, np.nan)).tolist()
+        failed = (frame["failed_attempts"].to_numpy(dtype=np.int64) if "failed_attempts" in frame
+                  else np.zeros(n, dtype=np.int64)).tolist()
+        pins = frame["pin_hash"].tolist() if "pin_hash" in frame else [""] * n
+        for number, name, balance, flag, attempts, pin, when in zip(frame["account_number"].tolist(),
+                                                                    frame["user"].tolist(), cents, flags.tolist(),
+                                                                    failed, pins, locked_at):
+            owner, acc = registry.lookup(number)
+            if acc is None:
+                owner = users.get(name)
+                if owner is None:
+                    owner = users[name] = User(name)
+                    registry.add_user(owner)
+                acc = Account(number, balance=Money(balance), pin_hash=pin or None)
+                owner.add_account(acc)
+                added += 1
+            else:
+                if owner.username != name:
+                    raise ValueError(f"Account {number} belongs to {owner.username}, not {name}.")
+                acc.balance = Money(balance)
+                if pin:
+                    acc.pin_hash = pin
+                updated += 1
+            acc.locked = bool(flag & LOCKED)
+            acc.locked_at = (time.time() if when != when else when) if acc.locked else None  # NaN: none
+            acc.frozen = bool(flag & FROZEN)
+            acc.failed_attempts = attempts
+    return added, updated
+
+
+def import_ledger(path, ledger, chunk_rows=CHUNK_ROWS):
+    if len(ledger):
+        raise ValueError(f"The ledger already has {len(ledger)} rows; import the ledger into an empty one.")
+    rows = 0
+    for frame in _chunks(path, chunk_rows, ("account_number", "user", "type")):
+        ledger.extend_micros(zip(frame["account_number"].tolist(), frame["user"].tolist(),
+                                 frame["ts"].to_numpy(dtype=np.int64).tolist(), frame["type"].tolist(),
+                                 frame["cents"].to_numpy(dtype=np.int64).tolist()))
+        rows += len(frame)
+    return rows
+
+
+def import_audit(path, update_history, chunk_rows=CHUNK_ROWS):
+    # update_history: an AuditLog
+    if len(update_history):
+        raise ValueError(f"The audit history already has {len(update_history)} entries; "
+                         "import it into an empty one.")
+    rows = 0
+    for frame in _chunks(path, chunk_rows, AUDIT_COLUMNS):
+        # Only the audit columns are kept, whatever else the file has
+        update_history.extend_columns(*(frame[name].tolist() for name in AUDIT_COLUMNS))
+        rows += len(frame)
+    return rows
+
+
+def _paths(directory, fmt):
+    return {table: os.path.join(directory, f"{table}.{fmt}") for table in TABLES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import accounts, ledger and PIN audit history")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write the state of BANK_DATA_DIR to DIR")
+    export.add_argument("dir")
+    export.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    export.add_argument("--pin-hashes", action="store_true", help="include account PIN hashes")
+    load = commands.add_parser("import", help="load DIR into BANK_DATA_DIR")
+    load.add_argument("dir")
+    load.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    for command in (export, load):
+        command.add_argument("--tables", default=",".join(TABLES), help="comma-separated subset of "
+                             + ", ".join(TABLES))
+        command.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    tables = args.tables.split(",")
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    paths = _paths(args.dir, args.format)
+    if args.format == "parquet":
+        try:
+            _pyarrow()
+        except ImportError as e:
+            parser.error(str(e))
+
+    from bank import main as bank
+    if args.command == "export":
+        bank.open_storage(read_only=True)
+        os.makedirs(args.dir, exist_ok=True)
+        for table in tables:
+            began = time.perf_counter()
+            if table == "accounts":
+                rows = export_accounts(paths[table], bank.users, args.chunk_rows, args.pin_hashes)
+            elif table == "ledger":
+                rows = export_ledger(paths[table], bank.transaction_log, args.chunk_rows)
+            else:
+                rows = export_audit(paths[table], bank.update_history, args.chunk_rows)
+            print(f"Wrote {paths[table]}: {rows} rows in {time.perf_counter() - began:.2f} s")
+        return
+    if not os.environ.get("BANK_DATA_DIR"):
+        parser.error("import needs BANK_DATA_DIR to keep what it loads")
+    bank.open_storage()
+    try:
+        for table in tables:
+            began = time.perf_counter()
+            if table == "accounts":
+                added, updated = import_accounts(paths[table], bank.users, bank.registry, args.chunk_rows)
+                done = f"{added} accounts added, {updated} updated"
+            elif table == "ledger":
+                done = f"{import_ledger(paths[table], bank.transaction_log, args.chunk_rows)} ledger rows"
+            else:
+                done = f"{import_audit(paths[table], bank.update_history, args.chunk_rows)} audit entries"
+            print(f"Read {paths[table]}: {done} in {time.perf_counter() - began:.2f} s")
+        bank.aggregates.rebuild(bank.transaction_log, (acc for _, acc in bank.registry))
+    except ValueError as e:
+        # Nothing was journalled, so without a checkpoint BANK_DATA_DIR is as it was
+        bank.storage.close(checkpoint=False)
+        sys.exit(f"Import failed, BANK_DATA_DIR left unchanged: {e}")
+    except BaseException:
+        bank.storage.close(checkpoint=False)
+        raise
+    bank.storage.close()  # Checkpoints: the import is kept as one snapshot, not journaled per row
+
+
+if __name__ == "__main__":
+    main()
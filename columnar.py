@@ -0,0 +1,131 @@
+from array import array
+import datetime
+
+# Rows per chunk. Chunks are allocated at full size up front and never
+# resized, so NumPy views over them stay valid while appends continue.
+CHUNK_ROWS = 1 << 16
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+# Column name -> array typecode
+COLUMNS = {
+    "ts": "q",       # int64 epoch microseconds (wall clock, as datetime.now() reports it)
+    "cents": "q",    # int64 amount in cents
+    "account": "i",  # int32 interned account number
+    "user": "i",     # int32 interned username
+    "type": "b",     # int8 transaction type code (see bank.txtypes)
+}
+
+
+def to_micros(when):
+    return (when - _EPOCH) // _MICROSECOND
+
+
+def from_micros(micros):
+    return _EPOCH + datetime.timedelta(microseconds=micros)
+
+
+class Interner:
+    def __init__(self):
+        self._ids = {}  # Dict: value -> id
+        self.values = []  # List: id -> value
+
+    def intern(self, value):
+        ident = self._ids.get(value)
+        if ident is None:
+            ident = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return ident
+
+    def get(self, value):
+        return self._ids.get(value)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class Chunk:
+    __slots__ = ("ts", "cents", "account", "user", "type", "size")
+
+    def __init__(self):
+        for name, typecode in COLUMNS.items():
+            setattr(self, name, array(typecode, bytes(array(typecode).itemsize * CHUNK_ROWS)))
+        self.size = 0
+
+    def numpy(self):
+        # Zero-copy views over the filled part of each column
+        import numpy as np
+        return {
+            name: np.frombuffer(getattr(self, name), dtype=np.dtype(typecode), count=self.size)
+            for name, typecode in COLUMNS.items()
+        }
+
+
+class ColumnarStore:
+    def __init__(self):
+        self.accounts = Interner()
+        self.users = Interner()
+        self._chunks = []
+        self._size = 0
+
+    def append(self, ts, cents, account, user, type_code):
+        chunk = self._chunks[-1] if self._chunks else None
+        if chunk is None or chunk.size == CHUNK_ROWS:
+            chunk = Chunk()
+            self._chunks.append(chunk)
+        i = chunk.size
+        chunk.ts[i] = ts
+        chunk.cents[i] = cents
+        chunk.account[i] = account
+        chunk.user[i] = user
+        chunk.type[i] = type_code
+        chunk.size = i + 1
+        offset = self._size
+        self._size = offset + 1
+        return offset
+
+    def row(self, offset):
+        if not 0 <= offset < self._size:
+            raise IndexError("ledger offset out of range")
+        chunk = self._chunks[offset // CHUNK_ROWS]
+        i = offset % CHUNK_ROWS
+        return chunk.ts[i], chunk.cents[i], chunk.account[i], chunk.user[i], chunk.type[i]
+
+    def ts_at(self, offset):
+        return self._chunks[offset // CHUNK_ROWS].ts[offset % CHUNK_ROWS]
+
+    def type_at(self, offset):
+        return self._chunks[offset // CHUNK_ROWS].type[offset % CHUNK_ROWS]
+
+    def chunks(self):
+        return list(self._chunks)
+
+    def numpy_chunks(self):
+        return [chunk.numpy() for chunk in self._chunks]
+
+    def numpy_range(self, start=0, stop=None):
+        # Columns for rows [start, stop) as NumPy arrays; a view when the range
+        # sits inside one chunk, a concatenated copy otherwise.
+        import numpy as np
+        stop = self._size if stop is None else min(stop, self._size)
+        parts = []
+        for index in range(start // CHUNK_ROWS, (stop - 1) // CHUNK_ROWS + 1 if stop > start else 0):
+            base = index * CHUNK_ROWS
+            views = self._chunks[index].numpy()
+            lo, hi = max(start - base, 0), min(stop - base, CHUNK_ROWS)
+            parts.append({name: view[lo:hi] for name, view in views.items()})
+        if len(parts) == 1:
+            return parts[0]
+        return {
+            name: np.concatenate([part[name] for part in parts]) if parts
+            else np.empty(0, dtype=np.dtype(typecode))
+            for name, typecode in COLUMNS.items()
+        }
+
+    def nbytes(self):
+        per_row = sum(array(typecode).itemsize for typecode in COLUMNS.values())
+        return len(self._chunks) * CHUNK_ROWS * per_row
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+import threading
+import time
+
+from bank import metrics
+from bank.money import Money, ZERO, MIN_BALANCE
+
+
+class TransactionEngine:
+    # Serializes balance changes per account. Multi-account operations take
+    # their locks in account-number order, so two transfers between the same
+    # accounts in opposite directions can never deadlock.
+    def __init__(self):
+        self._locks = {}  # Dict: account_number -> Lock
+        self._locks_guard = threading.Lock()
+
+    def lock_for(self, account):
+        lock = self._locks.get(account.account_number)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(account.account_number, threading.Lock())
+        return lock
+
+    @contextmanager
+    def locked(self, *accounts):
+        ordered = sorted({acc.account_number: acc for acc in accounts}.items())
+        locks = [self.lock_for(acc) for _, acc in ordered]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    if metrics.ENABLED:
+        _lock_wait = metrics.histogram("bank_lock_wait_seconds", "Time spent waiting for account locks").observe_ns
+
+        @contextmanager
+        def locked(self, *accounts):
+            # As above, also recording how long taking the locks took
+            ordered = sorted({acc.account_number: acc for acc in accounts}.items())
+            locks = [self.lock_for(acc) for _, acc in ordered]
+            began = time.perf_counter_ns()
+            for lock in locks:
+                lock.acquire()
+            self._lock_wait(time.perf_counter_ns() - began)
+            try:
+                yield
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+
+    def deposit(self, account, amount):
+        with self.locked(account):
+            return account.deposit(amount)
+
+    def withdraw(self, account, amount, min_balance=ZERO):
+        amount = Money.from_dollars(amount)
+        with self.locked(account):
+            if amount <= ZERO or account.balance - amount < min_balance:
+                return False
+            account.balance -= amount
+            return True
+
+    def transfer(self, from_acc, to_acc, amount, min_balance=MIN_BALANCE):
+        amount = Money.from_dollars(amount)
+        if from_acc is to_acc or amount <= ZERO:
+            return False
+        with self.locked(from_acc, to_acc):
+            if from_acc.balance - amount < min_balance:
+                return False
+            from_acc.balance -= amount
+            to_acc.balance += amount
+            return True
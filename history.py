@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from bank.txtypes import sign_table
+
+
+class BalanceHistory:
+    # Running balance of every account after each of its ledger rows. Each
+    # update() only reads the rows appended since the previous one and carries
+    # the last known balance per account forward.
+    def __init__(self, ledger, opening_balances):
+        self.ledger = ledger
+        self.opening = dict(opening_balances)  # Dict: account_number -> cents before the first row
+        self._last = dict(self.opening)  # Dict: account_number -> cents after the last processed row
+        self._processed = 0
+        self._frames = []
+
+    @classmethod
+    def from_accounts(cls, ledger, accounts):
+        # Opening balance = current balance minus everything the ledger says
+        # has happened to the account since.
+        moved = {}
+        for cols, names, _ in ledger.chunks():
+            signed = cols["cents"] * sign_table()[cols["type"]]
+            net = np.bincount(cols["account"], weights=signed, minlength=len(names))
+            for account_id in np.flatnonzero(net).tolist():
+                moved[names[account_id]] = moved.get(names[account_id], 0) + int(net[account_id])
+        opening = {account.account_number: account.balance.cents - moved.get(account.account_number, 0)
+                   for account in accounts}
+        return cls(ledger, opening)
+
+    def update(self):
+        # Fold in rows appended since the last call; returns their balance rows
+        stop = len(self.ledger)
+        if stop == self._processed:
+            return self._empty()
+        parts = list(self.ledger.chunks(self._processed, stop))
+        frames, tables = [], {}  # Name arrays by the id of the list they were made from, after the columns
+        for cols, names, _ in parts:
+            table = tables.get(id(names))
+            if table is None:
+                table = tables[id(names)] = np.array(names, dtype=object)
+            frames.append(pd.DataFrame({
+                "account_number": table[cols["account"]],
+                "datetime": pd.to_datetime(cols["ts"], unit="us"),
+                "signed": cols["cents"] * sign_table()[cols["type"]],
+            }))
+        self._processed = stop
+        frame = pd.concat(frames, ignore_index=True)
+        frame = frame.sort_values("datetime", kind="stable")
+        carry = frame["account_number"].map(self._last).fillna(0).astype(np.int64)
+        frame["balance_cents"] = carry + frame.groupby("account_number", sort=False)["signed"].cumsum()
+        self._last.update(frame.groupby("account_number", sort=False)["balance_cents"].last().to_dict())
+        frame["balance"] = frame["balance_cents"] / 100
+        frame = frame[["account_number", "datetime", "balance"]]
+        self._frames.append(frame)
+        return frame
+
+    def _empty(self):
+        return pd.DataFrame({"account_number": pd.Series(dtype=object),
+                             "datetime": pd.Series(dtype="datetime64[us]"),
+                             "balance": pd.Series(dtype=float)})
+
+    def history(self):
+        # Every balance point seen so far, oldest first
+        if not self._frames:
+            return self._empty()
+        if len(self._frames) > 1:
+            self._frames = [pd.concat(self._frames, ignore_index=True)]
+        return self._frames[0]
+
+    def current(self):
+        # Dict: account_number -> latest balance in dollars
+        return {number: cents / 100 for number, cents in self._last.items()}
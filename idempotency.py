@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class RequestIdReused(Exception):
+    # A request id came back with a different request than the one it was first used for
+    pass
+
+
+class IdempotencyCache:
+    # Results of recent requests by request id, so a client that retries
+    # after a timeout gets the original result instead of moving the money
+    # a second time. run() calls apply() once per key: a replay after it
+    # finished returns the stored result, and a replay that arrives while it
+    # is still running waits for it. Failures returned by apply() (such as
+    # insufficient funds) are results like any other; if apply() raises,
+    # nothing is stored and the next attempt runs it again.
+    #
+    # Finished entries are kept for `ttl` seconds and at most `max_entries`
+    # of them, oldest dropped first; a retry that comes after its entry is
+    # gone runs as a new request. Entries are in memory only and are not
+    # journalled, so a restart forgets them all the same way.
+    def __init__(self, max_entries=100000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.replays = 0
+        self.evictions = 0  # Entries dropped for space before they expired
+        self._done = OrderedDict()  # key -> (fingerprint, result, expiry time), oldest first
+        self._running = {}  # key -> [fingerprint, finished, result]
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)  # Notified when any running request ends
+
+    def run(self, key, fingerprint, apply, now=None):
+        # apply()'s result, computed at most once per key. fingerprint says
+        # what was asked (operation, accounts, amount); the same key with a
+        # different fingerprint is a RequestIdReused.
+        with self._lock:
+            while True:
+                self._expire(time.time() if now is None else now)
+                entry = self._done.get(key)
+                if entry is not None:
+                    if entry[0] != fingerprint:
+                        raise RequestIdReused(key)
+                    self.replays += 1
+                    return entry[1]
+                running = self._running.get(key)
+                if running is None:
+                    running = self._running[key] = [fingerprint, False, None]
+                    break
+                if running[0] != fingerprint:
+                    raise RequestIdReused(key)
+                while self._running.get(key) is running:
+                    self._finished.wait()
+                if running[1]:
+                    self.replays += 1
+                    return running[2]
+                # The first attempt raised: try again, possibly as the one running it
+        try:
+            result = apply()
+        except BaseException:
+            with self._lock:
+                del self._running[key]
+                self._finished.notify_all()
+            raise
+        with self._lock:
+            del self._running[key]
+            running[1], running[2] = True, result
+            self._done[key] = (fingerprint, result, (time.time() if now is None else now) + self.ttl)
+            if len(self._done) > self.max_entries:
+                self._done.popitem(last=False)
+                self.evictions += 1
+            self._finished.notify_all()
+        return result
+
+    def _expire(self, now):
+        # Entries are in completion order, so the expired ones are at the front
+        while self._done:
+            key, entry = next(iter(self._done.items()))
+            if entry[2] > now:
+                break
+            del self._done[key]
+
+    def __len__(self):
+        return len(self._done)
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+import zlib
+
+SYNC_POLICIES = ("always", "batch", "none")
+
+
+def _segment_name(start_lsn):
+    return f"wal-{start_lsn:012d}.log"
+
+
+def segment_files(directory):
+    # (start_lsn, path) for every journal segment, oldest first
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith("wal-") and name.endswith(".log"):
+            found.append((int(name[4:-4]), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def read_segment(path):
+    # Yield (lsn, record) until the end of the file or the first torn line
+    with open(path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                return
+            crc, _, payload = raw[:-1].partition(b" ")
+            try:
+                if int(crc, 16) != zlib.crc32(payload):
+                    return
+                lsn, record = json.loads(payload)
+            except ValueError:
+                return
+            yield lsn, record
+
+
+class Journal:
+    def __init__(self, directory, sync="always", batch_size=64, batch_interval=0.05, next_lsn=1):
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f"sync must be one of {', '.join(SYNC_POLICIES)}")
+        self.directory = directory
+        self.sync_policy = sync
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.fsyncs = 0
+        self._lock = threading.Lock()  # Guards the buffer, lsn counter and file writes
+        self._sync_lock = threading.Lock()  # One fsync leader at a time
+        self._buffer = []
+        self._lsn = next_lsn - 1  # Last lsn handed out
+        self._written_lsn = self._lsn  # Last lsn handed to the OS
+        self._synced_lsn = self._lsn  # Last lsn known to be on disk
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(os.path.join(directory, _segment_name(next_lsn)), "ab")
+
+    @property
+    def lsn(self):
+        return self._lsn
+
+    def append(self, record):
+        with self._lock:
+            self._lsn += 1
+            lsn = self._lsn
+            payload = json.dumps([lsn, record], separators=(",", ":")).encode()
+            self._buffer.append(b"%08x %s\n" % (zlib.crc32(payload), payload))
+        return lsn
+
+    def commit(self, record):
+        # Append one record and make it as durable as the sync policy promises
+        lsn = self.append(record)
+        if self.sync_policy == "always":
+            self.sync(lsn)
+        elif self.sync_policy == "batch":
+            if (lsn - self._synced_lsn >= self.batch_size
+                    or time.monotonic() - self._last_sync >= self.batch_interval):
+                self.sync(lsn)
+            else:
+                self.flush()
+        else:
+            self.flush()
+        return lsn
+
+    def flush(self):
+        with self._lock:
+            self._write_buffer()
+
+    def _write_buffer(self):
+        if self._buffer:
+            self._file.write(b"".join(self._buffer))
+            self._buffer = []
+            self._file.flush()
+            self._written_lsn = self._lsn
+
+    def sync(self, lsn=None):
+        # Group commit: whoever holds _sync_lock writes and fsyncs every record
+        # buffered so far, so callers queued behind it usually find their lsn
+        # already durable and return without a disk sync of their own.
+        target = self._lsn if lsn is None else lsn
+        if self._synced_lsn >= target:
+            return
+        with self._sync_lock:
+            if self._synced_lsn >= target:
+                return
+            with self._lock:
+                self._write_buffer()
+                covered = self._written_lsn
+                fileno = self._file.fileno()
+            os.fsync(fileno)
+            self.fsyncs += 1
+            self._synced_lsn = covered
+            self._last_sync = time.monotonic()
+
+    def rotate(self):
+        # Start a new segment and return the last lsn of the old ones, all of
+        # which are on disk by the time this returns.
+        with self._sync_lock:
+            with self._lock:
+                self._write_buffer()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._synced_lsn = self._lsn
+                self._file = open(os.path.join(self.directory, _segment_name(self._lsn + 1)), "ab")
+                return self._lsn
+
+    def close(self):
+        self.sync()
+        self._file.close()
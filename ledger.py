@@ -0,0 +1,289 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+import heapq
+import threading
+
+from bank.columnar import COLUMNS, ColumnarStore, from_micros, to_micros
+from bank.money import Money
+from bank.txtypes import for_code, resolve
+
+
+class _InOrder:
+    # Offsets of the rows that arrived in time order: every offset below
+    # `start`, then the ones in `tail`. Indexable, so bisect works on it.
+    def __init__(self, start):
+        self.start = start
+        self.tail = array("q")
+
+    def __len__(self):
+        return self.start + len(self.tail)
+
+    def __getitem__(self, i):
+        return i if i < self.start else self.tail[i - self.start]
+
+
+class Ledger:
+    # Offsets are indexed per account in (timestamp, offset) order, so time
+    # ranges are found by bisecting on the stored timestamps. Rows normally
+    # arrive in time order and are simply appended to the index; a row that
+    # arrives late (a concurrent writer, a replay) is inserted in place in its
+    # account's index and kept in a separate time-sorted list of late rows, so
+    # the time order of the whole ledger is the in-order rows merged with the
+    # late ones and an append never copies or shifts the full index.
+    #
+    # Rows sealed into segments by an earlier run can stay on disk: after
+    # attach(), offsets below `base` are read from the SegmentReader and
+    # the store holds only the rows from `base` on. Offsets in the indexes
+    # below are store offsets; the methods take and return ledger offsets.
+    def __init__(self):
+        self.store = ColumnarStore()  # Append-only typed columns, one row per transaction
+        self.base = 0  # Ledger offset of the store's first row
+        self.archive = None  # SegmentReader over rows [0, base), or None
+        self._by_account = {}  # Dict: account id -> offsets into the store, time-sorted
+        self._in_order = None  # _InOrder, once a row arrived out of order
+        self._late = array("q")  # Offsets of rows that arrived out of order, time-sorted
+        self._last_ts = -1 << 63  # Latest timestamp appended so far
+        self._counts = {}  # Dict: account_number -> number of transactions
+        self._lock = threading.Lock()  # Appends come from many sessions at once
+
+    def append(self, account_number, user, when, tx_type, amount):
+        return self.append_micros(account_number, user, to_micros(when), tx_type, amount.cents)
+
+    def append_micros(self, account_number, user, ts, tx_type, cents):
+        # tx_type is a TxType or its label
+        store = self.store
+        with self._lock:
+            account_id = store.accounts.intern(account_number)
+            offset = store.append(
+                ts,
+                cents,
+                account_id,
+                store.users.intern(user),
+                resolve(tx_type).code
+            )
+            offsets = self._by_account.get(account_id)
+            if offsets is None:
+                offsets = self._by_account[account_id] = array("q")
+            self._index(offsets, offset, ts)
+            self._counts[account_number] = self._counts.get(account_number, 0) + 1
+        return self.base + offset
+
+    def _key(self, offset):
+        return self.store.ts_at(offset), offset
+
+    def _index(self, offsets, offset, ts):
+        # Add a new row to an account's index and keep the global order
+        if offsets and ts < self.store.ts_at(offsets[-1]):
+            offsets.insert(bisect_right(offsets, (ts, offset), key=self._key), offset)
+        else:
+            offsets.append(offset)
+        if ts < self._last_ts:
+            if self._in_order is None:
+                self._in_order = _InOrder(offset)
+            late = self._late
+            late.insert(bisect_right(late, (ts, offset), key=self._key), offset)
+        else:
+            if self._in_order is not None:
+                self._in_order.tail.append(offset)
+            self._last_ts = ts
+
+    def extend_micros(self, rows):
+        # Bulk append of (account_number, user, epoch micros, type, cents) rows
+        # under one lock acquisition; returns the offset of the first row.
+        store = self.store
+        accounts, users = store.accounts, store.users
+        by_account, counts = self._by_account, self._counts
+        ts_at = store.ts_at
+        with self._lock:
+            first = len(store)
+            last_ts = self._last_ts
+            for account_number, user, ts, tx_type, cents in rows:
+                account_id = accounts.intern(account_number)
+                offset = store.append(ts, cents, account_id, users.intern(user), resolve(tx_type).code)
+                offsets = by_account.get(account_id)
+                if offsets is None:
+                    offsets = by_account[account_id] = array("q")
+                if ts >= last_ts and (not offsets or ts >= ts_at(offsets[-1])):
+                    offsets.append(offset)  # In time order: the common case
+                    if self._in_order is not None:
+                        self._in_order.tail.append(offset)
+                    last_ts = ts
+                else:
+                    self._last_ts = last_ts
+                    self._index(offsets, offset, ts)
+                    last_ts = self._last_ts
+                counts[account_number] = counts.get(account_number, 0) + 1
+            self._last_ts = last_ts
+        return self.base + first
+
+    def attach(self, archive):
+        # Serve rows [0, len(archive)) from a SegmentReader over contiguous
+        # segments from offset 0 rather than memory; the ledger must be empty
+        with self._lock:
+            if len(self.store) or self.archive is not None:
+                raise ValueError("an archive can only be attached to an empty ledger")
+            self.archive = archive
+            self.base = len(archive)
+            self._counts = archive.counts()
+
+    def _archived(self, offset):
+        # The archive's record for one row
+        records = next(self.archive.rows(offset, offset + 1), None) if offset >= 0 else None
+        if records is None or not len(records):
+            raise IndexError("ledger offset out of range")
+        return records
+
+    def raw(self, offset):
+        # (account_number, user, epoch micros, type, cents) for one row
+        if offset < self.base:
+            archive = self.archive
+            ts, cents, account_id, user_id, type_id = self._archived(offset)[
+                ["ts", "cents", "account", "user", "type"]][0].tolist()
+            return (archive.accounts[account_id], archive.users[user_id], ts,
+                    for_code(type_id).label, cents)
+        store = self.store
+        ts, cents, account_id, user_id, type_id = store.row(offset - self.base)
+        return (store.accounts.values[account_id], store.users.values[user_id], ts,
+                for_code(type_id).label, cents)
+
+    def entry(self, offset):
+        # Materialize one row in the shape the menus print
+        if offset < self.base:
+            return self.archive.entries(self._archived(offset))[0]
+        return self._entry(offset - self.base)
+
+    def _entry(self, offset):
+        # entry() for a store offset
+        store = self.store
+        ts, cents, account_id, user_id, type_id = store.row(offset)
+        return {
+            "account_number": store.accounts.values[account_id],
+            "user": store.users.values[user_id],
+            "datetime": from_micros(ts).strftime('%Y-%m-%d %H:%M:%S'),
+            "type": for_code(type_id).label,
+            "amount": Money(cents)
+        }
+
+    def __len__(self):
+        return self.base + len(self.store)
+
+    def __iter__(self):
+        if self.archive is not None:
+            for records in self.archive.rows(0, self.base):
+                yield from self.archive.entries(records)
+        for offset in range(len(self.store)):
+            yield self._entry(offset)
+
+    def __getitem__(self, offset):
+        return self.entry(offset)
+
+    def chunks(self, start=0, stop=None):
+        # Rows [start, stop) (default: all) as (cols, accounts, users): NumPy
+        # columns as in ColumnarStore.numpy_range, whose "account" and "user"
+        # ids index the accounts and users lists. Archived rows come a
+        # segment at a time in offset order, then the store a chunk at a
+        # time, as views.
+        stop = len(self) if stop is None else stop
+        if self.archive is not None and start < self.base:
+            archive = self.archive
+            for records in archive.rows(start, min(stop, self.base)):
+                yield {name: records[name] for name in COLUMNS}, archive.accounts, archive.users
+        store = self.store
+        first = self.base
+        for chunk in store.chunks():
+            cols = chunk.numpy()
+            size = len(cols["ts"])
+            lo, hi = max(start - first, 0), min(stop - first, size)
+            if lo < hi:
+                yield {name: view[lo:hi] for name, view in cols.items()}, store.accounts.values, store.users.values
+            first += size
+            if first >= stop:
+                break
+
+    def for_account(self, account_number):
+        # The account's rows in (timestamp, offset) order
+        archived = []
+        if self.archive is not None:
+            records = self.archive.account_records(account_number)
+            archived = zip(records["ts"].tolist(), records["offset"].tolist(), self.archive.entries(records))
+        with self._lock:
+            account_id = self.store.accounts.get(account_number)
+            offsets = list(self._by_account.get(account_id, ()))
+            kept = [(self.store.ts_at(offset), self.base + offset, offset) for offset in offsets]
+        return [entry if isinstance(entry, dict) else self._entry(entry)
+                for _, _, entry in heapq.merge(archived, kept, key=lambda row: row[:2])]
+
+    def query(self, account_numbers=None, start=None, end=None, types=None, cursor=None, limit=50):
+        # Rows of the given accounts (all if None) with start <= time < end and
+        # a type in `types` (TxTypes or labels; all if None), oldest first, at
+        # most `limit` per call. Returns (entries, next_cursor); pass the
+        # cursor back to get the following page, None means no more rows.
+        # The page is picked under the ledger lock, so a late row inserted
+        # into an index meanwhile cannot make the scan skip or repeat rows.
+        # Archived rows come from the segments and are merged in by
+        # (timestamp, offset), the order the cursor holds.
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError("limit must be a positive integer.")
+        store = self.store
+        low = (to_micros(start), -1) if start is not None else None
+        if cursor is not None:
+            ts, offset = cursor.split(":")
+            after = (int(ts), int(offset))
+            low = after if low is None else max(low, after)
+        end_ts = to_micros(end) if end is not None else None
+        codes = {resolve(tx_type).code for tx_type in types} if types is not None else None
+        base = self.base
+        local = (low[0], low[1] - base) if low is not None else None  # In store offsets
+
+        def scan(index):
+            size = len(index)
+            pos = 0 if local is None else bisect_right(index, local, key=self._key)
+            for i in range(pos, size):
+                offset = index[i]
+                ts = store.ts_at(offset)
+                if end_ts is not None and ts >= end_ts:
+                    return
+                yield ts, offset
+
+        page = []
+        with self._lock:
+            if account_numbers is None:
+                indexes = ([range(len(store))] if self._in_order is None
+                           else [self._in_order, self._late])
+            else:
+                ids = dict.fromkeys(store.accounts.get(number) for number in account_numbers)
+                indexes = [self._by_account[i] for i in ids if i in self._by_account]
+            rows = heapq.merge(*(scan(index) for index in indexes)) if len(indexes) > 1 else (
+                scan(indexes[0]) if indexes else iter(()))
+            for ts, offset in rows:
+                if codes is not None and store.type_at(offset) not in codes:
+                    continue
+                page.append((ts, base + offset))
+                if len(page) > limit:
+                    break
+        archived = {}
+        if self.archive is not None:
+            records = self.archive.page(account_numbers, low, end_ts, codes, limit + 1)
+            archived = dict(zip(records["offset"].tolist(), self.archive.entries(records)))
+            page = list(heapq.merge(zip(records["ts"].tolist(), records["offset"].tolist()), page))
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            last_ts, last_offset = page[-1]
+            next_cursor = f"{last_ts}:{last_offset}"
+        return [archived[offset] if offset < base else self._entry(offset - base) for _, offset in page], next_cursor
+
+    @contextmanager
+    def locked(self):
+        # Holds off appends, for a consistent read of the whole store
+        with self._lock:
+            yield
+
+    def count(self, account_number):
+        return self._counts.get(account_number, 0)
+
+    def counts(self):
+        # Per-account transaction counts in first-seen order
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,241 @@
+from collections import OrderedDict
+import datetime
+import threading
+
+from bank.money import Money
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_SECOND = datetime.timedelta(seconds=1)
+
+
+class Window:
+    # A limit window made of `buckets` consecutive buckets of `bucket_seconds`
+    # each, aligned to wall-clock time. One bucket is a fixed window (calendar
+    # day, clock hour); several make a sliding window at bucket granularity.
+    __slots__ = ("name", "bucket_seconds", "buckets")
+
+    def __init__(self, name, bucket_seconds, buckets=1):
+        self.name = name
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+
+
+DAY = Window("daily", 86400)
+HOUR = Window("hourly", 3600)
+ROLLING_24H = Window("rolling 24-hour", 3600, 24)
+WINDOWS = {"daily": DAY, "hourly": HOUR, "rolling24h": ROLLING_24H}
+
+
+class Limit:
+    __slots__ = ("amount", "window")
+
+    def __init__(self, amount, window):
+        self.amount = Money.from_dollars(amount)
+        self.window = window
+
+    @property
+    def name(self):
+        return self.window.name
+
+
+def parse_limits(spec):
+    # "daily=0.90,hourly=0.50,rolling24h=1.00" -> [Limit, ...]
+    limits = []
+    for part in spec.split(","):
+        if part.strip():
+            name, _, amount = part.partition("=")
+            if name.strip() not in WINDOWS:
+                raise ValueError(f"Unknown limit window: {name.strip()!r}")
+            limits.append(Limit(Money.parse(amount), WINDOWS[name.strip()]))
+    return limits
+
+
+def _seconds(now):
+    # Wall-clock seconds, so day buckets turn over at local midnight
+    return (now - _EPOCH) // _SECOND
+
+
+class LimitTracker:
+    # Running totals per account against a set of limits. Each limit keeps a
+    # ring of `window.buckets` (bucket id, cents) slots, so recording and
+    # checking cost a fixed amount of work. Accounts are kept in order of
+    # their last withdrawal, and every record() drops the ones at the front
+    # whose windows have all passed, so memory follows active accounts only.
+    def __init__(self, limits, tiers=None):
+        self.limits = list(limits)
+        self.tiers = dict(tiers or {})  # Dict: tier name -> list of Limit
+        self._account_limits = {}  # Dict: account_number -> tier name or list of Limit
+        self._usage = {}  # Dict: account_number -> [[ids, cents] per limit]
+        self._last = OrderedDict()  # account_number -> seconds of last record, oldest first
+        self._lock = threading.Lock()
+        # Seconds after which every window an account could be in has passed
+        self._span = max((limit.window.bucket_seconds * (limit.window.buckets + 1)
+                          for limit in self._all_limits()), default=0)
+
+    def _all_limits(self):
+        yield from self.limits
+        for limits in self.tiers.values():
+            yield from limits
+
+    def set_tier(self, account_number, tier):
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown tier: {tier!r}")
+        self._account_limits[account_number] = tier
+        self._forget(account_number)
+
+    def set_limits(self, account_number, limits):
+        self._account_limits[account_number] = list(limits)
+        self._span = max([self._span] + [limit.window.bucket_seconds * (limit.window.buckets + 1)
+                                         for limit in limits])
+        self._forget(account_number)
+
+    def _forget(self, account_number):
+        with self._lock:
+            self._usage.pop(account_number, None)
+            self._last.pop(account_number, None)
+
+    def limits_for(self, account_number):
+        chosen = self._account_limits.get(account_number)
+        if chosen is None:
+            return self.limits
+        return self.tiers[chosen] if isinstance(chosen, str) else chosen
+
+    def _used(self, account_number, limits, secs):
+        # Cents used per limit in the window that contains `secs`
+        with self._lock:
+            rings = self._usage.get(account_number)
+            if rings is None:
+                return [0] * len(limits)
+            used = []
+            for (ids, cents), limit in zip(rings, limits):
+                window = limit.window
+                bucket = secs // window.bucket_seconds
+                if window.buckets == 1:
+                    used.append(cents[0] if ids[0] == bucket else 0)
+                else:
+                    oldest = bucket - window.buckets
+                    used.append(sum(c for i, c in zip(ids, cents) if i > oldest))
+            return used
+
+    def usage(self, account_number, now=None):
+        # [(Limit, Money used in its current window)] for the account
+        limits = self.limits_for(account_number)
+        used = self._used(account_number, limits, _seconds(now or datetime.datetime.now()))
+        return [(limit, Money(cents)) for limit, cents in zip(limits, used)]
+
+    def headroom(self, account_number, now=None):
+        # (Money still allowed, the Limit that allows the least), or (None, None)
+        # when the account has no limits
+        best = (None, None)
+        for limit, used in self.usage(account_number, now):
+            left = limit.amount - used
+            if best[0] is None or left < best[0]:
+                best = (left, limit)
+        return best
+
+    def check(self, account_number, amount, now=None):
+        # The first Limit `amount` would exceed, or None if it fits
+        cents = Money.from_dollars(amount).cents
+        limits = self.limits_for(account_number)
+        used = self._used(account_number, limits, _seconds(now or datetime.datetime.now()))
+        for limit, spent in zip(limits, used):
+            if spent + cents > limit.amount.cents:
+                return limit
+        return None
+
+    def record(self, account_number, amount, now=None):
+        secs = _seconds(now or datetime.datetime.now())
+        cents = Money.from_dollars(amount).cents
+        limits = self.limits_for(account_number)
+        with self._lock:
+            rings = self._usage.get(account_number)
+            if rings is None:
+                rings = self._usage[account_number] = [
+                    [[-1] * limit.window.buckets, [0] * limit.window.buckets] for limit in limits
+                ]
+            for ring, limit in zip(rings, limits):
+                bucket = secs // limit.window.bucket_seconds
+                slot = bucket % limit.window.buckets
+                ids, amounts = ring
+                if ids[slot] != bucket:
+                    ids[slot] = bucket
+                    amounts[slot] = 0
+                amounts[slot] += cents
+            self._last[account_number] = secs
+            self._last.move_to_end(account_number)
+            self._expire(secs)
+
+    def _expire(self, secs):
+        dropped = 0
+        while self._last:
+            account_number = next(iter(self._last))
+            if secs - self._last[account_number] < self._span:
+                break
+            del self._last[account_number]
+            self._usage.pop(account_number, None)
+            dropped += 1
+        return dropped
+
+    def expire(self, now=None):
+        # Drop accounts with nothing left in any window; returns how many
+        with self._lock:
+            return self._expire(_seconds(now or datetime.datetime.now()))
+
+    def __len__(self):
+        return len(self._usage)
+
+    def account_state(self, account_number):
+        # JSON-able copy of one account's buckets, for the journal: one
+        # [bucket seconds, bucket ids, cents] per limit, so a load can tell
+        # whether the rings still fit the limits configured then
+        limits = self.limits_for(account_number)
+        with self._lock:
+            rings = self._usage.get(account_number)
+            if rings is None:
+                return None
+            return [[limit.window.bucket_seconds, list(ids), list(cents)]
+                    for (ids, cents), limit in zip(rings, limits)]
+
+    def load_account_state(self, account_number, state):
+        # Rings whose window is not one of the account's current limits (the
+        # limits changed since they were saved) are dropped, and those limits
+        # start from nothing. State saved before rings carried their bucket
+        # length is matched to the limits by position.
+        limits = self.limits_for(account_number)
+        saved = {}  # Dict: (bucket seconds, buckets) -> [ids, cents]
+        for i, ring in enumerate(state or ()):
+            if len(ring) == 3:
+                bucket_seconds, ids, cents = ring
+            elif i < len(limits):
+                bucket_seconds, (ids, cents) = limits[i].window.bucket_seconds, ring
+            else:
+                continue
+            saved[(bucket_seconds, len(ids))] = [list(ids), list(cents)]
+        rings = []
+        for limit in limits:
+            window = limit.window
+            ring = saved.get((window.bucket_seconds, window.buckets))
+            rings.append(ring if ring is not None else [[-1] * window.buckets, [0] * window.buckets])
+        with self._lock:
+            self._usage.pop(account_number, None)
+            self._last.pop(account_number, None)
+            if any(max(ids) >= 0 for ids, _ in rings):
+                self._usage[account_number] = rings
+                # Start of the newest bucket: never later than the last record
+                self._last[account_number] = max(
+                    max(ids) * limit.window.bucket_seconds
+                    for (ids, _), limit in zip(rings, limits)
+                )
+
+    def state(self):
+        return {number: self.account_state(number) for number in list(self._usage)}
+
+    def load_state(self, state):
+        with self._lock:
+            self._usage.clear()
+            self._last.clear()
+        for number, rings in state.items():
+            self.load_account_state(number, rings)
+        with self._lock:
+            for number, _ in sorted(self._last.items(), key=lambda item: item[1]):
+                self._last.move_to_end(number)
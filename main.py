@@ -1,32 +1,62 @@
+from bank import metrics
 from bank.account import Account, User
+from bank.aggregates import Aggregates
+from bank.audit import AuditLog
 from bank.authentication import Authenticator
+from bank.engine import TransactionEngine
+from bank.idempotency import IdempotencyCache
+from bank.ledger import Ledger
+from bank.limits import DAY, Limit, LimitTracker, parse_limits
+from bank.money import Money, ZERO, MIN_BALANCE, DENOMINATIONS
+from bank.notification import Notifier, parse_sinks, set_default_notifier
+from bank.registry import build_registry
+from bank.service import BankService
+from bank.storage import Storage
+from bank.txtypes import TX_CLASSES, of_class
 import datetime
-import pandas as pd
-import matplotlib.pyplot as plt
-from collections import defaultdict
+import os
+import sys
 
 # In-memory user storage
 users = {
     "alice": User("alice"),
     "bob": User("bob")
 }
-# Add accounts for users
-users["alice"].add_account(Account("1001", "1234", 500))
-users["alice"].add_account(Account("1002", "5678", 1500))
-users["bob"].add_account(Account("2001", "4321", 800))
+# Add accounts for users. PINs are 1234, 5678 and 4321; their hashes are
+# precomputed so start-up does not pay for three slow hashes.
+users["alice"].add_account(Account("1001", balance=500, pin_hash=(
+    "pbkdf2_sha256$100000$4460fbfdd5cded55586371e8b5109ec5$"
+    "c4dc6124e32629dde78aa3a66d0de778bdbd2ec6c08392c3cfe43e157ed4574c")))
+users["alice"].add_account(Account("1002", balance=1500, pin_hash=(
+    "pbkdf2_sha256$100000$039bbda6e87ba73a95ccacfbb2b61a16$"
+    "bf92ceacaa52c34127837a8fbe0666c9db3da31619d98b142018a3c513f9a075")))
+users["bob"].add_account(Account("2001", balance=800, pin_hash=(
+    "pbkdf2_sha256$100000$d7f086bda16d1b3842114174cbc8831f$"
+    "0e376482d29ac0ea7b7678399aa8c08e57d27c9e79ec3e07f817c66d99dbb414")))
+
+# Account number -> (User, Account) index shared by login and every lookup
+registry = build_registry(users)
+
+# Per-account locks for every balance change, and for the lockout state logins change
+engine = TransactionEngine()
+auth = Authenticator(users, registry, engine=engine)
+
+# Transaction log, indexed by account
+transaction_log = Ledger()
 
-auth = Authenticator(users)
+# Add this global variable to store update history
+update_history = AuditLog()
 
-# Transaction log
-transaction_log = []
+# Durable storage, opened by open_storage() when BANK_DATA_DIR is set
+storage = None
 
-# Add this global variable to store update history
-update_history = []
+def _print_accounts(user, label="Account"):
+    for idx, acc in enumerate(user.accounts):
+        print(f"{idx+1}. {label} {acc.account_number} (Balance: ${acc.balance:.2f})")
 
 def deposit_funds(user):
     print("\nDeposit Funds")
-    for idx, acc in enumerate(user.accounts):
-        print(f"{idx+1}. Account {acc.account_number} (Balance: ${acc.balance:.2f})")
+    _print_accounts(user)
     try:
         choice = int(input("Select account to deposit into (number): ")) - 1
         if not (0 <= choice < len(user.accounts)):
@@ -34,51 +64,101 @@ def deposit_funds(user):
             return
         selected_acc = user.accounts[choice]
         print("Accepted denominations: 0.05, 0.10, 0.25")
-        amount = 0
+        amount = ZERO
         while True:
             coin = input("Enter coin to deposit (or 'done' to finish): ")
             if coin.lower() == 'done':
                 break
             try:
-                coin = float(coin)
-                if coin < 0:
+                coin = Money.parse(coin)
+                if coin < ZERO:
                     print("Negative values are not allowed.")
-                elif coin in [0.05, 0.10, 0.25]:
+                elif coin.cents in DENOMINATIONS:
                     amount += coin
                 else:
                     print("Invalid denomination.")
             except ValueError:
                 print("Please enter a valid number or 'done'.")
-        if amount > 0:
-            selected_acc.balance += amount
-            now = datetime.datetime.now()
-            # Log the transaction
-            transaction_log.append({
-                "account_number": selected_acc.account_number,
-                "user": user.username,
-                "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
-                "type": "+Deposit",
-                "amount": amount
-            })
+        if amount > ZERO:
+            receipt, error = service.deposit(user, selected_acc.account_number, amount)
+            if error:
+                print(error)
+                return
             print("\n--- Deposit Receipt ---")
-            print(f"Account Number: {selected_acc.account_number}")
-            print(f"User Name: {user.username}")
-            print(f"Date/Time: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"Amount Deposited: ${amount:.2f}")
-            print(f"Current Balance: ${selected_acc.balance:.2f}")
+            print(f"Account Number: {receipt.account_number}")
+            print(f"User Name: {receipt.user}")
+            print(f"Date/Time: {receipt.when.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"Amount Deposited: ${receipt.amount:.2f}")
+            print(f"Current Balance: ${receipt.balance:.2f}")
             print("----------------------\n")
         else:
             print("No coins deposited.")
     except Exception as e:
         print("Error during deposit:", e)
 
-# Track daily withdrawals: { (account_number, date): amount_withdrawn }
-daily_withdrawals = {}
+# Withdrawal limits per account and notifications: defaults here, configured
+# from the environment by init(), not at import, so importing this module
+# starts no threads and reads no settings.
+withdrawal_limits = LimitTracker([Limit(Money(90), DAY)])
+notifier = None
+
+# Running totals for the admin views, updated by every change; seeded from the
+# accounts above and rebuilt again whenever storage is loaded
+aggregates = Aggregates()
+aggregates.rebuild(transaction_log, (acc for _, acc in registry))
+
+# Results of recent requests by request id, so a retried one is applied once
+idempotency = IdempotencyCache()
+
+# The operations themselves, without I/O; the menus below only prompt and print
+service = BankService(users, registry, auth, engine, transaction_log, update_history, withdrawal_limits,
+                      aggregates=aggregates, idempotency=idempotency)
+
+_initialized = False
+
+
+def init():
+    # Configure the process from the environment, once; open_storage() and
+    # main() call it, and so should anything else using `service` directly.
+    #   BANK_WITHDRAWAL_LIMITS overrides the default $0.90 per day, e.g.
+    #   "daily=0.90,hourly=0.50" (windows: daily, hourly, rolling24h).
+    #   BANK_NOTIFY lists the notification sinks ("stdout", "file:PATH",
+    #   "socket:PATH"), delivered by a background thread, and
+    #   BANK_NOTIFY_POLICY what to do when its queue is full (block,
+    #   drop_newest, drop_oldest); unset, nothing is sent.
+    global _initialized, withdrawal_limits, notifier
+    if _initialized:
+        return
+    _initialized = True
+    if os.environ.get("BANK_WITHDRAWAL_LIMITS"):
+        withdrawal_limits = service.withdrawal_limits = LimitTracker(
+            parse_limits(os.environ["BANK_WITHDRAWAL_LIMITS"]))
+    if os.environ.get("BANK_NOTIFY"):
+        notifier = service.notifier = Notifier(parse_sinks(os.environ["BANK_NOTIFY"]),
+                                               policy=os.environ.get("BANK_NOTIFY_POLICY", "drop_oldest")).start()
+        set_default_notifier(notifier)
+    # Counters kept anyway, read only when a metrics snapshot is taken (BANK_METRICS=1)
+    if metrics.ENABLED:
+        metrics.callback("bank_ledger_rows_total", "Rows appended to the ledger", lambda: len(transaction_log),
+                         kind="counter")
+        metrics.callback("bank_login_failures_total", "Logins refused for a wrong PIN", lambda: auth.failed_logins,
+                         kind="counter")
+        metrics.callback("bank_lockouts_total", "Accounts locked after too many wrong PINs", lambda: auth.lockouts,
+                         kind="counter")
+        metrics.callback("bank_login_rate_limited_total", "Logins refused by a rate limit",
+                         lambda: auth.rate_limited, kind="counter")
+        metrics.callback("bank_request_replays_total", "Requests answered from the idempotency cache",
+                         lambda: idempotency.replays, kind="counter")
+        if notifier:
+            metrics.callback("bank_notify_queue_depth", "Notifications waiting for delivery", lambda: notifier.depth)
+            metrics.callback("bank_notify_dropped_total", "Notifications dropped on a full queue",
+                             lambda: notifier.dropped, kind="counter")
+            metrics.callback("bank_notify_lag_seconds", "Queueing-to-delivery time of the last batch",
+                             lambda: notifier.lag_last)
 
 def withdraw_funds(user):
     print("\nWithdraw Funds")
-    for idx, acc in enumerate(user.accounts):
-        print(f"{idx+1}. Account {acc.account_number} (Balance: ${acc.balance:.2f})")
+    _print_accounts(user)
     try:
         choice = int(input("Select account to withdraw from (number): ")) - 1
         if not (0 <= choice < len(user.accounts)):
@@ -88,57 +168,46 @@ def withdraw_funds(user):
         print("Available denominations: 0.05, 0.10, 0.25")
         print(f"Current Balance: ${selected_acc.balance:.2f}")
 
-        # Get today's date string
-        today = datetime.date.today().isoformat()
-        key = (selected_acc.account_number, today)
-        withdrawn_today = daily_withdrawals.get(key, 0)
-
-        if withdrawn_today >= 0.90:
-            print("Daily withdrawal limit of $0.90 reached for this account.")
+        headroom, limit = service.withdrawal_headroom(selected_acc.account_number)
+        if limit is not None and headroom <= ZERO:
+            print(f"{limit.name.capitalize()} withdrawal limit of ${limit.amount} reached for this account.")
             return
 
-        amount = 0
-        coins = []
+        amount = ZERO
         while True:
             coin = input("Enter coin to withdraw (or 'done' to finish): ")
             if coin.lower() == 'done':
                 break
             try:
-                coin = float(coin)
-                if coin in [0.05, 0.10, 0.25]:
-                    if amount + coin + withdrawn_today > 0.90:
-                        print("This withdrawal would exceed the daily limit of $0.90.")
+                coin = Money.parse(coin)
+                if coin.cents in DENOMINATIONS:
+                    if limit is not None and amount + coin > headroom:
+                        print(f"This withdrawal would exceed the {limit.name} limit of ${limit.amount}.")
                         continue
-                    if selected_acc.balance - amount - coin < 0.05:
+                    if selected_acc.balance - amount - coin < MIN_BALANCE:
                         print("Cannot withdraw: minimum balance of 0.05 required.")
                         continue
                     if amount + coin > selected_acc.balance:
                         print("Insufficient funds for this coin.")
                         continue
                     amount += coin
-                    coins.append(coin)
                 else:
                     print("Invalid denomination.")
             except ValueError:
                 print("Please enter a valid number or 'done'.")
-        if amount > 0:
-            selected_acc.balance -= amount
-            daily_withdrawals[key] = withdrawn_today + amount
-            now = datetime.datetime.now()
-            # Log the transaction
-            transaction_log.append({
-                "account_number": selected_acc.account_number,
-                "user": user.username,
-                "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
-                "type": "-Withdrawal",
-                "amount": amount
-            })
+        if amount > ZERO:
+            # Limits and balance are checked again: another session may have
+            # moved money while coins were entered
+            receipt, error = service.withdraw(user, selected_acc.account_number, amount)
+            if error:
+                print(error)
+                return
             print("\n--- Withdrawal Receipt ---")
-            print(f"Account Number: {selected_acc.account_number}")
-            print(f"User Name: {user.username}")
-            print(f"Date/Time: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"Amount Withdrawn: ${amount:.2f}")
-            print(f"Current Balance: ${selected_acc.balance:.2f}")
+            print(f"Account Number: {receipt.account_number}")
+            print(f"User Name: {receipt.user}")
+            print(f"Date/Time: {receipt.when.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"Amount Withdrawn: ${receipt.amount:.2f}")
+            print(f"Current Balance: ${receipt.balance:.2f}")
             print("-------------------------\n")
         else:
             print("No coins withdrawn.")
@@ -150,35 +219,39 @@ def create_new_account(user):
     while True:
         new_acc_num = input("Enter a new account number: ")
         # Check if account number already exists for any user
-        exists = False
-        for u in users.values():
-            for acc in u.accounts:
-                if acc.account_number == new_acc_num:
-                    exists = True
-                    break
-            if exists:
-                break
-        if exists:
+        if new_acc_num in registry:
             print("Account number already exists. Please choose another.")
         else:
             break
     new_pin = input("Set a 4-digit pincode for the new account: ")
-    # Basic validation for PIN
-    if not (new_pin.isdigit() and len(new_pin) == 4):
-        print("Invalid PIN. Must be 4 digits.")
+    _, error = service.create_account(user, new_acc_num, new_pin)
+    if error:
+        print(error)
         return
-    new_account = Account(new_acc_num, new_pin, balance=0.05)
-    user.add_account(new_account)
     print(f"Account {new_acc_num} created successfully with initial deposit of $0.05.")
 
+def _print_transfer(receipt, own):
+    print("\n--- Transfer Receipt ---")
+    if own:
+        print(f"From Account: {receipt.account_number}")
+        print(f"To Account: {receipt.to_account}")
+        print(f"User Name: {receipt.user}")
+    else:
+        print(f"From Account: {receipt.account_number} (User: {receipt.user})")
+        print(f"To Account: {receipt.to_account} (User: {receipt.to_user})")
+    print(f"Date/Time: {receipt.when.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Amount Transferred: ${receipt.amount:.2f}")
+    print(f"From Account New Balance: ${receipt.balance:.2f}")
+    print(f"To Account New Balance: ${receipt.to_balance:.2f}")
+    print("------------------------\n")
+
 def transfer_between_own_accounts(user):
     print("\nTransfer Funds Between Your Accounts")
     if len(user.accounts) < 2:
         print("You need at least two accounts to transfer funds.")
         return
     # List accounts
-    for idx, acc in enumerate(user.accounts):
-        print(f"{idx+1}. Account {acc.account_number} (Balance: ${acc.balance:.2f})")
+    _print_accounts(user)
     try:
         from_idx = int(input("Select FROM account (number): ")) - 1
         to_idx = int(input("Select TO account (number): ")) - 1
@@ -192,51 +265,19 @@ def transfer_between_own_accounts(user):
         to_acc = user.accounts[to_idx]
         print(f"FROM Account {from_acc.account_number} (Balance: ${from_acc.balance:.2f})")
         print(f"TO Account {to_acc.account_number} (Balance: ${to_acc.balance:.2f})")
-        amount = float(input("Enter amount to transfer (multiples of 0.05, 0.10, or 0.25): "))
-        if amount <= 0:
-            print("Amount must be positive.")
-            return
-        if amount not in [0.05, 0.10, 0.25] and amount % 0.05 != 0:
-            print("Amount must be in valid denominations or multiples of 0.05.")
-            return
-        if from_acc.balance - amount < 0.05:
-            print("Insufficient funds. Minimum balance of $0.05 must remain.")
+        amount = Money.parse(input("Enter amount to transfer (multiples of 0.05, 0.10, or 0.25): "))
+        receipt, error = service.transfer(user, from_acc.account_number, to_acc.account_number, amount)
+        if error:
+            print(error)
             return
-        from_acc.balance -= amount
-        to_acc.balance += amount
-        now = datetime.datetime.now()
-        # Log the transaction for both accounts
-        transaction_log.append({
-            "account_number": from_acc.account_number,
-            "user": user.username,
-            "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
-            "type": "-Transfer (own)",
-            "amount": amount
-        })
-        transaction_log.append({
-            "account_number": to_acc.account_number,
-            "user": user.username,
-            "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
-            "type": "+Transfer (own)",
-            "amount": amount
-        })
-        print("\n--- Transfer Receipt ---")
-        print(f"From Account: {from_acc.account_number}")
-        print(f"To Account: {to_acc.account_number}")
-        print(f"User Name: {user.username}")
-        print(f"Date/Time: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Amount Transferred: ${amount:.2f}")
-        print(f"From Account New Balance: ${from_acc.balance:.2f}")
-        print(f"To Account New Balance: ${to_acc.balance:.2f}")
-        print("------------------------\n")
+        _print_transfer(receipt, own=True)
     except Exception as e:
         print("Error during transfer:", e)
 
 def transfer_to_other_user(user):
     print("\nTransfer Funds to Another User's Account")
     # List user's own accounts
-    for idx, acc in enumerate(user.accounts):
-        print(f"{idx+1}. Your Account {acc.account_number} (Balance: ${acc.balance:.2f})")
+    _print_accounts(user, "Your Account")
     try:
         from_idx = int(input("Select FROM account (number): ")) - 1
         if not (0 <= from_idx < len(user.accounts)):
@@ -244,71 +285,65 @@ def transfer_to_other_user(user):
             return
         from_acc = user.accounts[from_idx]
         to_acc_num = input("Enter the recipient's account number: ")
-        # Find the recipient account and user
-        recipient = None
-        to_acc = None
-        for u in users.values():
-            for acc in u.accounts:
-                if acc.account_number == to_acc_num:
-                    recipient = u
-                    to_acc = acc
-                    break
-            if to_acc:
-                break
-        if not to_acc:
+        if to_acc_num not in registry:
             print("Recipient account not found.")
             return
-        if to_acc.account_number == from_acc.account_number:
+        if to_acc_num == from_acc.account_number:
             print("Cannot transfer to the same account.")
             return
-        amount = float(input("Enter amount to transfer (multiples of 0.05, 0.10, or 0.25): "))
-        if amount <= 0:
-            print("Amount must be positive.")
-            return
-        if amount not in [0.05, 0.10, 0.25] and amount % 0.05 != 0:
-            print("Amount must be in valid denominations or multiples of 0.05.")
-            return
-        if from_acc.balance - amount < 0.05:
-            print("Insufficient funds. Minimum balance of $0.05 must remain.")
+        amount = Money.parse(input("Enter amount to transfer (multiples of 0.05, 0.10, or 0.25): "))
+        receipt, error = service.transfer(user, from_acc.account_number, to_acc_num, amount)
+        if error:
+            print(error)
             return
-        from_acc.balance -= amount
-        to_acc.balance += amount
-        now = datetime.datetime.now()
-        # Log the transaction for both accounts
-        transaction_log.append({
-            "account_number": from_acc.account_number,
-            "user": user.username,
-            "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
-            "type": "-Transfer (to other)",
-            "amount": amount
-        })
-        transaction_log.append({
-            "account_number": to_acc.account_number,
-            "user": recipient.username,
-            "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
-            "type": "+Transfer (from other)",
-            "amount": amount
-        })
-        print("\n--- Transfer Receipt ---")
-        print(f"From Account: {from_acc.account_number} (User: {user.username})")
-        print(f"To Account: {to_acc.account_number} (User: {recipient.username})")
-        print(f"Date/Time: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Amount Transferred: ${amount:.2f}")
-        print(f"From Account New Balance: ${from_acc.balance:.2f}")
-        print(f"To Account New Balance: ${to_acc.balance:.2f}")
-        print("------------------------\n")
+        _print_transfer(receipt, own=False)
     except Exception as e:
         print("Error during transfer:", e)
 
+HISTORY_PAGE_SIZE = 20
+
+def ask_history_filters(numbers=None):
+    # Optional account, date range and type filters for a history listing.
+    # numbers limits the accounts that may be asked for (None: any).
+    # Returns (account_numbers, start, end, types), or None on bad input.
+    number = input("Account number (blank for all): ").strip()
+    if number:
+        if numbers is not None and number not in numbers:
+            print("Not one of your accounts.")
+            return None
+        numbers = [number]
+    try:
+        start = input("From date YYYY-MM-DD (blank for no limit): ").strip()
+        start = datetime.datetime.strptime(start, "%Y-%m-%d") if start else None
+        end = input("To date YYYY-MM-DD, inclusive (blank for no limit): ").strip()
+        end = datetime.datetime.strptime(end, "%Y-%m-%d") + datetime.timedelta(days=1) if end else None
+    except ValueError:
+        print("Invalid date.")
+        return None
+    kind = input("Type: deposit, withdrawal or transfer (blank for all): ").strip().capitalize()
+    if kind and kind not in TX_CLASSES:
+        print("Invalid type.")
+        return None
+    return numbers, start, end, of_class(kind) if kind else None
+
+def print_history(numbers, start, end, types):
+    # Print matching transactions a page at a time; False if there were none
+    found = False
+    cursor = None
+    while True:
+        page, cursor = service.history(numbers, start, end, types, cursor, HISTORY_PAGE_SIZE)
+        for tx in page:
+            found = True
+            print(f"{tx['datetime']} | {tx['account_number']} | {tx['user']} | {tx['type']} | ${tx['amount']:.2f}")
+        if cursor is None or input("Press Enter for more, or 'q' to stop: ").strip().lower() == 'q':
+            return found
+
 def view_transaction_history(user):
     print("\n--- Transaction History ---")
-    found = False
-    for acc in user.accounts:
-        for tx in transaction_log:
-            if tx["account_number"] == acc.account_number:
-                found = True
-                print(f"{tx['datetime']} | {tx['account_number']} | {tx['user']} | {tx['type']} | ${tx['amount']:.2f}")
-    if not found:
+    filters = ask_history_filters([acc.account_number for acc in user.accounts])
+    if filters is None:
+        return
+    if not print_history(*filters):
         print("No transactions found.")
     print("---------------------------\n")
 
@@ -325,26 +360,16 @@ def update_personal_info(user):
             return
         acc = user.accounts[acc_idx]
         old_pin = input("Enter current PIN: ")
-        if old_pin != acc.pincode:
+        if not auth.verify_pin(acc, old_pin):
             print("Incorrect PIN. Update aborted.")
             return
         new_pin = input("Enter new 4-digit PIN: ")
-        if not (new_pin.isdigit() and len(new_pin) == 4):
-            print("Invalid PIN. Must be 4 digits.")
-            return
-        if new_pin == acc.pincode:
-            print("New PIN must be different from the old PIN.")
+        # Checked up front so a wrong PIN fails before the new one is asked
+        # for; the service's own check is then a verification cache hit
+        _, error = service.change_pin(user, acc.account_number, old_pin, new_pin)
+        if error:
+            print(error)
             return
-        old_pincode = acc.pincode
-        acc.pincode = new_pin
-        now = datetime.datetime.now()
-        update_history.append({
-            "account_number": acc.account_number,
-            "user": user.username,
-            "datetime": now.strftime('%Y-%m-%d %H:%M:%S'),
-            "old_pin": old_pincode,
-            "new_pin": new_pin
-        })
         print("PIN updated successfully.")
     except Exception as e:
         print("Error during update:", e)
@@ -353,11 +378,9 @@ def update_personal_info(user):
 def view_update_history(user):
     print("\n--- PIN Update History ---")
     found = False
-    for acc in user.accounts:
-        for upd in update_history:
-            if upd["account_number"] == acc.account_number:
-                found = True
-                print(f"{upd['datetime']} | {upd['account_number']} | {upd['user']} | Old PIN: {upd['old_pin']} | New PIN: {upd['new_pin']}")
+    for upd in service.pin_history(user):
+        found = True
+        print(f"{upd['datetime']} | {upd['account_number']} | {upd['user']} | PIN changed")
     if not found:
         print("No update history found.")
     print("--------------------------\n")
@@ -371,8 +394,10 @@ def admin_menu():
         print("3. Add/Remove funds")
         print("4. View all transaction logs")
         print("5. Activity report")
-        print("6. Exit admin menu")
-        choice = input("Select an option (1-6): ")
+        print("6. Summary")
+        print("7. Check totals against the ledger")
+        print("8. Exit admin menu")
+        choice = input("Select an option (1-8): ")
         if choice == '1':
             admin_view_accounts()
         elif choice == '2':
@@ -384,63 +409,108 @@ def admin_menu():
         elif choice == '5':
             admin_activity_report()
         elif choice == '6':
+            admin_summary()
+        elif choice == '7':
+            admin_check_totals()
+        elif choice == '8':
             break
         else:
             print("Invalid option.")
 
 def admin_view_accounts():
     print("\n--- All Accounts ---")
-    for user in users.values():
-        for acc in user.accounts:
-            status = "Frozen" if getattr(acc, "frozen", False) else "Active"
-            print(f"User: {user.username} | Account: {acc.account_number} | Balance: ${acc.balance:.2f} | Status: {status}")
+    for user, acc in service.all_accounts():
+        status = "Frozen" if acc.frozen else "Active"
+        print(f"User: {user.username} | Account: {acc.account_number} | Balance: ${acc.balance:.2f} | Status: {status}")
     print("--------------------")
 
 def admin_freeze_unfreeze():
     acc_num = input("Enter account number to freeze/unfreeze: ")
-    for user in users.values():
-        for acc in user.accounts:
-            if acc.account_number == acc_num:
-                acc.frozen = not getattr(acc, "frozen", False)
-                status = "Frozen" if acc.frozen else "Unfrozen"
-                print(f"Account {acc_num} is now {status}.")
-                return
-    print("Account not found.")
+    acc, error = service.toggle_freeze(acc_num)
+    if error:
+        print(error)
+        return
+    status = "Frozen" if acc.frozen else "Unfrozen"
+    print(f"Account {acc_num} is now {status}.")
 
 def admin_fund_management():
     acc_num = input("Enter account number to add/remove funds: ")
-    for user in users.values():
-        for acc in user.accounts:
-            if acc.account_number == acc_num:
-                print(f"Current balance: ${acc.balance:.2f}")
-                amt = float(input("Enter amount to add (positive) or remove (negative): "))
-                if acc.balance + amt < 0:
-                    print("Insufficient funds for removal.")
-                    return
-                acc.balance += amt
-                print(f"New balance: ${acc.balance:.2f}")
-                return
-    print("Account not found.")
+    acc = registry.get_account(acc_num)
+    if acc is None:
+        print("Account not found.")
+        return
+    print(f"Current balance: ${acc.balance:.2f}")
+    amt = Money.parse(input("Enter amount to add (positive) or remove (negative): "))
+    receipt, error = service.adjust(acc_num, amt)
+    if error:
+        print(error)
+        return
+    print(f"New balance: ${receipt.balance:.2f}")
 
 def admin_view_transaction_logs():
     print("\n--- All Transaction Logs ---")
-    for tx in transaction_log:
-        print(f"{tx['datetime']} | {tx['account_number']} | {tx['user']} | {tx['type']} | ${tx['amount']:.2f}")
+    filters = ask_history_filters()
+    if filters is None:
+        return
+    if not print_history(*filters):
+        print("No transactions found.")
     print("----------------------------")
 
 def admin_activity_report():
     print("\n--- Activity Report ---")
-    account_activity = {}
-    for tx in transaction_log:
-        acc = tx['account_number']
-        account_activity.setdefault(acc, 0)
-        account_activity[acc] += 1
-    for acc, count in account_activity.items():
+    for acc, count in service.activity().items():
         print(f"Account {acc}: {count} transactions")
     print("-----------------------")
 
+def admin_summary():
+    print("\n--- Summary ---")
+    summary = service.summary()
+    print(f"Accounts: {summary['accounts']}")
+    print(f"Money supply: ${summary['money_supply']:.2f}")
+    print(f"Transactions: {summary['transactions']}")
+    totals = aggregates.day_totals(datetime.date.today())
+    print(f"Today: {totals['transactions']} transactions, deposits ${totals['deposits'] / 100:.2f}, "
+          f"withdrawals ${totals['withdrawals'] / 100:.2f}, transfers ${totals['transfers_out'] / 100:.2f}")
+    print("Balances:")
+    for label, count in summary["balance_counts"].items():
+        print(f"  {label:>9}: {count}")
+    print("---------------")
+
+def admin_check_totals():
+    problems = service.check_aggregates()
+    for problem in problems:
+        print(problem)
+    print("Totals match the ledger and balances." if not problems else f"{len(problems)} mismatches found.")
+
+def open_storage(read_only=False):
+    # Recover state from BANK_DATA_DIR (snapshot + journal) and journal every
+    # change from here on. BANK_FSYNC picks the sync policy: always, batch or none.
+    # read_only=True only loads the state, for readers running next to a live process.
+    global storage
+    init()
+    directory = os.environ.get("BANK_DATA_DIR")
+    if directory and storage is None:
+        opened = Storage(directory, users, registry, transaction_log, update_history,
+                         withdrawal_limits, sync=os.environ.get("BANK_FSYNC", "always"), engine=engine)
+        opened.recover(read_only=read_only)
+        aggregates.rebuild(transaction_log, (acc for _, acc in registry))
+        if not read_only:
+            storage = service.storage = opened
+    return storage
+
 # Add this at the start of your main() function:
 def main():
+    open_storage()
+    metrics.start_exporter()
+    try:
+        run_session()
+    finally:
+        if storage:
+            storage.close()
+        if notifier:
+            notifier.close()
+
+def run_session():
     print("Welcome to Simple Bank System")
     while True:
         mode = input("Login as (1) User or (2) Admin? ")
@@ -449,7 +519,7 @@ def main():
             continue
         acc_num = input("Enter your account number: ")
         pin = input("Enter your pincode: ")
-        user, msg = auth.login(acc_num, pin)
+        user, msg = service.login(acc_num, pin)
         if user:
             print(f"Welcome, {user.username}!")
             print("Your accounts:")
@@ -503,110 +573,13 @@ def main():
                 break
 
 if __name__ == "__main__":
-    # DO NOT overwrite transaction_log here!
-    # transaction_log = [
-    #     # Example data structure
-    #     # {"account_number": "1001", "user": "alice", "datetime": "2024-06-24 10:00:00", "type": "+Deposit", "amount": 0.25},
-    #     # ...
-    # ]
-
-    # Build a DataFrame from the transaction log
-    df = pd.DataFrame(transaction_log)
-
-    if not df.empty and 'datetime' in df.columns:
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        # Sort by datetime
-        df = df.sort_values('datetime')
-
-        # Get unique users (or select specific users)
-        unique_users = df['user'].unique()
-
-        # Prepare a dict to track balances over time for each account
-        account_balances = defaultdict(list)
-        account_dates = defaultdict(list)
-        current_balances = {}
-
-        for _, row in df.iterrows():
-            acc = row['account_number']
-            user = row['user']
-            date = row['datetime']
-            amt = row['amount']
-            typ = row['type']
-            # Update balance
-            prev = current_balances.get(acc, 0)
-            if typ.startswith('+'):
-                new_bal = prev + amt
-            elif typ.startswith('-'):
-                new_bal = prev - amt
-            else:
-                new_bal = prev  # For other types, adjust as needed
-            current_balances[acc] = new_bal
-            account_balances[acc].append(new_bal)
-            account_dates[acc].append(date)
-
-        # Plot for at least 3 accounts (or users)
-        plt.figure(figsize=(10, 6))
-        plotted = 0
-        for acc in account_balances:
-            if plotted >= 3:
-                break
-            plt.plot(account_dates[acc], account_balances[acc], marker='o', label=f'Account {acc}')
-            plotted += 1
-
-        plt.xlabel('Date')
-        plt.ylabel('Balance')
-        plt.title('User Account Activity Over Time')
-        plt.legend()
-        plt.tight_layout()
-        plt.show()
-
-        # --- System-Wide Daily Transaction Volume Bar Chart ---
-        # Classify transaction types
-        def classify_type(tx_type):
-            if "Deposit" in tx_type:
-                return "Deposit"
-            elif "Withdrawal" in tx_type:
-                return "Withdrawal"
-            elif "Transfer" in tx_type:
-                return "Transfer"
-            else:
-                return "Other"
-
-        df['date'] = df['datetime'].dt.date
-        df['tx_class'] = df['type'].apply(classify_type)
-
-        # Aggregate daily transaction counts by type
-        daily_counts = df.groupby(['date', 'tx_class']).size().unstack(fill_value=0)
-
-        # Plot stacked bar chart
-        daily_counts.plot(kind='bar', stacked=True, figsize=(10,6))
-        plt.xlabel('Date')
-        plt.ylabel('Number of Transactions')
-        plt.title('Daily Transaction Volume')
-        plt.legend(title='Transaction Type')
-        plt.tight_layout()
-        plt.show()
-
-        # --- Distribution of Account Balances Histogram ---
-        # Get the latest balance for each account from your current_balances dict
-        balances = list(current_balances.values())
-
-        # Define bins and labels
-        balance_bins = [0, 1, 5, 10, 50, 100, float('inf')]
-        balance_labels = ['0-0.99', '1-4.99', '5-9.99', '10-49.99', '50-99.99', '>100']
-
-        plt.figure(figsize=(10, 6))
-        plt.hist(balances, bins=balance_bins, edgecolor='black')
-        plt.xlabel('Balance Range')
-        plt.ylabel('Number of Accounts')
-        plt.title('Distribution of Account Balances')
-        plt.xticks(
-            [(balance_bins[i] + balance_bins[i+1])/2 for i in range(len(balance_bins)-1)],
-            balance_labels, rotation=45
-        )
-        plt.tight_layout()
-        plt.show()
+    # `python -m bank.main report` draws the charts; anything else starts the
+    # teller CLI without loading the plotting stack. Run this way, this copy
+    # of the module is __main__ while reports and the rest import bank.main,
+    # so hand over to that one and keep a single set of state.
+    from bank import main as bank
+    if sys.argv[1:2] == ["report"]:
+        from bank import reports
+        reports.main(sys.argv[2:])
     else:
-        print("No transaction data available for visualization.")
-
-    main()
\ No newline at end of file
+        bank.main()
@@ -0,0 +1,177 @@
+import atexit
+import bisect
+import functools
+import os
+import threading
+import time
+
+# Timers and counters for the hot paths, exported as Prometheus text.
+#
+# Off unless BANK_METRICS=1. The switch is read once, at import: with it off
+# timed() returns the function it decorates unchanged and nothing registers
+# any metric, so disabled metrics cost nothing per call. There is no counter
+# type to increment: counts and sizes the code already keeps (failed logins,
+# lockouts, ledger rows, notification queue depth) are registered as
+# callbacks and read only when a snapshot is taken.
+#
+# Snapshots go to BANK_METRICS_FILE (rewritten every BANK_METRICS_INTERVAL
+# seconds, default 10, and at exit) and/or are served over HTTP at
+# http://127.0.0.1:BANK_METRICS_PORT/metrics.
+ENABLED = os.environ.get("BANK_METRICS", "") not in ("", "0")
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_BOUNDS_NS = [round(bound * 1e9) for bound in BUCKETS]
+
+_families = {}  # Dict: name -> [kind, help, {label items: metric}]
+_lock = threading.Lock()
+
+
+def _labels(items, extra=()):
+    pairs = list(items) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS_NS) + 1)  # Last slot: above the largest bound
+        self.sum_ns = 0
+        self._lock = threading.Lock()
+
+    def observe_ns(self, ns):
+        i = bisect.bisect_left(_BOUNDS_NS, ns)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum_ns += ns
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total_ns = self.sum_ns
+        lines = []
+        cumulative = 0
+        for bound, count in zip(BUCKETS, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, [('le', repr(bound))])} {cumulative}")
+        cumulative += counts[-1]
+        lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total_ns / 1e9:.9f}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return lines
+
+
+class Callback:
+    # A value read from elsewhere when a snapshot is taken
+    def __init__(self, read):
+        self.read = read
+
+    def samples(self, name, labels):
+        return [f"{name}{_labels(labels)} {self.read()}"]
+
+
+def _register(kind, name, help, labels, make):
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        family = _families.setdefault(name, [kind, help, {}])
+        if family[0] != kind:
+            raise ValueError(f"{name} is already registered as a {family[0]}")
+        metric = family[2].get(key)
+        if metric is None:
+            metric = family[2][key] = make()
+        return metric
+
+
+def histogram(name, help, **labels):
+    return _register("histogram", name, help, labels, Histogram)
+
+
+def callback(name, help, read, kind="gauge", **labels):
+    # kind is "gauge", or "counter" for values that only go up
+    return _register(kind, name, help, labels, lambda: Callback(read))
+
+
+def timed(op):
+    # Decorator: the call's duration goes to bank_operation_seconds{op=...}.
+    # With metrics disabled the function is returned as it is.
+    def decorate(func):
+        if not ENABLED:
+            return func
+        observe = histogram("bank_operation_seconds", "Time spent per banking operation", op=op).observe_ns
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            began = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(clock() - began)
+        return wrapper
+    return decorate
+
+
+def render():
+    # Every registered metric in the Prometheus text format
+    lines = []
+    with _lock:
+        families = [(name, kind, help, list(metrics.items()))
+                    for name, (kind, help, metrics) in sorted(_families.items())]
+    for name, kind, help, metrics in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, metric in metrics:
+            lines.extend(metric.samples(name, labels))
+    return "\n".join(lines) + "\n"
+
+
+def write(path):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+def serve(port, host="127.0.0.1"):
+    # Serve /metrics from a daemon thread; returns the HTTP server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_exporter():
+    # Start whatever exporters the environment asks for (BANK_METRICS_FILE,
+    # BANK_METRICS_PORT); does nothing when metrics are disabled
+    if not ENABLED:
+        return
+    path = os.environ.get("BANK_METRICS_FILE")
+    if path:
+        interval = float(os.environ.get("BANK_METRICS_INTERVAL", "10"))
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                write(path)
+        threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+        atexit.register(write, path)
+    if os.environ.get("BANK_METRICS_PORT"):
+        serve(int(os.environ["BANK_METRICS_PORT"]))
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+
+class Money:
+    # Fixed-point amount held as an integer number of cents
+    __slots__ = ("cents",)
+
+    def __init__(self, cents=0):
+        if not isinstance(cents, int):
+            raise TypeError("Money is built from integer cents; use Money.from_dollars() or Money.parse().")
+        self.cents = cents
+
+    @classmethod
+    def parse(cls, text):
+        # Exact decimal string such as "0.05", "12", "-1.5"; at most two decimals
+        text = text.strip()
+        body = text[1:] if text[:1] in "+-" else text
+        whole, _, frac = body.partition(".")
+        if (not (whole or frac) or len(frac) > 2
+                or (whole and not (whole.isascii() and whole.isdecimal()))
+                or (frac and not (frac.isascii() and frac.isdecimal()))):
+            raise ValueError(f"Invalid amount: {text!r}")
+        cents = int(whole or "0") * 100 + int(frac.ljust(2, "0"))
+        return cls(-cents if text[:1] == "-" else cents)
+
+    @classmethod
+    def from_dollars(cls, value):
+        # Dollars as an int, float, Decimal or decimal string (an existing
+        # Money passes through). Note Money(5) is 5 cents, from_dollars(5) $5.
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, int):
+            return cls(value * 100)
+        if isinstance(value, float):
+            return cls(round(value * 100))
+        if isinstance(value, Decimal):
+            return cls(int((value * 100).to_integral_value()))
+        return cls.parse(value)
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __abs__(self):
+        return Money(abs(self.cents))
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, Money):
+            return self.cents <= other.cents
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, Money):
+            return self.cents > other.cents
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, Money):
+            return self.cents >= other.cents
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __str__(self):
+        sign = "-" if self.cents < 0 else ""
+        dollars, cents = divmod(abs(self.cents), 100)
+        return f"{sign}{dollars}.{cents:02d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, spec):
+        if spec in ("", ".2f"):
+            return str(self)
+        return format(Decimal(self.cents).scaleb(-2), spec)
+
+
+ZERO = Money(0)
+MIN_BALANCE = Money(5)  # Every account keeps at least $0.05
+DENOMINATIONS = frozenset((5, 10, 25))  # Accepted coins, in cents
@@ -1,2 +1,274 @@
+import atexit
+import collections
+import socket
+import sys
+import threading
+import time
+
+# Notifications are queued and delivered by a background thread, so a slow
+# terminal, file or listener never sits on a transaction's latency path.
+# The queue is bounded; when it is full the policy decides what gives:
+#
+#   block        the caller waits for room (backpressure), up to block_timeout
+#                seconds if set, after which the message is dropped
+#   drop_newest  the new message is dropped
+#   drop_oldest  the oldest queued message is dropped to make room
+#
+# The worker takes up to batch_size messages at a time and hands each batch
+# to every sink in one write. A sink that fails is counted and retried with
+# the next batch; the batch itself is not redelivered.
+POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+class StdoutSink:
+    def __init__(self, stream=None):
+        self.stream = stream  # None: whatever sys.stdout is at delivery time
+
+    def write(self, messages):
+        stream = self.stream or sys.stdout
+        stream.write("".join(f"Notification: {message}\n" for message in messages))
+        stream.flush()
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, messages):
+        self._file.write("".join(f"{message}\n" for message in messages))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SocketSink:
+    # Newline-delimited messages to a Unix stream socket at `path`. The
+    # connection is opened on first use and again after a failure.
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+
+    def write(self, messages):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+        try:
+            self._sock.sendall("".join(f"{message}\n" for message in messages).encode())
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def parse_sinks(spec):
+    # "stdout", "file:PATH", "socket:PATH", comma separated
+    sinks = []
+    for part in spec.split(","):
+        kind, _, target = part.strip().partition(":")
+        if kind == "stdout":
+            sinks.append(StdoutSink())
+        elif kind == "file" and target:
+            sinks.append(FileSink(target))
+        elif kind == "socket" and target:
+            sinks.append(SocketSink(target))
+        else:
+            raise ValueError(f"Unknown notification sink: {part.strip()!r}")
+    return sinks
+
+
+class Notifier:
+    def __init__(self, sinks, capacity=10000, policy="drop_oldest", batch_size=256,
+                 flush_interval=0.05, block_timeout=None):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        self.sinks = list(sinks)
+        self.capacity = capacity
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._queue = collections.deque()  # (time.monotonic() when queued, message)
+        self._cond = threading.Condition()
+        self._in_flight = 0  # Messages taken by the worker but not yet delivered
+        self._urgent = False  # flush() is waiting: deliver without filling a batch
+        self._closing = False
+        self._thread = None
+        # Counters
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.failures = 0  # Failed sink writes
+        self.batches = 0
+        self.blocked = 0  # Submits that had to wait for room
+        self.lag_last = 0.0  # Seconds from queueing to delivery, oldest message of the last batch
+        self.lag_max = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, message):
+        # Queue one message; False if it was dropped
+        with self._cond:
+            if self._closing:
+                self.dropped += 1
+                return False
+            self.submitted += 1
+            if len(self._queue) >= self.capacity:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    self.blocked += 1
+                    deadline = None if self.block_timeout is None else time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.capacity and not self._closing:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    if len(self._queue) >= self.capacity or self._closing:
+                        self.dropped += 1
+                        return False
+            self._queue.append((time.monotonic(), message))
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._cond.notify_all()  # Start the flush timer, or a full batch is ready
+            return True
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._queue),
+                "capacity": self.capacity,
+                "submitted": self.submitted,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "failures": self.failures,
+                "batches": self.batches,
+                "blocked": self.blocked,
+                "lag_last": self.lag_last,
+                "lag_max": self.lag_max,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Wait for a full batch, or for the oldest message to have
+                # waited flush_interval
+                while not self._closing and not self._urgent and len(self._queue) < self.batch_size:
+                    if not self._queue:
+                        self._cond.wait()
+                        continue
+                    remaining = self._queue[0][0] + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._queue:
+                    self._urgent = False
+                    if self._closing:
+                        break
+                    continue
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                self._cond.notify_all()  # Room for blocked submitters
+            messages = [message for _, message in batch]
+            for sink in self.sinks:
+                try:
+                    sink.write(messages)
+                except Exception:
+                    with self._cond:
+                        self.failures += 1
+            lag = time.monotonic() - batch[0][0]
+            with self._cond:
+                self._in_flight = 0
+                self.delivered += len(batch)
+                self.batches += 1
+                self.lag_last = lag
+                self.lag_max = max(self.lag_max, lag)
+                self._cond.notify_all()
+        self._close_sinks()
+
+    def _close_sinks(self):
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception:
+                pass
+
+    def flush(self, timeout=None):
+        # Wait until everything queued so far has been handed to the sinks
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while (self._queue or self._in_flight) and self._thread is not None:
+                self._urgent = True
+                self._cond.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not self._queue
+
+    def close(self, timeout=5.0):
+        # Deliver what is queued (for up to `timeout` seconds), then stop.
+        # The worker closes the sinks once it has delivered everything, so a
+        # worker still writing when the timeout runs out keeps its sinks open.
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is None:
+            self._close_sinks()
+            return
+        thread.join(timeout)
+        if not thread.is_alive():
+            self._thread = None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_notifier():
+    # The notifier behind notify(): stdout, started on first use and drained
+    # at exit
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Notifier([StdoutSink()]).start()
+                atexit.register(_default.close)
+    return _default
+
+
+def set_default_notifier(notifier):
+    global _default
+    with _default_lock:
+        _default = notifier
+
+
 def notify(message):
-    print(f"Notification: {message}")
\ No newline at end of file
+    return default_notifier().submit(message)
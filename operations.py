@@ -1,18 +1,26 @@
+from bank import metrics
+from bank.engine import TransactionEngine
+from bank.money import Money
+
+
 class Operations:
-    def __init__(self, account):
+    def __init__(self, account, engine=None):
         self.account = account
+        self.engine = engine if engine is not None else TransactionEngine()
 
+    @metrics.timed("operations_deposit")
     def deposit(self, amount):
-        if amount > 0:
-            self.account.balance += amount
+        amount = Money.from_dollars(amount)
+        if self.engine.deposit(self.account, amount):
             return f"Deposited: {amount}. New balance: {self.account.balance}"
         return "Deposit amount must be positive."
 
+    @metrics.timed("operations_withdraw")
     def withdraw(self, amount):
-        if 0 < amount <= self.account.balance:
-            self.account.balance -= amount
+        amount = Money.from_dollars(amount)
+        if self.engine.withdraw(self.account, amount):
             return f"Withdrew: {amount}. New balance: {self.account.balance}"
         return "Insufficient balance or invalid amount."
 
     def check_balance(self):
-        return f"Current balance: {self.account.balance}"
\ No newline at end of file
+        return f"Current balance: {self.account.balance}"
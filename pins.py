@@ -0,0 +1,28 @@
+import hashlib
+import hmac
+import os
+
+# PINs are stored as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>". A
+# 4-digit PIN has only 10,000 values, so the iteration count is what makes an
+# offline guess of a leaked hash expensive (about 50 ms per guess here).
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 100000
+SALT_BYTES = 16
+
+
+def hash_pin(pin, iterations=ITERATIONS):
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", str(pin).encode(), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def verify_pin(pin, encoded):
+    algorithm, iterations, salt, digest = encoded.split("$")
+    if algorithm != ALGORITHM:
+        raise ValueError(f"Unknown PIN hash algorithm: {algorithm!r}")
+    candidate = hashlib.pbkdf2_hmac("sha256", str(pin).encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+def is_hash(value):
+    return isinstance(value, str) and value.startswith(ALGORITHM + "$")
@@ -0,0 +1,46 @@
+import threading
+
+
+class AccountRegistry:
+    def __init__(self):
+        self._accounts = {}  # Dict: account_number -> (User, Account)
+        self._lock = threading.Lock()
+
+    def add_user(self, user):
+        # Index accounts the user already has and keep the index current from
+        # now on, since User.add_account reports new accounts back here.
+        user.registry = self
+        for account in user.accounts:
+            self.register(user, account)
+
+    def register(self, user, account):
+        with self._lock:
+            existing = self._accounts.get(account.account_number)
+            if existing is not None and existing[1] is not account:
+                raise ValueError(f"Account number {account.account_number} already exists.")
+            self._accounts[account.account_number] = (user, account)
+
+    def clear(self):
+        self._accounts.clear()
+
+    def lookup(self, account_number):
+        return self._accounts.get(account_number, (None, None))
+
+    def get_account(self, account_number):
+        return self.lookup(account_number)[1]
+
+    def __contains__(self, account_number):
+        return account_number in self._accounts
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def __iter__(self):
+        return iter(self._accounts.values())
+
+
+def build_registry(users):
+    registry = AccountRegistry()
+    for user in users.values():
+        registry.add_user(user)
+    return registry
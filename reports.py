@@ -0,0 +1,221 @@
+import argparse
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from bank import main as bank
+from bank.aggregates import balance_bins, balance_labels
+from bank.columnar import ColumnarStore
+from bank.history import BalanceHistory
+from bank.storage import scan_directory
+from bank.txtypes import TX_CLASSES, class_table, label_table, sign_table
+
+_DAY_MICROS = 86400 * 10 ** 6
+
+
+def ledger_frame(ledger):
+    # The whole ledger as a DataFrame, built from the typed columns; labels,
+    # classes and signs are array lookups on the type code.
+    frames, tables = [], {}  # Name arrays by the id of the list they were made from, after the columns
+    for cols, accounts, users in list(ledger.chunks()) or [(ColumnarStore().numpy_range(), [], [])]:
+        for names in (accounts, users):
+            if id(names) not in tables:
+                tables[id(names)] = np.array(names, dtype=object)
+        codes = cols["type"]
+        frames.append(pd.DataFrame({
+            "account_number": tables[id(accounts)][cols["account"]],
+            "user": tables[id(users)][cols["user"]],
+            "datetime": pd.to_datetime(cols["ts"], unit="us"),
+            "type": label_table()[codes],
+            "amount": cols["cents"] / 100,
+            "signed": cols["cents"] * sign_table()[codes] / 100,
+            "tx_class": np.array(TX_CLASSES, dtype=object)[class_table()[codes]],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def show_charts():
+    import matplotlib.pyplot as plt
+
+    # Build a DataFrame from the transaction log
+    df = ledger_frame(bank.transaction_log)
+
+    if not df.empty:
+        # Sort by datetime
+        df = df.sort_values('datetime')
+
+        # Running balances per account, seeded from the real opening balances
+        history = BalanceHistory.from_accounts(bank.transaction_log, (acc for _, acc in bank.registry))
+        balance_points = history.update()
+        account_balances = {}
+        account_dates = {}
+        for acc, points in balance_points.groupby('account_number', sort=False):
+            account_balances[acc] = points['balance'].tolist()
+            account_dates[acc] = points['datetime'].tolist()
+        current_balances = history.current()
+
+        # Plot for at least 3 accounts (or users)
+        plt.figure(figsize=(10, 6))
+        plotted = 0
+        for acc in account_balances:
+            if plotted >= 3:
+                break
+            plt.plot(account_dates[acc], account_balances[acc], marker='o', label=f'Account {acc}')
+            plotted += 1
+
+        plt.xlabel('Date')
+        plt.ylabel('Balance')
+        plt.title('User Account Activity Over Time')
+        plt.legend()
+        plt.tight_layout()
+        plt.show()
+
+        # --- System-Wide Daily Transaction Volume Bar Chart ---
+        df['date'] = df['datetime'].dt.date
+
+        # Aggregate daily transaction counts by type
+        daily_counts = df.groupby(['date', 'tx_class']).size().unstack(fill_value=0)
+
+        # Plot stacked bar chart
+        daily_counts.plot(kind='bar', stacked=True, figsize=(10,6))
+        plt.xlabel('Date')
+        plt.ylabel('Number of Transactions')
+        plt.title('Daily Transaction Volume')
+        plt.legend(title='Transaction Type')
+        plt.tight_layout()
+        plt.show()
+
+        # --- Distribution of Account Balances Histogram ---
+        # Get the latest balance for each account from your current_balances dict
+        balances = list(current_balances.values())
+
+        plt.figure(figsize=(10, 6))
+        plt.hist(balances, bins=balance_bins, edgecolor='black')
+        plt.xlabel('Balance Range')
+        plt.ylabel('Number of Accounts')
+        plt.title('Distribution of Account Balances')
+        plt.xticks(
+            [(balance_bins[i] + balance_bins[i+1])/2 for i in range(len(balance_bins)-1)],
+            balance_labels, rotation=45
+        )
+        plt.tight_layout()
+        plt.show()
+    else:
+        print("No transaction data available for visualization.")
+
+
+class StreamingReport:
+    # Running per-day, per-class transaction counts and balance-bucket counts,
+    # fed a chunk of rows or balances at a time, so memory depends on the
+    # number of days and buckets, not on the length of the history.
+    # update() feeds it the rows a live ledger got since the last call.
+    def __init__(self, ledger=None):
+        self.ledger = ledger
+        self.daily_counts = {}  # Dict: (date, class index) -> count
+        self.balance_counts = [0] * len(balance_labels)
+        self._processed = 0
+
+    def add(self, ts, codes):
+        # One chunk of rows: NumPy arrays of epoch micros and type codes
+        width = len(TX_CLASSES)
+        keys, counts = np.unique(ts // _DAY_MICROS * width + class_table()[codes], return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            day, tx_class = divmod(key, width)
+            self.daily_counts[(day, tx_class)] = self.daily_counts.get((day, tx_class), 0) + count
+
+    def add_balances(self, cents):
+        # One chunk of balances in cents, bucketed like bank.aggregates.bucket()
+        edges = [int(edge * 100) for edge in balance_bins[1:-1]]
+        counts = np.bincount(np.searchsorted(edges, cents, side="right"), minlength=len(balance_labels))
+        self.balance_counts = [a + b for a, b in zip(self.balance_counts, counts.tolist())]
+
+    def update(self):
+        stop = len(self.ledger)
+        for cols, _, _ in self.ledger.chunks(self._processed, stop):
+            self.add(cols["ts"], cols["type"])
+        self._processed = stop
+
+    def daily_table(self):
+        # (dates, {class: counts per date}) with dates in order
+        days = sorted({day for day, _ in self.daily_counts})
+        epoch = datetime.date(1970, 1, 1)
+        table = {name: [self.daily_counts.get((day, i), 0) for day in days]
+                 for i, name in enumerate(TX_CLASSES)}
+        return [epoch + datetime.timedelta(days=day) for day in days], table
+
+    def render(self, out_dir, fmt="png"):
+        # Write the charts with the Agg canvas; nothing is shown or blocks
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        os.makedirs(out_dir, exist_ok=True)
+        written = []
+
+        dates, table = self.daily_table()
+        fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        positions = np.arange(len(dates))
+        bottom = np.zeros(len(dates))
+        for name in TX_CLASSES:
+            if any(table[name]):
+                ax.bar(positions, table[name], bottom=bottom, label=name)
+                bottom += table[name]
+        ax.set_xticks(positions, [str(day) for day in dates], rotation=90)
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Number of Transactions')
+        ax.set_title('Daily Transaction Volume')
+        if dates:
+            ax.legend(title='Transaction Type')
+        fig.tight_layout()
+        path = os.path.join(out_dir, f"daily_volume.{fmt}")
+        fig.savefig(path)
+        written.append(path)
+
+        fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.bar(range(len(balance_labels)), self.balance_counts, edgecolor='black')
+        ax.set_xticks(range(len(balance_labels)), balance_labels, rotation=45)
+        ax.set_xlabel('Balance Range')
+        ax.set_ylabel('Number of Accounts')
+        ax.set_title('Distribution of Account Balances')
+        fig.tight_layout()
+        path = os.path.join(out_dir, f"balance_distribution.{fmt}")
+        fig.savefig(path)
+        written.append(path)
+        return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bank reports")
+    parser.add_argument("--out", help="write headless charts to this directory instead of showing them")
+    parser.add_argument("--format", choices=("png", "svg"), default="png")
+    args = parser.parse_args(argv)
+    if args.out:
+        directory = os.environ.get("BANK_DATA_DIR")
+        if directory:
+            # Reads the files a chunk at a time and writes nothing, so it can
+            # run from cron next to a live process
+            report = StreamingReport()
+            balances, chunks = scan_directory(directory)
+            for cols in chunks:
+                report.add(cols["ts"], cols["type"])
+            report.add_balances(np.fromiter(balances.values(), dtype=np.int64, count=len(balances)))
+        else:
+            bank.init()
+            report = StreamingReport(bank.transaction_log)
+            report.update()
+            report.balance_counts = list(bank.aggregates.balance_counts)
+        for path in report.render(args.out, args.format):
+            print(f"Wrote {path}")
+        return
+    # Load persisted history (if any) before charting it
+    bank.open_storage()
+    show_charts()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+import argparse
+import datetime
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from bank.columnar import from_micros, to_micros
+from bank.money import Money
+from bank.txtypes import for_code, for_label
+
+# On-disk ledger archive. Each segment file holds a run of ledger rows as
+# fixed-width little-endian records, sorted by (account, time, offset), then
+# an index of the accounts in it and a small JSON footer:
+#
+#   MAGIC | records | account index | footer JSON | footer length (uint64) | MAGIC
+#
+# The account index has one fixed-width entry per account present (its
+# first record, count and time range), sorted by id. The footer has the row
+# count, the first ledger offset, the time range and the segment's own name
+# maps: account ids, user ids and type codes in the records index the
+# footer's "accounts", "users" and "types" lists, so a segment reads the same
+# whatever the writing process had registered before or since. Readers mmap
+# the file and view records and index as NumPy structured arrays without
+# copying, so a query reads only the footers, the index pages it searches
+# and the pages of the blocks it needs.
+MAGIC = b"BANKSEG1"
+RECORD = np.dtype({
+    "names": ["offset", "ts", "cents", "account", "user", "type"],
+    "formats": ["<i8", "<i8", "<i8", "<i4", "<i4", "i1"],
+    "offsets": [0, 8, 16, 24, 28, 32],
+    "itemsize": 40,
+})
+INDEX = np.dtype({
+    "names": ["account", "first", "count", "ts_min", "ts_max"],
+    "formats": ["<i4", "<i8", "<i8", "<i8", "<i8"],
+    "offsets": [0, 8, 16, 24, 32],
+    "itemsize": 40,
+})
+SEGMENT_ROWS = 1 << 20
+
+
+def _segment_name(first_offset):
+    return f"seg-{first_offset:012d}.bin"
+
+
+def segment_files(directory):
+    # (first ledger offset, path) for every segment, oldest first
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith("seg-") and name.endswith(".bin"):
+            found.append((int(name[4:-4]), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _concat(parts):
+    # One (cols, accounts, users) from several Ledger.chunks() parts, each
+    # part's account and user ids renumbered into shared name lists
+    if len(parts) == 1:
+        return parts[0]
+    known = ({}, {})
+    columns = {name: [] for name in RECORD.names if name != "offset"}
+    for cols, accounts, users in parts:
+        for name in ("ts", "cents", "type"):
+            columns[name].append(cols[name])
+        for name, names, ids in (("account", accounts, known[0]), ("user", users, known[1])):
+            renumber = np.array([ids.setdefault(value, len(ids)) for value in names], dtype=np.int32)
+            columns[name].append(renumber[cols[name]])
+    return ({name: np.concatenate(values) for name, values in columns.items()},
+            list(known[0]), list(known[1]))
+
+
+class SegmentWriter:
+    # Appends ledger rows to `directory` as sealed segments of up to
+    # `segment_rows` rows. Rows already archived (by this or an earlier run)
+    # are skipped, so write() can be called repeatedly as the ledger grows.
+    def __init__(self, directory, segment_rows=SEGMENT_ROWS):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        os.makedirs(directory, exist_ok=True)
+        self.written = 0  # Ledger offset of the first row not yet archived
+        for first, path in segment_files(directory):
+            segment = Segment(path)
+            self.written = max(self.written, first + segment.rows)
+            segment.close()
+
+    def write(self, ledger, flush=True, stop=None):
+        # Archive new rows up to offset `stop` (default: all) in full
+        # segments; flush=True also seals the last, partial one. Returns the
+        # paths written.
+        stop = len(ledger) if stop is None else min(stop, len(ledger))
+        if not flush:
+            stop -= (stop - self.written) % self.segment_rows
+        paths = []
+        for first in range(self.written, stop, self.segment_rows):
+            last = min(first + self.segment_rows, stop)
+            paths.append(self._seal(first, *_concat(list(ledger.chunks(first, last)))))
+            self.written = last
+        return paths
+
+    def _seal(self, first, cols, account_names, user_names):
+        rows = len(cols["ts"])
+        records = np.empty(rows, dtype=RECORD)
+        records["offset"] = np.arange(first, first + rows, dtype=np.int64)
+        records["ts"] = cols["ts"]
+        records["cents"] = cols["cents"]
+        # Renumber accounts, users and types within the segment
+        account_ids, records["account"] = np.unique(cols["account"], return_inverse=True)
+        user_ids, records["user"] = np.unique(cols["user"], return_inverse=True)
+        codes, records["type"] = np.unique(cols["type"], return_inverse=True)
+        records = records[np.lexsort((records["offset"], records["ts"], records["account"]))]
+        accounts, starts, counts = np.unique(records["account"], return_index=True, return_counts=True)
+        ts = records["ts"]
+        index = np.empty(len(accounts), dtype=INDEX)
+        index["account"] = accounts
+        index["first"] = starts
+        index["count"] = counts
+        index["ts_min"] = ts[starts]
+        index["ts_max"] = ts[starts + counts - 1]
+        footer = json.dumps({
+            "rows": rows,
+            "first_offset": first,
+            "ts_min": int(ts.min()),
+            "ts_max": int(ts.max()),
+            "accounts": [account_names[i] for i in account_ids.tolist()],
+            "users": [user_names[i] for i in user_ids.tolist()],
+            "types": [for_code(code).label for code in codes.tolist()],
+        }).encode()
+        path = os.path.join(self.directory, _segment_name(first))
+        _write_atomic(path, b"".join((MAGIC, records.tobytes(), index.tobytes(), footer,
+                                      struct.pack("<Q", len(footer)), MAGIC)))
+        return path
+
+
+class Segment:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mmap
+        if mm[:8] != MAGIC or mm[-8:] != MAGIC:
+            raise ValueError(f"{path} is not a ledger segment")
+        (length,) = struct.unpack("<Q", mm[-16:-8])
+        self.footer = json.loads(mm[len(mm) - 16 - length:len(mm) - 16])
+        self.rows = self.footer["rows"]
+        self._account_ids = None  # Dict: account number -> id in this segment, built on first lookup
+        # Zero-copy views of the records and the account index
+        self.records = np.frombuffer(mm, dtype=RECORD, count=self.rows, offset=len(MAGIC))
+        self.index = np.frombuffer(mm, dtype=INDEX, count=len(self.footer["accounts"]),
+                                   offset=len(MAGIC) + self.rows * RECORD.itemsize)
+
+    def account_id(self, account_number):
+        # The account's id within this segment, or None
+        if self._account_ids is None:
+            self._account_ids = {number: i for i, number in enumerate(self.footer["accounts"])}
+        return self._account_ids.get(account_number)
+
+    def overlaps(self, start_ts, end_ts):
+        return ((start_ts is None or self.footer["ts_max"] >= start_ts)
+                and (end_ts is None or self.footer["ts_min"] < end_ts))
+
+    def account_block(self, account_id, start_ts=None, end_ts=None):
+        # This account's records with start_ts <= ts < end_ts (a view)
+        at = np.searchsorted(self.index["account"], account_id)
+        if at == len(self.index) or self.index["account"][at] != account_id:
+            return self.records[:0]
+        _, first, count, ts_min, ts_max = self.index[at].tolist()
+        if (start_ts is not None and ts_max < start_ts) or (end_ts is not None and ts_min >= end_ts):
+            return self.records[:0]
+        records = self.records[first:first + count]
+        ts = records["ts"]
+        lo = 0 if start_ts is None else np.searchsorted(ts, start_ts, "left")
+        hi = count if end_ts is None else np.searchsorted(ts, end_ts, "left")
+        return records[lo:hi]
+
+    def close(self):
+        # The map stays open while arrays taken from it are still alive
+        self.records = self.index = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+
+class SegmentReader:
+    # All segments of a directory. Records it returns carry reader-wide ids:
+    # each segment's own account and user numbers are mapped into the
+    # reader's accounts and users lists, and its type numbers into this
+    # process's type codes (bank.txtypes), so sign_table() and friends apply.
+    # Segments starting at or after ledger offset `stop` are left out.
+    def __init__(self, directory, stop=None):
+        self.directory = directory
+        self.segments = [Segment(path) for first, path in segment_files(directory)
+                         if stop is None or first < stop]
+        self.accounts, self.users = [], []
+        ids = ({}, {})
+        self._maps = []  # Per segment: (account, user, type) arrays, segment id -> reader id
+        for segment in self.segments:
+            maps = []
+            for names, known, key in ((self.accounts, ids[0], "accounts"), (self.users, ids[1], "users")):
+                for name in segment.footer[key]:
+                    if name not in known:
+                        known[name] = len(names)
+                        names.append(name)
+                maps.append(np.array([known[name] for name in segment.footer[key]], dtype=np.int32))
+            maps.append(np.array([for_label(label).code for label in segment.footer["types"]], dtype=np.int8))
+            self._maps.append(maps)
+
+    def _global(self, i, records):
+        # A copy of segment i's records with reader-wide ids
+        records = np.array(records)
+        accounts, users, types = self._maps[i]
+        records["account"] = accounts[records["account"]]
+        records["user"] = users[records["user"]]
+        records["type"] = types[records["type"]]
+        return records
+
+    def account_records(self, account_number, start=None, end=None):
+        # One account's records in [start, end), oldest first (a copy)
+        start_ts, end_ts = _bounds(start, end)
+        parts = []
+        for i, segment in enumerate(self.segments):
+            local = segment.account_id(account_number)
+            if local is not None:
+                parts.append(self._global(i, segment.account_block(local, start_ts, end_ts)))
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=RECORD)
+        return records[np.lexsort((records["offset"], records["ts"]))]
+
+    def scan(self, start=None, end=None):
+        # Yield each overlapping segment's records in [start, end), a
+        # segment at a time
+        start_ts, end_ts = _bounds(start, end)
+        for i, segment in enumerate(self.segments):
+            if not segment.overlaps(start_ts, end_ts):
+                continue
+            records = segment.records
+            footer = segment.footer
+            if (start_ts is not None and footer["ts_min"] < start_ts) or (
+                    end_ts is not None and footer["ts_max"] >= end_ts):
+                ts = records["ts"]
+                mask = np.ones(len(records), dtype=bool)
+                if start_ts is not None:
+                    mask &= ts >= start_ts
+                if end_ts is not None:
+                    mask &= ts < end_ts
+                records = records[mask]
+            yield self._global(i, records)
+
+    def rows(self, start=0, stop=None):
+        # Yield the records of ledger offsets [start, stop), a segment at a
+        # time, in offset order
+        for i, segment in enumerate(self.segments):
+            first = segment.footer["first_offset"]
+            last = first + segment.rows if stop is None else min(first + segment.rows, stop)
+            if max(first, start) >= last:
+                continue
+            records = segment.records
+            if first < start or first + segment.rows > last:
+                offsets = records["offset"]
+                records = records[(offsets >= start) & (offsets < last)]
+            yield self._global(i, records[np.argsort(records["offset"], kind="stable")])
+
+    def page(self, account_numbers=None, after=None, end_ts=None, codes=None, limit=50):
+        # The first `limit` records, in (ts, offset) order, of the given
+        # accounts (all if None) with (ts, offset) > after and ts < end_ts
+        # (no bound if None) and a type code in `codes` (all if None).
+        # Segments are visited by their earliest time and the visit stops at
+        # one that starts after the page is full; only the matching
+        # positions of each segment up to the page's last time are sorted
+        # and copied.
+        start_ts = after[0] if after is not None else None
+        codes = np.array(sorted(codes), dtype=np.int8) if codes is not None else None
+        found = np.empty(0, dtype=RECORD)
+        for i in sorted(range(len(self.segments)), key=lambda i: self.segments[i].footer["ts_min"]):
+            segment = self.segments[i]
+            if len(found) == limit and segment.footer["ts_min"] > found["ts"][-1]:
+                break
+            if not segment.overlaps(start_ts, end_ts):
+                continue
+            if account_numbers is None:
+                blocks = [segment.records]
+            else:
+                ids = (segment.account_id(number) for number in dict.fromkeys(account_numbers))
+                blocks = [segment.account_block(local, start_ts, end_ts) for local in ids if local is not None]
+            parts = [found]
+            for records in blocks:
+                ts, offsets = records["ts"], records["offset"]
+                keep = np.ones(len(records), dtype=bool)
+                if after is not None:
+                    keep &= (ts > after[0]) | ((ts == after[0]) & (offsets > after[1]))
+                if end_ts is not None:
+                    keep &= ts < end_ts
+                if codes is not None:
+                    keep &= np.isin(self._maps[i][2][records["type"]], codes)
+                picked = np.flatnonzero(keep)
+                if len(picked) > limit:
+                    # Only rows up to the limit-th earliest time can be on the page
+                    picked = picked[ts[picked] <= np.partition(ts[picked], limit - 1)[limit - 1]]
+                picked = picked[np.lexsort((offsets[picked], ts[picked]))[:limit]]
+                parts.append(self._global(i, records[picked]))
+            found = np.concatenate(parts)
+            found = found[np.lexsort((found["offset"], found["ts"]))[:limit]]
+        return found
+
+    def counts(self):
+        # Dict: account_number -> number of archived rows
+        counts = {}
+        for segment in self.segments:
+            names = segment.footer["accounts"]
+            for account, count in zip(segment.index["account"].tolist(), segment.index["count"].tolist()):
+                counts[names[account]] = counts.get(names[account], 0) + count
+        return counts
+
+    def entries(self, records):
+        # Records as the dicts the history menus print
+        return [{
+            "account_number": self.accounts[account],
+            "user": self.users[user],
+            "datetime": from_micros(ts).strftime('%Y-%m-%d %H:%M:%S'),
+            "type": for_code(code).label,
+            "amount": Money(cents),
+        } for ts, cents, account, user, code in zip(
+            records["ts"].tolist(), records["cents"].tolist(), records["account"].tolist(),
+            records["user"].tolist(), records["type"].tolist())]
+
+    def __len__(self):
+        return sum(segment.rows for segment in self.segments)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+
+def _bounds(start, end):
+    return (to_micros(start) if start is not None else None,
+            to_micros(end) if end is not None else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive the ledger to mmap-able segments, or read them back")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="append new ledger rows from BANK_DATA_DIR to DIR")
+    export.add_argument("dir")
+    export.add_argument("--segment-rows", type=int, default=SEGMENT_ROWS)
+    history = commands.add_parser("history", help="print one account's archived rows")
+    history.add_argument("dir")
+    history.add_argument("account")
+    history.add_argument("--from", dest="start", type=datetime.datetime.fromisoformat)
+    history.add_argument("--to", dest="end", type=datetime.datetime.fromisoformat, help="exclusive")
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        from bank import main as bank
+        bank.open_storage(read_only=True)
+        writer = SegmentWriter(args.dir, args.segment_rows)
+        for path in writer.write(bank.transaction_log):
+            print(f"Wrote {path}")
+        print(f"{writer.written} rows archived")
+    else:
+        reader = SegmentReader(args.dir)
+        for tx in reader.entries(reader.account_records(args.account, args.start, args.end)):
+            print(f"{tx['datetime']} | {tx['account_number']} | {tx['user']} | {tx['type']} | ${tx['amount']:.2f}")
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import hmac
+import json
+import os
+
+from bank import main as bank
+from bank import metrics
+from bank.money import Money
+from bank.txtypes import TX_CLASSES, of_class
+
+# One JSON object per line in each direction. Requests carry an "op" plus its
+# arguments and an optional "id" that is echoed back; replies have "ok" and
+# either the result fields or an "error" message. Amounts are decimal strings.
+#
+#   {"op": "login", "account": "1001", "pin": "1234"}
+#   {"op": "transfer", "from": "1001", "to": "2001", "amount": "0.25", "id": 7}
+#
+# history and admin_logs return one page of at most "limit" rows (default 100)
+# plus a "cursor" to send back for the next page (null on the last one), and
+# take optional "from"/"to" ISO dates ("to" exclusive) and "types" filters
+# ("deposit", "withdrawal", "transfer").
+#
+# Admin operations need {"op": "admin_login", "token": ...} with the token
+# from BANK_ADMIN_TOKEN; without that variable they are disabled.
+#
+# Handlers only parse requests and shape replies; the operations themselves
+# are bank.main.service (a BankService), shared with the teller CLI. Ops that
+# hash a PIN, take account or ledger locks or wait for the journal run in a
+# worker thread, so one session's fsync (or an admin check holding the
+# ledger lock) does not stall the others: logins in the default executor,
+# the rest in a pool of their own so they do not queue behind PIN hashes.
+#
+# A request line longer than 64 KiB gets an error reply and the connection
+# is closed.
+BLOCKING_OPS = frozenset(("deposit", "withdraw", "transfer", "history", "admin_freeze", "admin_adjust",
+                          "admin_logs", "admin_check"))
+
+
+class RequestError(Exception):
+    pass
+
+
+class Session:
+    def __init__(self, source="unknown"):
+        self.source = source  # Client host, the key for per-source login rate limits
+        self.user = None
+        self.admin = False
+
+
+def _entry(tx):
+    return {**tx, "amount": str(tx["amount"])}
+
+
+def _amount(request, key="amount"):
+    try:
+        return Money.parse(str(request[key]))
+    except (KeyError, ValueError):
+        raise RequestError(f"'{key}' must be a decimal amount.")
+
+
+def _request_id(request):
+    # Optional client-chosen id that makes a retried deposit, withdrawal or
+    # transfer safe: the server applies it once and answers repeats the same way
+    request_id = request.get("request_id")
+    if request_id is None:
+        return None
+    if not isinstance(request_id, str) or not 0 < len(request_id) <= 128:
+        raise RequestError("'request_id' must be a string of 1 to 128 characters.")
+    return request_id
+
+
+def _history_page(request, account_numbers):
+    try:
+        start = datetime.datetime.fromisoformat(request["from"]) if request.get("from") else None
+        end = datetime.datetime.fromisoformat(request["to"]) if request.get("to") else None
+    except (TypeError, ValueError):
+        raise RequestError("'from' and 'to' must be ISO dates.")
+    limit = request.get("limit", 100)
+    if not isinstance(limit, int) or not 1 <= limit <= 1000:
+        raise RequestError("'limit' must be between 1 and 1000.")
+    types = None
+    if request.get("types"):
+        classes = [str(name).capitalize() for name in request["types"]]
+        if not set(classes) <= set(TX_CLASSES):
+            raise RequestError("'types' must be deposit, withdrawal or transfer.")
+        types = [tx_type for name in classes for tx_type in of_class(name)]
+    cursor = request.get("cursor")
+    if cursor is not None and not isinstance(cursor, str):
+        raise RequestError("'cursor' must be the string returned with the previous page.")
+    page, cursor = bank.service.history(account_numbers, start, end, types, cursor, limit)
+    return {"transactions": [_entry(tx) for tx in page], "cursor": cursor}
+
+
+class BankServer:
+    def __init__(self, admin_token=None):
+        self.admin_token = admin_token
+        self.sessions = 0
+        self.executor = ThreadPoolExecutor(thread_name_prefix="bank-op")  # For BLOCKING_OPS
+        self.handlers = {
+            "login": self.login,
+            "logout": self.logout,
+            "accounts": self.accounts,
+            "balance": self.balance,
+            "deposit": self.deposit,
+            "withdraw": self.withdraw,
+            "transfer": self.transfer,
+            "history": self.history,
+            "admin_login": self.admin_login,
+            "admin_accounts": self.admin_accounts,
+            "admin_freeze": self.admin_freeze,
+            "admin_adjust": self.admin_adjust,
+            "admin_logs": self.admin_logs,
+            "admin_activity": self.admin_activity,
+            "admin_summary": self.admin_summary,
+            "admin_check": self.admin_check,
+        }
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        session = Session(peer[0] if peer else "unknown")
+        self.sessions += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Longer than the stream limit
+                    writer.write(json.dumps({"ok": False, "error": "Request line too long."}).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                request, reply = self.parse(line)
+                if reply is None:
+                    op = request.get("op")
+                    if op == "login":
+                        reply = await asyncio.to_thread(self.run, session, request)
+                    elif op in BLOCKING_OPS:
+                        reply = await asyncio.get_running_loop().run_in_executor(
+                            self.executor, self.run, session, request)
+                    else:
+                        reply = self.run(session, request)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    def parse(self, line):
+        # (request, None), or (None, error reply) for a line that is not a JSON object
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return None, {"ok": False, "error": "Malformed request."}
+        if not isinstance(request, dict):
+            return None, {"ok": False, "error": "Request must be a JSON object."}
+        return request, None
+
+    def run(self, session, request):
+        request_id = request.get("id")
+        try:
+            handler = self.handlers.get(request.get("op"))
+            if handler is None:
+                raise RequestError(f"Unknown op: {request.get('op')!r}")
+            reply = {"ok": True, **handler(session, request)}
+        except RequestError as e:
+            reply = {"ok": False, "error": str(e)}
+        except ValueError:
+            reply = {"ok": False, "error": "Malformed request."}
+        except Exception as e:
+            reply = {"ok": False, "error": f"Error during {request.get('op')}: {e}"}
+        if request_id is not None:
+            reply["id"] = request_id
+        return reply
+
+    def _own_account(self, session, number):
+        if session.user is None:
+            raise RequestError("Not logged in.")
+        for acc in session.user.accounts:
+            if acc.account_number == number:
+                return acc
+        raise RequestError("Not one of your accounts.")
+
+    def _require_admin(self, session):
+        if not session.admin:
+            raise RequestError("Admin login required.")
+
+    def login(self, session, request):
+        user, error = bank.service.login(str(request.get("account")), str(request.get("pin")),
+                                         source=session.source)
+        if error:
+            raise RequestError(error)
+        session.user = user
+        return {"user": user.username}
+
+    def logout(self, session, request):
+        session.user = None
+        session.admin = False
+        return {}
+
+    def accounts(self, session, request):
+        if session.user is None:
+            raise RequestError("Not logged in.")
+        return {"accounts": [{"account": acc.account_number, "balance": str(acc.balance)}
+                             for acc in session.user.accounts]}
+
+    def balance(self, session, request):
+        acc = self._own_account(session, request.get("account"))
+        return {"account": acc.account_number, "balance": str(acc.balance)}
+
+    def deposit(self, session, request):
+        acc = self._own_account(session, request.get("account"))
+        receipt, error = bank.service.deposit(session.user, acc.account_number, _amount(request),
+                                              request_id=_request_id(request))
+        if error:
+            raise RequestError(error)
+        return {"account": receipt.account_number, "balance": str(receipt.balance)}
+
+    def withdraw(self, session, request):
+        acc = self._own_account(session, request.get("account"))
+        receipt, error = bank.service.withdraw(session.user, acc.account_number, _amount(request),
+                                               request_id=_request_id(request))
+        if error:
+            raise RequestError(error)
+        return {"account": receipt.account_number, "balance": str(receipt.balance)}
+
+    def transfer(self, session, request):
+        from_acc = self._own_account(session, request.get("from"))
+        receipt, error = bank.service.transfer(session.user, from_acc.account_number, str(request.get("to")),
+                                               _amount(request), request_id=_request_id(request))
+        if error:
+            raise RequestError(error)
+        return {"from_balance": str(receipt.balance)}
+
+    def history(self, session, request):
+        if session.user is None:
+            raise RequestError("Not logged in.")
+        accounts = session.user.accounts
+        if request.get("account") is not None:
+            accounts = [self._own_account(session, request["account"])]
+        return _history_page(request, [acc.account_number for acc in accounts])
+
+    def admin_login(self, session, request):
+        # Attempts count against the source's login rate limit
+        error = bank.auth.throttle(session.source)
+        if error:
+            raise RequestError(error)
+        token = request.get("token")
+        if (not self.admin_token or not isinstance(token, str)
+                or not hmac.compare_digest(token.encode(), self.admin_token.encode())):
+            raise RequestError("Admin access denied.")
+        session.admin = True
+        return {}
+
+    def admin_accounts(self, session, request):
+        self._require_admin(session)
+        return {"accounts": [
+            {"user": user.username, "account": acc.account_number, "balance": str(acc.balance),
+             "status": "Frozen" if acc.frozen else "Active"}
+            for user, acc in bank.service.all_accounts()
+        ]}
+
+    def admin_freeze(self, session, request):
+        self._require_admin(session)
+        acc, error = bank.service.toggle_freeze(str(request.get("account")))
+        if error:
+            raise RequestError(error)
+        return {"account": acc.account_number, "frozen": acc.frozen}
+
+    def admin_adjust(self, session, request):
+        self._require_admin(session)
+        receipt, error = bank.service.adjust(str(request.get("account")), _amount(request))
+        if error:
+            raise RequestError(error)
+        return {"account": receipt.account_number, "balance": str(receipt.balance)}
+
+    def admin_logs(self, session, request):
+        self._require_admin(session)
+        numbers = [request["account"]] if request.get("account") is not None else None
+        return _history_page(request, numbers)
+
+    def admin_activity(self, session, request):
+        self._require_admin(session)
+        return {"activity": bank.service.activity()}
+
+    def admin_summary(self, session, request):
+        self._require_admin(session)
+        summary = bank.service.summary()
+        return {**summary, "money_supply": str(summary["money_supply"])}
+
+    def admin_check(self, session, request):
+        self._require_admin(session)
+        return {"problems": bank.service.check_aggregates()}
+
+
+async def serve(host="127.0.0.1", port=8765, admin_token=None, ready=None):
+    server = BankServer(admin_token)
+    listener = await asyncio.start_server(server.handle, host, port, backlog=4096)
+    if ready is not None:
+        ready.set_result(listener.sockets[0].getsockname()[1])
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bank JSON-lines server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    bank.open_storage()
+    metrics.start_exporter()
+    try:
+        asyncio.run(serve(args.host, args.port, os.environ.get("BANK_ADMIN_TOKEN")))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if bank.storage:
+            bank.storage.close()
+        if bank.notifier:
+            bank.notifier.close()
+
+
+if __name__ == "__main__":
+    main()
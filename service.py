@@ -0,0 +1,341 @@
+import datetime
+
+from bank import metrics
+from bank.account import Account
+from bank.aggregates import TRANSACTIONS
+from bank.columnar import to_micros
+from bank.idempotency import RequestIdReused
+from bank.money import Money, ZERO, MIN_BALANCE
+from bank.txtypes import (DEPOSIT, WITHDRAWAL, TRANSFER_OWN_OUT, TRANSFER_OWN_IN,
+                          TRANSFER_OUT, TRANSFER_IN)
+
+# The bank's operations without any console or network I/O. Each takes typed
+# arguments (a User, account numbers, Money amounts) and returns a
+# (result, error) pair: the result (usually a Receipt) and None on success,
+# or None and the message to show. The teller CLI in main.py and the server
+# only ask for input and format these results; batch jobs and benchmarks can
+# call them directly.
+#
+# With a notifier (bank.notification.Notifier) every completed change is
+# also queued as a one-line notification, after the account locks are
+# released.
+#
+# Deposits, withdrawals and transfers take an optional request_id. With an
+# idempotency cache (bank.idempotency.IdempotencyCache), a request repeated
+# with the same id by the same user returns the first one's result, without
+# touching balances, the ledger or the notifier again.
+
+
+class Receipt:
+    # What a completed operation did. Balances are as of right after it,
+    # read while the accounts were still locked.
+    def __init__(self, kind, user, account_number, amount, balance, when,
+                 to_user=None, to_account=None, to_balance=None):
+        self.kind = kind  # "deposit", "withdrawal", "transfer" or "adjustment"
+        self.user = user
+        self.account_number = account_number
+        self.amount = amount
+        self.balance = balance
+        self.when = when
+        self.to_user = to_user
+        self.to_account = to_account
+        self.to_balance = to_balance
+
+    def __str__(self):
+        if self.kind == "transfer":
+            return (f"Transfer of ${self.amount:.2f} from account {self.account_number} to "
+                    f"{self.to_account}; balance ${self.balance:.2f}")
+        return (f"{self.kind.capitalize()} of ${self.amount:.2f} on account {self.account_number}; "
+                f"balance ${self.balance:.2f}")
+
+
+def _coins(amount):
+    amount = Money.from_dollars(amount)
+    if amount <= ZERO or amount.cents % 5 != 0:
+        return None, "Amount must be positive and made of 0.05, 0.10 and 0.25 coins."
+    return amount, None
+
+
+def _cents_key(amount):
+    # The amount as it goes into a request fingerprint: cents, so "5", "5.00"
+    # and Money(500) count as the same request; as given if it does not parse
+    # (a malformed request can carry None, a list or a dict)
+    try:
+        return Money.from_dollars(amount).cents
+    except (AttributeError, TypeError, ValueError):
+        return repr(amount)
+
+
+class BankService:
+    def __init__(self, users, registry, auth, engine, ledger, update_history, withdrawal_limits,
+                 storage=None, notifier=None, aggregates=None, idempotency=None):
+        self.users = users
+        self.registry = registry
+        self.auth = auth
+        self.engine = engine
+        self.ledger = ledger
+        self.update_history = update_history
+        self.withdrawal_limits = withdrawal_limits
+        self.storage = storage  # Set by main.open_storage() when BANK_DATA_DIR is used
+        self.notifier = notifier
+        self.aggregates = aggregates  # bank.aggregates.Aggregates kept current by every change, if given
+        self.idempotency = idempotency  # IdempotencyCache for request ids; without one they are ignored
+
+    def _done(self, receipt):
+        if self.notifier is not None:
+            self.notifier.submit(str(receipt))
+        return receipt, None
+
+    def _once(self, user, request_id, request, apply):
+        # apply()'s result, or the stored one if this request id was already used
+        if request_id is None or self.idempotency is None:
+            return apply()
+        try:
+            return self.idempotency.run((user.username, request_id), request, apply)
+        except RequestIdReused:
+            return None, "Request id already used for a different request."
+
+    def own_account(self, user, account_number):
+        for acc in user.accounts:
+            if acc.account_number == account_number:
+                return acc
+        return None
+
+    def login(self, account_number, pincode, source="console"):
+        # (User, None), or (None, message); the account's lockout state is
+        # journaled either way
+        user, msg = self.auth.login(account_number, pincode, source=source)
+        account = self.registry.get_account(account_number)
+        if self.storage and account is not None:
+            self.storage.record_status(account)
+        if user is None:
+            return None, msg
+        return user, None
+
+    @metrics.timed("deposit")
+    def deposit(self, user, account_number, amount, now=None, request_id=None):
+        return self._once(user, request_id, ("deposit", account_number, _cents_key(amount)),
+                          lambda: self._deposit(user, account_number, amount, now))
+
+    def _deposit(self, user, account_number, amount, now):
+        acc = self.own_account(user, account_number)
+        if acc is None:
+            return None, "Not one of your accounts."
+        amount, error = _coins(amount)
+        if error:
+            return None, error
+        with self.engine.locked(acc):
+            now = now or datetime.datetime.now()
+            old = acc.balance.cents
+            acc.balance += amount
+            offset = self.ledger.append(
+                account_number=acc.account_number,
+                user=user.username,
+                when=now,
+                tx_type=DEPOSIT,
+                amount=amount
+            )
+            if self.aggregates is not None:
+                self.aggregates.record([(acc.account_number, DEPOSIT, amount.cents)], to_micros(now),
+                                       [(old, acc.balance.cents)])
+            if self.storage:
+                self.storage.record_transaction([acc], [offset])
+            receipt = Receipt("deposit", user.username, acc.account_number, amount, acc.balance, now)
+        return self._done(receipt)
+
+    def withdrawal_headroom(self, account_number, now=None):
+        # (Money left, binding Limit) before any withdrawal limit is hit
+        return self.withdrawal_limits.headroom(account_number, now)
+
+    @metrics.timed("withdraw")
+    def withdraw(self, user, account_number, amount, now=None, request_id=None):
+        return self._once(user, request_id, ("withdraw", account_number, _cents_key(amount)),
+                          lambda: self._withdraw(user, account_number, amount, now))
+
+    def _withdraw(self, user, account_number, amount, now):
+        acc = self.own_account(user, account_number)
+        if acc is None:
+            return None, "Not one of your accounts."
+        amount, error = _coins(amount)
+        if error:
+            return None, error
+        with self.engine.locked(acc):
+            now = now or datetime.datetime.now()
+            exceeded = self.withdrawal_limits.check(acc.account_number, amount, now)
+            if exceeded is not None:
+                return None, f"This withdrawal would exceed the {exceeded.name} limit of ${exceeded.amount}."
+            if acc.balance - amount < MIN_BALANCE:
+                return None, "Cannot withdraw: minimum balance of 0.05 required."
+            old = acc.balance.cents
+            acc.balance -= amount
+            self.withdrawal_limits.record(acc.account_number, amount, now)
+            offset = self.ledger.append(
+                account_number=acc.account_number,
+                user=user.username,
+                when=now,
+                tx_type=WITHDRAWAL,
+                amount=amount
+            )
+            if self.aggregates is not None:
+                self.aggregates.record([(acc.account_number, WITHDRAWAL, amount.cents)], to_micros(now),
+                                       [(old, acc.balance.cents)])
+            if self.storage:
+                self.storage.record_transaction([acc], [offset], withdrawal=acc.account_number)
+            receipt = Receipt("withdrawal", user.username, acc.account_number, amount, acc.balance, now)
+        return self._done(receipt)
+
+    @metrics.timed("transfer")
+    def transfer(self, user, from_number, to_number, amount, now=None, request_id=None):
+        # Between the user's own accounts or to anyone else's; the ledger
+        # labels the two kinds differently
+        return self._once(user, request_id, ("transfer", from_number, to_number, _cents_key(amount)),
+                          lambda: self._transfer(user, from_number, to_number, amount, now))
+
+    def _transfer(self, user, from_number, to_number, amount, now):
+        from_acc = self.own_account(user, from_number)
+        if from_acc is None:
+            return None, "Not one of your accounts."
+        recipient, to_acc = self.registry.lookup(to_number)
+        if to_acc is None:
+            return None, "Recipient account not found."
+        if to_acc is from_acc:
+            return None, "Cannot transfer to the same account."
+        amount = Money.from_dollars(amount)
+        if amount <= ZERO:
+            return None, "Amount must be positive."
+        if amount.cents % 5 != 0:
+            return None, "Amount must be in valid denominations or multiples of 0.05."
+        own = recipient is user
+        with self.engine.locked(from_acc, to_acc):
+            if from_acc.balance - amount < MIN_BALANCE:
+                return None, "Insufficient funds. Minimum balance of $0.05 must remain."
+            old_from, old_to = from_acc.balance.cents, to_acc.balance.cents
+            from_acc.balance -= amount
+            to_acc.balance += amount
+            now = now or datetime.datetime.now()
+            out_type = TRANSFER_OWN_OUT if own else TRANSFER_OUT
+            in_type = TRANSFER_OWN_IN if own else TRANSFER_IN
+            out_offset = self.ledger.append(
+                account_number=from_acc.account_number,
+                user=user.username,
+                when=now,
+                tx_type=out_type,
+                amount=amount
+            )
+            in_offset = self.ledger.append(
+                account_number=to_acc.account_number,
+                user=recipient.username,
+                when=now,
+                tx_type=in_type,
+                amount=amount
+            )
+            if self.aggregates is not None:
+                self.aggregates.record(
+                    [(from_acc.account_number, out_type, amount.cents), (to_acc.account_number, in_type, amount.cents)],
+                    to_micros(now), [(old_from, from_acc.balance.cents), (old_to, to_acc.balance.cents)])
+            if self.storage:
+                self.storage.record_transaction([from_acc, to_acc], [out_offset, in_offset])
+            receipt = Receipt("transfer", user.username, from_acc.account_number, amount, from_acc.balance, now,
+                              recipient.username, to_acc.account_number, to_acc.balance)
+        return self._done(receipt)
+
+    @metrics.timed("create_account")
+    def create_account(self, user, account_number, pincode, balance=MIN_BALANCE):
+        if not (pincode.isdigit() and len(pincode) == 4):
+            return None, "Invalid PIN. Must be 4 digits."
+        account = Account(account_number, pincode, balance=balance)
+        try:
+            user.add_account(account)
+        except ValueError:
+            return None, "Account number already exists. Please choose another."
+        if self.aggregates is not None:
+            self.aggregates.add_account(account.balance.cents)
+        if self.storage:
+            self.storage.record_account(user, account)
+        return account, None
+
+    @metrics.timed("change_pin")
+    def change_pin(self, user, account_number, old_pin, new_pin, now=None):
+        # (update history entry, None) once the new PIN is in place
+        acc = self.own_account(user, account_number)
+        if acc is None:
+            return None, "Not one of your accounts."
+        if not self.auth.verify_pin(acc, old_pin):
+            return None, "Incorrect PIN. Update aborted."
+        if not (new_pin.isdigit() and len(new_pin) == 4):
+            return None, "Invalid PIN. Must be 4 digits."
+        if new_pin == old_pin:
+            return None, "New PIN must be different from the old PIN."
+        acc.update_pincode(new_pin)
+        now = now or datetime.datetime.now()
+        # PINs themselves are never kept, only when they changed
+        entry = {
+            "account_number": acc.account_number,
+            "user": user.username,
+            "datetime": now.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self.update_history.append(entry)
+        if self.storage:
+            self.storage.record_pin(acc)
+        if self.notifier is not None:
+            self.notifier.submit(f"PIN changed on account {acc.account_number}")
+        return entry, None
+
+    def pin_history(self, user):
+        numbers = {acc.account_number for acc in user.accounts}
+        return [entry for entry in self.update_history if entry["account_number"] in numbers]
+
+    @metrics.timed("history")
+    def history(self, account_numbers=None, start=None, end=None, types=None, cursor=None, limit=50):
+        # One page of ledger entries and the cursor of the next (None at the end)
+        return self.ledger.query(account_numbers, start, end, types, cursor, limit)
+
+    def all_accounts(self):
+        # (User, Account) for every account, for the admin listings
+        return [(user, acc) for user in list(self.users.values()) for acc in user.accounts]
+
+    @metrics.timed("toggle_freeze")
+    def toggle_freeze(self, account_number):
+        acc = self.registry.get_account(account_number)
+        if acc is None:
+            return None, "Account not found."
+        acc.frozen = not acc.frozen
+        if self.storage:
+            self.storage.record_status(acc)
+        return acc, None
+
+    @metrics.timed("adjust")
+    def adjust(self, account_number, amount, now=None):
+        # Admin credit (positive) or debit (negative); not written to the ledger
+        acc = self.registry.get_account(account_number)
+        if acc is None:
+            return None, "Account not found."
+        amount = Money.from_dollars(amount)
+        with self.engine.locked(acc):
+            if acc.balance + amount < ZERO:
+                return None, "Insufficient funds for removal."
+            old = acc.balance.cents
+            acc.balance += amount
+            if self.aggregates is not None:
+                self.aggregates.record(moves=[(old, acc.balance.cents)])
+            if self.storage:
+                self.storage.record_transaction([acc])
+            receipt = Receipt("adjustment", None, acc.account_number, amount, acc.balance,
+                              now or datetime.datetime.now())
+        return self._done(receipt)
+
+    def activity(self):
+        # Dict: account_number -> number of ledger rows
+        if self.aggregates is not None:
+            return {number: totals[TRANSACTIONS] for number, totals in self.aggregates.accounts.items()}
+        return self.ledger.counts()
+
+    def summary(self):
+        # Account count, money supply, accounts per balance bin and ledger
+        # rows, from the running aggregates
+        return self.aggregates.summary()
+
+    def check_aggregates(self):
+        # Messages for every running total that disagrees with a rebuild from
+        # the ledger and balances; empty when all agree
+        return self.aggregates.check(self.ledger, (acc for _, acc in self.registry), self.engine)
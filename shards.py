@@ -0,0 +1,294 @@
+import datetime
+import multiprocessing
+import os
+import threading
+import zlib
+
+from bank.columnar import to_micros
+from bank.ledger import Ledger
+from bank.money import Money, ZERO, MIN_BALANCE
+from bank.txtypes import DEPOSIT, WITHDRAWAL, TRANSFER_OWN_OUT, TRANSFER_OWN_IN, TRANSFER_OUT, TRANSFER_IN
+
+# Accounts partitioned across worker processes by a stable hash of the
+# account number, so balance updates run on as many cores as there are
+# shards. Each worker owns its accounts' balances and ledger rows outright
+# and handles one message at a time, so it needs no locks.
+#
+# Operations on one shard (deposit, withdraw, transfers between accounts on
+# the same shard) are a single request. A transfer between shards is a
+# two-phase commit driven by the caller: both shards "prepare" (the debit
+# side holds the amount, so it cannot be spent twice), and only if both
+# vote yes are both told to "commit"; otherwise both "abort" and release
+# their holds. Holds live in worker memory, so a coordinator that dies
+# between the phases leaves them until the workers restart.
+#
+# Amounts follow the service's rules: positive and in multiples of 5 cents.
+# Transfers between two accounts of the same user are logged with the
+# own-transfer types, like BankService.transfer does.
+
+
+def _valid(cents):
+    return cents > 0 and cents % 5 == 0
+
+
+def shard_for(account_number, shards):
+    return zlib.crc32(str(account_number).encode()) % shards
+
+
+class _Shard:
+    # State inside one worker process
+    def __init__(self):
+        self.balances = {}  # Dict: account_number -> cents
+        self.owners = {}  # Dict: account_number -> username
+        self.held = {}  # Dict: account_number -> cents held by prepared debits
+        self.prepared = {}  # Dict: txid -> (account_number, signed cents)
+        self.ledger = Ledger()
+
+    def _log(self, number, tx_type, cents):
+        self.ledger.append_micros(number, self.owners[number],
+                                  to_micros(datetime.datetime.now()), tx_type, cents)
+
+    def _available(self, number):
+        return self.balances[number] - self.held.get(number, 0)
+
+    def open(self, number, user, cents):
+        if number in self.balances:
+            return False
+        self.balances[number] = cents
+        self.owners[number] = user
+        return True
+
+    def balance(self, number):
+        return self.balances.get(number)
+
+    def deposit(self, number, cents):
+        if number not in self.balances or not _valid(cents):
+            return False
+        self.balances[number] += cents
+        self._log(number, DEPOSIT, cents)
+        return True
+
+    def withdraw(self, number, cents, min_cents=0):
+        if number not in self.balances or not _valid(cents) or self._available(number) - cents < min_cents:
+            return False
+        self.balances[number] -= cents
+        self._log(number, WITHDRAWAL, cents)
+        return True
+
+    def transfer(self, from_number, to_number, cents, min_cents=MIN_BALANCE.cents):
+        if (from_number == to_number or not _valid(cents) or from_number not in self.balances
+                or to_number not in self.balances or self._available(from_number) - cents < min_cents):
+            return False
+        self.balances[from_number] -= cents
+        self.balances[to_number] += cents
+        own = self.owners[from_number] == self.owners[to_number]
+        self._log(from_number, TRANSFER_OWN_OUT if own else TRANSFER_OUT, cents)
+        self._log(to_number, TRANSFER_OWN_IN if own else TRANSFER_IN, cents)
+        return True
+
+    def prepare(self, txid, number, delta, min_cents=0):
+        # Vote on one side of a cross-shard transfer: delta < 0 debits. A yes
+        # vote is the account's owner, so the coordinator can tell transfers
+        # between one user's accounts; a no vote is False.
+        if number not in self.balances or txid in self.prepared or not _valid(abs(delta)):
+            return False
+        if delta < 0:
+            if self._available(number) + delta < min_cents:
+                return False
+            self.held[number] = self.held.get(number, 0) - delta
+        self.prepared[txid] = (number, delta)
+        return self.owners[number]
+
+    def commit(self, txid, own=False):
+        number, delta = self.prepared.pop(txid)
+        if delta < 0:
+            self._release(number, -delta)
+            self._log(number, TRANSFER_OWN_OUT if own else TRANSFER_OUT, -delta)
+        else:
+            self._log(number, TRANSFER_OWN_IN if own else TRANSFER_IN, delta)
+        self.balances[number] += delta
+        return True
+
+    def abort(self, txid):
+        entry = self.prepared.pop(txid, None)
+        if entry is not None and entry[1] < 0:
+            self._release(entry[0], -entry[1])
+        return True
+
+    def _release(self, number, cents):
+        left = self.held[number] - cents
+        if left:
+            self.held[number] = left
+        else:
+            del self.held[number]
+
+    def total(self):
+        return sum(self.balances.values())
+
+    def rows(self):
+        return len(self.ledger)
+
+
+def _worker(conn):
+    shard = _Shard()
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        # A message is a list of (method, *args) calls, answered in order; an
+        # error is sent back in place of its result
+        replies = []
+        for method, *args in message:
+            try:
+                replies.append(getattr(shard, method)(*args))
+            except Exception as e:
+                replies.append(e)
+        conn.send(replies)
+    conn.close()
+
+
+def _raise_errors(replies):
+    for reply in replies:
+        if isinstance(reply, Exception):
+            raise reply
+    return replies
+
+
+class ShardedEngine:
+    # The caller's side: routes calls to the owning shard and coordinates
+    # two-phase transfers. Safe to share between threads; each shard's pipe
+    # carries one request/reply at a time.
+    def __init__(self, shards=None):
+        self.shards = shards or os.cpu_count() or 1
+        self._conns = []
+        self._locks = []
+        self._procs = []
+        self._txids = iter(range(1, 1 << 62))
+        self._txid_lock = threading.Lock()
+        for _ in range(self.shards):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_worker, args=(child,), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._locks.append(threading.Lock())
+            self._procs.append(proc)
+
+    def shard_for(self, account_number):
+        return shard_for(account_number, self.shards)
+
+    def _call(self, shard, calls):
+        with self._locks[shard]:
+            self._conns[shard].send(calls)
+            return _raise_errors(self._conns[shard].recv())
+
+    def _call_all(self, calls_by_shard):
+        # Send to every shard first, then collect, so the shards work in parallel
+        shards = sorted(calls_by_shard)
+        for shard in shards:
+            self._locks[shard].acquire()
+        try:
+            for shard in shards:
+                self._conns[shard].send(calls_by_shard[shard])
+            replies = {shard: self._conns[shard].recv() for shard in shards}
+        finally:
+            for shard in reversed(shards):
+                self._locks[shard].release()
+        return {shard: _raise_errors(reply) for shard, reply in replies.items()}
+
+    def _txid(self):
+        with self._txid_lock:
+            return next(self._txids)
+
+    def open_account(self, account_number, user, balance=0):
+        return self._call(self.shard_for(account_number),
+                          [("open", account_number, user, Money.from_dollars(balance).cents)])[0]
+
+    def balance(self, account_number):
+        cents = self._call(self.shard_for(account_number), [("balance", account_number)])[0]
+        return None if cents is None else Money(cents)
+
+    def deposit(self, account_number, amount):
+        return self._call(self.shard_for(account_number),
+                          [("deposit", account_number, Money.from_dollars(amount).cents)])[0]
+
+    def withdraw(self, account_number, amount, min_balance=ZERO):
+        return self._call(self.shard_for(account_number),
+                          [("withdraw", account_number, Money.from_dollars(amount).cents, min_balance.cents)])[0]
+
+    def transfer(self, from_number, to_number, amount, min_balance=MIN_BALANCE):
+        return self.run_batch([("transfer", from_number, to_number, Money.from_dollars(amount).cents,
+                                min_balance.cents)])[0]
+
+    def run_batch(self, ops):
+        # Apply many operations with one round trip per shard per phase:
+        #   ("open", number, user, cents), ("deposit", number, cents),
+        #   ("withdraw", number, cents[, min_cents]), ("transfer", from, to, cents[, min_cents])
+        # Returns one bool per op. Each shard applies its part in list order;
+        # cross-shard transfers are prepared in that order (holding the debit)
+        # and committed or aborted together in a second round.
+        results = [False] * len(ops)
+        calls = {}  # Dict: shard -> list of calls
+        slots = {}  # Dict: shard -> op index per call
+        pending = []  # (op index, txid, debit shard, credit shard)
+        for i, op in enumerate(ops):
+            if op[0] == "transfer":
+                from_number, to_number, cents = op[1:4]
+                min_cents = op[4] if len(op) > 4 else MIN_BALANCE.cents
+                a, b = self.shard_for(from_number), self.shard_for(to_number)
+                if a == b:
+                    calls.setdefault(a, []).append(("transfer", from_number, to_number, cents, min_cents))
+                    slots.setdefault(a, []).append(i)
+                elif from_number != to_number and _valid(cents):
+                    txid = self._txid()
+                    calls.setdefault(a, []).append(("prepare", txid, from_number, -cents, min_cents))
+                    slots.setdefault(a, []).append(None)
+                    calls.setdefault(b, []).append(("prepare", txid, to_number, cents))
+                    slots.setdefault(b, []).append(None)
+                    pending.append((i, txid, a, b))
+            else:
+                shard = self.shard_for(op[1])
+                calls.setdefault(shard, []).append(op)
+                slots.setdefault(shard, []).append(i)
+        try:
+            replies = self._call_all(calls) if calls else {}
+        except BaseException:
+            # A shard failed a call: release whatever the prepares did hold
+            # (abort of a txid a shard never prepared does nothing)
+            if pending:
+                aborts = {}
+                for _, txid, a, b in pending:
+                    for shard in (a, b):
+                        aborts.setdefault(shard, []).append(("abort", txid))
+                self._call_all(aborts)
+            raise
+        votes = {}  # Dict: (shard, txid) -> vote
+        for shard, reply in replies.items():
+            for call, index, result in zip(calls[shard], slots[shard], reply):
+                if index is not None:
+                    results[index] = result
+                else:
+                    votes[(shard, call[1])] = result
+        if pending:
+            decisions = {}
+            for i, txid, a, b in pending:
+                debit, credit = votes[(a, txid)], votes[(b, txid)]
+                ok = bool(debit and credit)
+                results[i] = ok
+                for shard in (a, b):
+                    decisions.setdefault(shard, []).append(("commit", txid, debit == credit) if ok
+                                                           else ("abort", txid))
+            self._call_all(decisions)
+        return results
+
+    def total(self):
+        # Sum of all balances across shards
+        replies = self._call_all({shard: [("total",)] for shard in range(self.shards)})
+        return Money(sum(reply[0] for reply in replies.values()))
+
+    def close(self):
+        for conn in self._conns:
+            conn.send(None)
+            conn.close()
+        for proc in self._procs:
+            proc.join()
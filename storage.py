@@ -0,0 +1,428 @@
+from contextlib import nullcontext
+import json
+import os
+import threading
+import time
+
+from bank.account import Account, User
+from bank.journal import Journal, read_segment, segment_files
+from bank.money import Money
+from bank.pins import hash_pin, is_hash
+
+SNAPSHOT = "snapshot.json"
+LEDGER_DIR = "ledger"  # Sealed ledger segments (bank.segments), under the data directory
+LEDGER_TAIL = "tail.log"  # Ledger rows after the last full segment, one JSON list per line, under LEDGER_DIR
+SCAN_ROWS = 1 << 16
+
+
+def _pin_hash(value):
+    # Data written before PINs were hashed holds the PIN itself
+    return value if is_hash(value) else hash_pin(value)
+
+
+def _scrub(entry):
+    # Older PIN history entries carried the old and new PINs
+    return {key: value for key, value in entry.items() if key not in ("old_pin", "new_pin")}
+
+
+def _read_snapshot(directory):
+    path = os.path.join(directory, SNAPSHOT)
+    if not os.path.exists(path):
+        return {"lsn": 0, "users": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _read_tail(directory):
+    # [offset, account, user, ts, type, cents] rows of the ledger tail file,
+    # in offset order; a line torn by a crash in the middle of an append ends it
+    rows = []
+    try:
+        with open(os.path.join(directory, LEDGER_DIR, LEDGER_TAIL)) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                rows.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def _read_state(directory):
+    # (snapshot, balances, ledger rows not in full segments by offset) as
+    # of one checkpoint, or None if a checkpoint ran in between
+    snapshot = _read_snapshot(directory)
+    balances = {number: cents for accounts in snapshot["users"].values()
+                for number, _, cents, *_ in accounts}
+    rows = snapshot.get("ledger_rows", len(snapshot.get("ledger", ())))
+    # Ledger offset -> row: from the tail file up to the snapshot's row
+    # count, from the journal after it
+    tail = {offset: row for offset, *row in _read_tail(directory) if offset < rows}
+    segments = segment_files(directory)
+    if segments and segments[0][0] > snapshot["lsn"] + 1:
+        return None  # The segments after this snapshot's lsn are gone already
+    try:
+        for _, segment in segments:
+            for lsn, record in read_segment(segment):
+                if lsn <= snapshot["lsn"]:
+                    continue
+                if record["t"] == "tx":
+                    balances.update(record["bal"])
+                    for offset, *row in record.get("ledger", ()):
+                        if offset >= rows:
+                            tail[offset] = row
+                elif record["t"] == "account":
+                    balances.setdefault(record["acc"], record["bal"])
+    except FileNotFoundError:
+        return None  # Removed by a checkpoint while we read
+    if _read_snapshot(directory)["lsn"] != snapshot["lsn"]:
+        return None
+    return snapshot, balances, tail
+
+
+def scan_directory(directory, chunk_rows=SCAN_ROWS, attempts=5):
+    # Read a data directory without loading it: (balances, chunks), where
+    # balances maps account numbers to cents and chunks yields the ledger
+    # as dicts of NumPy columns ("ts", "cents", and "type" as this
+    # process's type codes) of up to chunk_rows rows, in no particular
+    # order. The rows come from the sealed segments, then from the tail
+    # file up to the snapshot's row count and from the journal records
+    # after the snapshot; only the rows past the last full segment are held
+    # in memory. Nothing is
+    # written, so it can run next to a live process. A checkpoint that
+    # replaces the snapshot and removes journal segments while they are
+    # being read makes the snapshot and the journal disagree; the read is
+    # then started over, up to `attempts` times, and ValueError raised if
+    # it never gets a consistent view.
+    import numpy as np
+    from bank.segments import Segment, segment_files as ledger_segment_files
+    from bank.txtypes import for_label
+
+    for _ in range(attempts):
+        state = _read_state(directory)
+        if state is not None:
+            break
+    else:
+        raise ValueError(f"Checkpoints kept changing {directory} during the scan.")
+    snapshot, balances, tail = state
+    rows = snapshot.get("ledger_rows", len(snapshot.get("ledger", ())))
+    stop = max([rows, *(offset + 1 for offset in tail)])  # Rows a segment sealed since then may add
+
+    def columns(part):
+        # (account, user, ts, label, cents) rows as columns
+        return {"ts": np.array([row[2] for row in part], dtype=np.int64),
+                "cents": np.array([row[4] for row in part], dtype=np.int64),
+                "type": np.array([for_label(row[3]).code for row in part], dtype=np.int8)}
+
+    def chunks():
+        old = snapshot.get("ledger", ())  # Snapshots from before ledger segments
+        for start in range(0, len(old), chunk_rows):
+            yield columns(old[start:start + chunk_rows])
+        sealed = 0  # End of the segments read
+        ledger_dir = os.path.join(directory, LEDGER_DIR)
+        for first, path in ledger_segment_files(ledger_dir) if os.path.isdir(ledger_dir) else ():
+            if first >= rows:
+                continue  # Left by a checkpoint that did not finish, or sealed after the scan began
+            segment = Segment(path)
+            codes = np.array([for_label(label).code for label in segment.footer["types"]], dtype=np.int8)
+            kept = segment.records
+            if first + segment.rows > stop:
+                kept = kept[kept["offset"] < stop]
+            for start in range(0, len(kept), chunk_rows):
+                records = kept[start:start + chunk_rows]
+                yield {"ts": records["ts"].copy(), "cents": records["cents"].copy(),
+                       "type": codes[records["type"]]}
+            records = kept = None
+            segment.close()
+            sealed = first + segment.rows
+        offsets = [offset for offset in sorted(tail) if offset >= sealed]
+        for start in range(0, len(offsets), chunk_rows):
+            yield columns([tail[offset] for offset in offsets[start:start + chunk_rows]])
+
+    return balances, chunks()
+
+
+class Storage:
+    # Durable home for the in-memory state in main.py: every mutation is
+    # journalled, and checkpoints write a snapshot and drop old journal
+    # segments. Records carry absolute values (balances, ledger offsets,
+    # history indexes), so replaying one that the snapshot already covers
+    # changes nothing.
+    #
+    # The snapshot holds accounts, the PIN audit history, withdrawal limits
+    # and the ledger's row count, not the ledger rows: a checkpoint seals
+    # every full segment's worth of rows into ledger/seg-*.bin and appends
+    # the rows after the last one to ledger/tail.log (rewritten only when
+    # a segment is sealed), so its cost follows the rows written since, not
+    # the length of the history, and the segments are all full size.
+    # Recovery leaves the sealed rows on disk: the ledger reads them through
+    # a SegmentReader (Ledger.attach) and only the tail is loaded to memory.
+    # Checkpoints run one at a time on a background thread, woken every
+    # `snapshot_every` journal records; the writer that crosses the mark
+    # does not wait for it.
+    def __init__(self, directory, users, registry, ledger, update_history, withdrawal_limits,
+                 sync="always", batch_size=64, snapshot_every=10000, engine=None, segment_rows=None):
+        self.directory = directory
+        self.engine = engine  # TransactionEngine whose account locks a checkpoint holds while it reads state
+        self.users = users
+        self.registry = registry
+        self.ledger = ledger
+        self.update_history = update_history
+        self.withdrawal_limits = withdrawal_limits
+        self.sync = sync
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+        self.segment_rows = segment_rows  # Rows per sealed ledger segment; None for bank.segments.SEGMENT_ROWS
+        self.journal = None
+        self._checkpoint_lsn = 0
+        self._ledger_writer = None  # SegmentWriter for ledger/, opened by recover()
+        self._tail = None  # (first, stop): ledger rows in ledger/tail.log; None until it is rewritten
+        self._checkpoint_lock = threading.Lock()  # One checkpoint at a time
+        self._wake = threading.Event()  # Set when a checkpoint is due, or to stop the thread
+        self._closing = False
+        self._checkpointer = None  # Background checkpoint thread
+
+    def recover(self, read_only=False):
+        # Rebuild state from the snapshot plus journal replay and open the
+        # journal for new records. Returns False if there was nothing on disk,
+        # in which case the current (seed) state is checkpointed as-is.
+        # read_only=True stops after loading and leaves the directory untouched.
+        if read_only and not os.path.isdir(self.directory):
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        found = False
+        lsn = 0
+        path = os.path.join(self.directory, SNAPSHOT)
+        if os.path.exists(path):
+            with open(path) as f:
+                snapshot = json.load(f)
+            self._load_snapshot(snapshot)
+            self._load_ledger(snapshot.get("ledger_rows", 0), read_only)
+            lsn = snapshot["lsn"]
+            found = True
+        self._checkpoint_lsn = lsn
+        pending_ledger = {}
+        for _, segment in segment_files(self.directory):
+            for record_lsn, record in read_segment(segment):
+                if record_lsn <= self._checkpoint_lsn:
+                    continue
+                self._apply(record, pending_ledger)
+                lsn = max(lsn, record_lsn)
+                found = True
+        # Concurrent writers may have journalled ledger rows out of offset
+        # order, but every offset from the snapshot's row count on must be there
+        for offset in sorted(pending_ledger):
+            if offset != len(self.ledger):
+                raise ValueError(f"journal in {self.directory} is missing ledger rows "
+                                 f"{len(self.ledger)} to {offset - 1}")
+            self.ledger.append_micros(*pending_ledger[offset])
+        if read_only:
+            return found
+        self.journal = Journal(self.directory, sync=self.sync, batch_size=self.batch_size,
+                               next_lsn=lsn + 1)
+        from bank.segments import SEGMENT_ROWS, SegmentWriter
+        self._ledger_writer = SegmentWriter(os.path.join(self.directory, LEDGER_DIR),
+                                            self.segment_rows or SEGMENT_ROWS)
+        if not found:
+            self.checkpoint()
+        self._checkpointer = threading.Thread(target=self._run_checkpoints, name="bank-checkpoint",
+                                              daemon=True)
+        self._checkpointer.start()
+        return found
+
+    def _load_ledger(self, rows, read_only):
+        # Ledger rows [0, rows): the sealed segments are attached to the
+        # ledger as its archive, the rows after them come from the tail file.
+        # Segments from a checkpoint that never got to write its snapshot
+        # start at or after `rows`; their rows are still in the journal.
+        directory = os.path.join(self.directory, LEDGER_DIR)
+        if not rows and not os.path.isdir(directory):
+            return
+        from bank.segments import SegmentReader, segment_files as ledger_segment_files
+        if os.path.isdir(directory):
+            for first, path in ledger_segment_files(directory):
+                if first >= rows and not read_only:
+                    os.remove(path)
+            archive = SegmentReader(directory, stop=rows)
+            sealed = 0
+            for segment in archive.segments:
+                first = segment.footer["first_offset"]
+                if first != sealed:
+                    archive.close()
+                    raise ValueError(f"{segment.path} starts at ledger row {first}, expected {sealed}")
+                sealed += segment.rows
+            if archive.segments:
+                self.ledger.attach(archive)
+            for offset, *row in _read_tail(self.directory):
+                if len(self.ledger) <= offset < rows:
+                    if offset != len(self.ledger):
+                        break
+                    self.ledger.append_micros(*row)
+        if len(self.ledger) < rows:
+            raise ValueError(f"{directory} holds {len(self.ledger)} ledger rows, the snapshot expects {rows}")
+
+    def _load_snapshot(self, snapshot):
+        self.users.clear()
+        self.registry.clear()
+        for username, accounts in snapshot["users"].items():
+            user = self.users[username] = User(username)
+            self.registry.add_user(user)
+            for number, pin, cents, locked, failed, frozen, *times in accounts:
+                account = Account(number, balance=Money(cents), pin_hash=_pin_hash(pin))
+                self._set_status(account, locked, failed, frozen, *times)
+                user.add_account(account)
+        # Snapshots from before ledger segments carry the rows themselves
+        for row in snapshot.get("ledger", ()):
+            self.ledger.append_micros(*row)
+        self.update_history.clear()
+        self.update_history.extend(_scrub(entry) for entry in snapshot["update_history"])
+        # Snapshots from before the limit tracker have no usable withdrawal state
+        self.withdrawal_limits.load_state(snapshot.get("withdrawal_limits", {}))
+
+    def _apply(self, record, pending_ledger):
+        kind = record["t"]
+        if kind == "tx":
+            for number, cents in record["bal"].items():
+                self.registry.get_account(number).balance = Money(cents)
+            for offset, *row in record.get("ledger", ()):
+                if offset >= len(self.ledger):
+                    pending_ledger[offset] = row
+            if "wd" in record:
+                number, state = record["wd"]
+                self.withdrawal_limits.load_account_state(number, state)
+        elif kind == "account":
+            if record["acc"] not in self.registry:
+                user = self.users.get(record["user"])
+                if user is None:
+                    user = self.users[record["user"]] = User(record["user"])
+                    self.registry.add_user(user)
+                user.add_account(Account(record["acc"], balance=Money(record["bal"]),
+                                         pin_hash=_pin_hash(record["pin"])))
+        elif kind == "pin":
+            self.registry.get_account(record["acc"]).pin_hash = _pin_hash(record["pin"])
+            if record["idx"] >= len(self.update_history):
+                self.update_history.append(_scrub(record["hist"]))
+        elif kind == "status":
+            self._set_status(self.registry.get_account(record["acc"]), record["locked"],
+                             record["failed"], record["frozen"], record.get("locked_at"),
+                             record.get("failed_at"))
+
+    def _set_status(self, account, locked, failed, frozen, locked_at=None, failed_at=None):
+        account.locked = locked
+        account.failed_attempts = failed
+        account.frozen = frozen
+        # A lock from before locks expired starts its lockout now
+        account.locked_at = locked_at if locked_at is not None or not locked else time.time()
+        account.failed_at = failed_at
+
+    def _commit(self, record):
+        lsn = self.journal.commit(record)
+        if lsn - self._checkpoint_lsn >= self.snapshot_every:
+            self._wake.set()
+
+    def _run_checkpoints(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closing:
+                return
+            self.checkpoint()
+
+    def record_transaction(self, accounts, offsets=(), withdrawal=None, balances=None):
+        # Balances of the touched accounts (their current ones, or `balances`
+        # in cents, in the same order), the ledger rows written and, for
+        # withdrawals, the account's limit buckets
+        if balances is None:
+            balances = [account.balance.cents for account in accounts]
+        record = {
+            "t": "tx",
+            "bal": {account.account_number: cents for account, cents in zip(accounts, balances)},
+            "ledger": [[offset, *self.ledger.raw(offset)] for offset in offsets],
+        }
+        if withdrawal is not None:
+            record["wd"] = [withdrawal, self.withdrawal_limits.account_state(withdrawal)]
+        self._commit(record)
+
+    def record_account(self, user, account):
+        self._commit({"t": "account", "user": user.username, "acc": account.account_number,
+                      "pin": account.pin_hash, "bal": account.balance.cents})
+
+    def record_pin(self, account):
+        idx = len(self.update_history) - 1
+        self._commit({"t": "pin", "acc": account.account_number, "pin": account.pin_hash,
+                      "idx": idx, "hist": self.update_history[idx]})
+
+    def record_status(self, account):
+        self._commit({"t": "status", "acc": account.account_number, "locked": account.locked,
+                      "failed": account.failed_attempts,
+                      "frozen": account.frozen,
+                      "locked_at": account.locked_at, "failed_at": account.failed_at})
+
+    def checkpoint(self):
+        with self._checkpoint_lock:
+            # Writers change balances and journal the change under their
+            # account locks, so with every account locked no change is half
+            # applied or applied but not yet journalled. The state is read
+            # then; the files are written after the locks are released.
+            accounts = [acc for user in list(self.users.values()) for acc in list(user.accounts)]
+            with self.engine.locked(*accounts) if self.engine is not None else nullcontext():
+                lsn = self.journal.rotate()
+                # Every row journalled at or before lsn is in the ledger by now
+                ledger_rows = len(self.ledger)
+                snapshot = {
+                    "lsn": lsn,
+                    "users": {
+                        user.username: [
+                            [acc.account_number, acc.pin_hash, acc.balance.cents, acc.locked,
+                             acc.failed_attempts, acc.frozen, acc.locked_at,
+                             acc.failed_at]
+                            for acc in list(user.accounts)
+                        ]
+                        for user in list(self.users.values())
+                    },
+                    "ledger_rows": ledger_rows,
+                    "update_history": list(self.update_history),
+                    "withdrawal_limits": self.withdrawal_limits.state(),
+                }
+            self._ledger_writer.write(self.ledger, flush=False, stop=ledger_rows)
+            self._write_tail(ledger_rows)
+            path = os.path.join(self.directory, SNAPSHOT)
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            # Segments that end at or before the snapshot lsn are no longer needed
+            for start, segment in segment_files(self.directory):
+                if start <= lsn:
+                    os.remove(segment)
+            self._checkpoint_lsn = lsn
+
+    def _write_tail(self, stop):
+        # Make ledger/tail.log hold the rows from the end of the segments to
+        # `stop`: append the rows since the last checkpoint, or rewrite it
+        # once a segment was sealed (or on the first checkpoint of a run)
+        first = self._ledger_writer.written
+        path = os.path.join(self.directory, LEDGER_DIR, LEDGER_TAIL)
+        appending = self._tail is not None and self._tail[0] == first
+        target = path if appending else path + ".tmp"
+        with open(target, "a" if appending else "w") as f:
+            for offset in range(self._tail[1] if appending else first, stop):
+                f.write(json.dumps([offset, *self.ledger.raw(offset)], separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if not appending:
+            os.replace(target, path)
+        self._tail = (first, stop)
+
+    def close(self, checkpoint=True):
+        # checkpoint=False leaves the snapshot as it is, so whatever was
+        # changed in memory without being journalled is not kept
+        self._closing = True
+        self._wake.set()
+        if self._checkpointer is not None:
+            self._checkpointer.join()
+        if checkpoint:
+            self.checkpoint()
+        self.journal.close()
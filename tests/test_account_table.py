@@ -0,0 +1,43 @@
+import pytest
+
+from bank.account import Account, User
+from bank.account_table import LOCKED, AccountTable, load_binary, load_csv
+
+
+def test_numbers_longer_than_the_column_are_refused():
+    user = User("alice")
+    user.add_account(Account("1" * 17, balance=5))
+    with pytest.raises(ValueError):
+        AccountTable.from_users({"alice": user})
+
+
+def test_boolean_columns_are_parsed_not_cast(tmp_path):
+    path = tmp_path / "accounts.csv"
+    path.write_text("account_number,user,balance,locked,frozen\n"
+                    "1001,alice,5.00,False,yes\n"
+                    "1002,alice,6.00,TRUE,0\n"
+                    "1003,bob,7.00,,no\n")
+    table = load_csv(str(path))
+    assert [table.locked(table.find(n)) for n in ("1001", "1002", "1003")] == [False, True, False]
+    assert [table.frozen(table.find(n)) for n in ("1001", "1002", "1003")] == [True, False, False]
+    path.write_text("account_number,user,balance,locked\n1001,alice,5.00,maybe\n")
+    with pytest.raises(ValueError):
+        load_csv(str(path))
+
+
+def test_lockout_time_is_kept(tmp_path):
+    user = User("alice")
+    acc = Account("1001", balance=5)
+    acc.locked, acc.locked_at = True, 1_700_000_000.0
+    user.add_account(acc)
+    user.add_account(Account("1002", balance=6))
+    table = AccountTable.from_users({"alice": user})
+    assert table.account(table.find("1001")).locked_at == 1_700_000_000.0
+    assert table.account(table.find("1002")).locked_at is None
+
+    path = str(tmp_path / "accounts.bin")
+    table.save(path)
+    loaded = load_binary(path)
+    assert loaded.account(loaded.find("1001")).locked_at == 1_700_000_000.0
+    loaded.set_flag(loaded.find("1001"), LOCKED, False)
+    assert loaded.account(loaded.find("1001")).locked_at is None
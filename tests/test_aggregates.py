@@ -0,0 +1,63 @@
+import threading
+
+from bank.account import Account, User
+from bank.aggregates import Aggregates
+from bank.audit import AuditLog
+from bank.authentication import Authenticator
+from bank.engine import TransactionEngine
+from bank.ledger import Ledger
+from bank.limits import LimitTracker
+from bank.registry import build_registry
+from bank.service import BankService
+from bank.txtypes import DEPOSIT
+
+TS = 1_700_000_000_000_000
+
+
+def test_check_sums_large_amounts_exactly():
+    # Float weights would round these totals; the check must not report them
+    ledger, aggregates = Ledger(), Aggregates()
+    account = Account("1001", balance=0)
+    aggregates.add_account(0)
+    for cents in (2 ** 53 + 1, 2 ** 53 + 3, 5):
+        ledger.append_micros("1001", "alice", TS, DEPOSIT, cents)
+        aggregates.record([("1001", DEPOSIT, cents)], TS)
+    assert aggregates.check(ledger, [account], TransactionEngine()) == []
+    assert aggregates.account_totals("1001")["deposits"] == 2 ** 54 + 9
+
+
+def test_check_reports_a_missed_row():
+    ledger, aggregates = Ledger(), Aggregates()
+    ledger.append_micros("1001", "alice", TS, DEPOSIT, 500)
+    problems = aggregates.check(ledger, [], TransactionEngine())
+    assert any("Transaction count" in problem for problem in problems)
+
+
+def test_check_during_writes_sees_a_consistent_view():
+    alice = User("alice")
+    for i in range(4):
+        alice.add_account(Account(str(1001 + i), balance=100))
+    users = {"alice": alice}
+    registry = build_registry(users)
+    aggregates, ledger = Aggregates(), Ledger()
+    aggregates.rebuild(ledger, (acc for _, acc in registry))
+    service = BankService(users, registry, Authenticator(users, registry), TransactionEngine(), ledger,
+                          AuditLog(), LimitTracker([]), aggregates=aggregates)
+    stop = threading.Event()
+
+    def write():
+        n = 0
+        while not stop.is_set():
+            service.deposit(alice, str(1001 + n % 4), "0.25")
+            service.transfer(alice, str(1001 + n % 4), str(1001 + (n + 1) % 4), "0.10")
+            n += 1
+    writers = [threading.Thread(target=write) for _ in range(3)]
+    for t in writers:
+        t.start()
+    try:
+        results = [service.check_aggregates() for _ in range(20)]
+    finally:
+        stop.set()
+        for t in writers:
+            t.join()
+    assert results == [[]] * 20 and len(ledger) > 0
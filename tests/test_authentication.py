@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from bank.account import Account, User
+from bank.authentication import MAX_ATTEMPTS, Authenticator, RateLimiter
+from bank.engine import TransactionEngine
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def users():
+    alice = User("alice")
+    alice.add_account(Account("1001", "1234", balance=10))
+    alice.add_account(Account("1002", "1234", balance=10))
+    return {"alice": alice}
+
+
+def test_lockout_lifts_after_lockout_seconds(users):
+    auth = Authenticator(users, lockout_seconds=60, account_limiter=None, source_limiter=None)
+    for i in range(MAX_ATTEMPTS):
+        user, msg = auth.login("1001", "0000", now=T0 + i)
+    assert msg == f"Account locked after {MAX_ATTEMPTS} failed attempts."
+    assert (auth.failed_logins, auth.lockouts) == (MAX_ATTEMPTS, 1)
+    # Locked at T0 + 2: even the right PIN is refused for 60 seconds
+    assert auth.login("1001", "1234", now=T0 + 61) == (None, "Account is locked due to too many failed attempts.")
+    assert auth.login("1001", "1234", now=T0 + 62) == (users["alice"], None)
+    account = users["alice"].accounts[0]
+    assert not account.locked and account.locked_at is None and account.failed_attempts == 0
+
+
+def test_failures_older_than_the_window_are_forgotten(users):
+    auth = Authenticator(users, failure_window=60, account_limiter=None, source_limiter=None)
+    auth.login("1001", "0000", now=T0)
+    auth.login("1001", "0000", now=T0 + 1)
+    assert auth.login("1001", "0000", now=T0 + 61) == (None, f"Incorrect pincode. Attempt 1/{MAX_ATTEMPTS}.")
+    assert not users["alice"].accounts[0].locked
+
+
+def test_account_rate_limit(users):
+    auth = Authenticator(users, account_limiter=RateLimiter(2, 0.5), source_limiter=None)
+    assert auth.login("1001", "1234", now=T0)[0]
+    assert auth.login("1001", "1234", now=T0)[0]
+    assert auth.login("1001", "1234", now=T0) == (None, "Too many login attempts. Try again in 2 seconds.")
+    assert auth.login("1002", "1234", now=T0)[0]  # Each account has its own bucket
+    assert auth.login("1001", "1234", now=T0 + 2)[0]  # Refilled
+    assert auth.rate_limited == 1
+
+
+def test_source_rate_limit_spans_accounts(users):
+    auth = Authenticator(users, account_limiter=None, source_limiter=RateLimiter(3, 1))
+    for number in ("1001", "1002", "1001"):
+        assert auth.login(number, "1234", source="10.0.0.1", now=T0)[0]
+    assert auth.login("1002", "1234", source="10.0.0.1", now=T0)[0] is None
+    assert auth.login("1002", "1234", source="10.0.0.2", now=T0)[0]
+    assert auth.throttle("10.0.0.1", now=T0) == "Too many login attempts. Try again in 1 seconds."
+    assert auth.source_limiter.retry_after("10.0.0.1", now=T0 + 0.5) == 0.5
+    assert auth.rate_limited == 2
+
+
+def test_concurrent_wrong_pins_lock_the_account_once(users):
+    auth = Authenticator(users, account_limiter=None, source_limiter=None, cache=None,
+                         engine=TransactionEngine())
+    start = threading.Barrier(8)
+
+    def guess():
+        start.wait()
+        auth.login("1001", "0000", now=T0)
+    threads = [threading.Thread(target=guess) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    account = users["alice"].accounts[0]
+    # Guesses that finish after the lockout are refused without counting
+    assert account.locked and account.failed_attempts == MAX_ATTEMPTS
+    assert (auth.failed_logins, auth.lockouts) == (MAX_ATTEMPTS, 1)
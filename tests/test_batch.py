@@ -0,0 +1,69 @@
+import pytest
+
+from bank.account import Account, User
+from bank.audit import AuditLog
+from bank.authentication import Authenticator
+from bank.batch import apply_transfers, read_transfers
+from bank.engine import TransactionEngine
+from bank.ledger import Ledger
+from bank.limits import LimitTracker
+from bank.registry import build_registry
+from bank.service import BankService
+from bank.txtypes import TRANSFER_IN, TRANSFER_OUT
+
+
+@pytest.fixture
+def service():
+    alice, bob = User("alice"), User("bob")
+    alice.add_account(Account("1001", balance=5))
+    alice.add_account(Account("1002", balance=1))
+    bob.add_account(Account("2001", balance=1))
+    users = {"alice": alice, "bob": bob}
+    registry = build_registry(users)
+    return BankService(users, registry, Authenticator(users, registry), TransactionEngine(), Ledger(), AuditLog(),
+                       LimitTracker([]))
+
+
+def balances(service):
+    return {acc.account_number: acc.balance.cents for _, acc in service.registry}
+
+
+def test_atomic_batch_applies_nothing_when_a_row_fails(service):
+    # Together the two transfers would take 1001 below its minimum balance
+    result = apply_transfers(["1001", "1001", "1002"], ["2001", "2001", "2001"], [300, 250, 50],
+                             service=service)
+    assert result.applied_count == 0
+    assert result.reasons.tolist() == [6, 6, 7]
+    assert balances(service) == {"1001": 500, "1002": 100, "2001": 100}
+    assert len(service.ledger) == 0
+
+    result = apply_transfers(["1001", "9999"], ["2001", "2001"], [300, 5], service=service)
+    assert result.reasons.tolist() == [7, 1]
+    assert len(service.ledger) == 0
+
+    result = apply_transfers(["1001", "1002"], ["2001", "2001"], [300, 50], service=service)
+    assert result.applied.all()
+    assert balances(service) == {"1001": 200, "1002": 50, "2001": 450}
+    assert len(service.ledger) == 4
+
+
+def test_per_row_batch_skips_the_rows_that_fail(service):
+    result = apply_transfers(["1001", "1001", "2001", "1001"], ["2001", "2001", "1002", "1001"],
+                             [300, 250, 350, 5], atomic=False, service=service)
+    # The second row is checked against the balance the first one left
+    assert result.applied.tolist() == [True, False, True, False]
+    assert result.reasons.tolist() == [0, 6, 0, 3]
+    assert balances(service) == {"1001": 200, "1002": 450, "2001": 50}
+    assert [(tx["account_number"], tx["type"], tx["amount"].cents) for tx in service.ledger] == [
+        ("1001", TRANSFER_OUT.label, 300), ("2001", TRANSFER_IN.label, 300),
+        ("2001", TRANSFER_OUT.label, 350), ("1002", TRANSFER_IN.label, 350)]
+    assert [row[:3] for row in result.rejected()] == [(1, None, 6), (3, None, 3)]
+
+
+def test_unreadable_rows_are_rejected_with_their_line(service, tmp_path):
+    path = tmp_path / "transfers.csv"
+    path.write_text("from,to,amount\n1001,2001,1.00\n1001,2001,0.001\n1001\n1002,2001,0.07\n")
+    result = apply_transfers(*read_transfers(str(path)), atomic=False, service=service)
+    assert result.applied.tolist() == [True, False, False, False]
+    assert [row[1:3] for row in result.rejected()] == [(3, 9), (4, 8), (5, 5)]
+    assert balances(service)["2001"] == 200
@@ -0,0 +1,59 @@
+import pytest
+
+from bank import bulk
+from bank.account import Account, User
+from bank.audit import AuditLog
+from bank.ledger import Ledger
+from bank.registry import build_registry
+from bank.txtypes import DEPOSIT, WITHDRAWAL
+
+
+@pytest.fixture
+def state():
+    alice, bob = User("alice"), User("bob")
+    alice.add_account(Account("1001", balance=500))
+    bob.add_account(Account("2001", balance=800))
+    bob.accounts[0].frozen = True
+    users = {"alice": alice, "bob": bob}
+    ledger = Ledger()
+    ledger.extend_micros([("1001", "alice", 1_700_000_000_000_000, DEPOSIT.label, 500),
+                          ("2001", "bob", 1_700_000_001_000_000, WITHDRAWAL.label, 105)])
+    history = AuditLog([{"account_number": "1001", "user": "alice", "datetime": "2024-01-01 10:00:00",
+                         "old_pin": "1234", "new_pin": "4321"}])
+    return users, ledger, history
+
+
+def accounts(users):
+    return {acc.account_number: (user.username, acc.balance.cents, acc.frozen)
+            for user in users.values() for acc in user.accounts}
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_round_trip(tmp_path, state, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    users, ledger, history = state
+    paths = bulk._paths(str(tmp_path), fmt)
+    bulk.export_accounts(paths["accounts"], users)
+    bulk.export_ledger(paths["ledger"], ledger)
+    bulk.export_audit(paths["audit"], history)
+
+    users2, ledger2, history2 = {}, Ledger(), AuditLog()
+    assert bulk.import_accounts(paths["accounts"], users2, build_registry(users2)) == (2, 0)
+    assert bulk.import_ledger(paths["ledger"], ledger2) == 2
+    assert bulk.import_audit(paths["audit"], history2) == 1
+    assert [ledger2.raw(i) for i in range(2)] == [ledger.raw(i) for i in range(2)]
+    assert accounts(users2) == accounts(users)
+    assert list(history2) == [{"account_number": "1001", "user": "alice", "datetime": "2024-01-01 10:00:00"}]
+
+
+def test_import_refuses_non_empty_ledger_and_history(tmp_path, state):
+    _, ledger, history = state
+    paths = bulk._paths(str(tmp_path), "csv")
+    bulk.export_ledger(paths["ledger"], ledger)
+    bulk.export_audit(paths["audit"], history)
+    with pytest.raises(ValueError):
+        bulk.import_ledger(paths["ledger"], ledger)
+    with pytest.raises(ValueError):
+        bulk.import_audit(paths["audit"], history)
+    assert len(ledger) == 2 and len(history) == 1
@@ -0,0 +1,83 @@
+import sys
+import threading
+import time
+
+from bank.account import Account, User
+from bank.audit import AuditLog
+from bank.authentication import Authenticator
+from bank.engine import TransactionEngine
+from bank.ledger import Ledger
+from bank.limits import LimitTracker
+from bank.money import Money
+from bank.registry import build_registry
+from bank.service import BankService
+
+THREADS = 8
+ROUNDS = 2000
+
+
+def run_threads(work):
+    # work(i) in THREADS threads released at once; fails if any is still
+    # running after the timeout, which is what a lock-order deadlock looks
+    # like, or if any raised
+    start = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(i):
+        start.wait()
+        try:
+            work(i)
+        except Exception as e:
+            errors.append(e)
+    workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(THREADS)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often, so lock orders really interleave
+    try:
+        for t in workers:
+            t.start()
+        deadline = time.monotonic() + 30
+        for t in workers:
+            t.join(timeout=max(0, deadline - time.monotonic()))
+    finally:
+        sys.setswitchinterval(interval)
+    assert not any(t.is_alive() for t in workers), "transfers deadlocked"
+    assert not errors
+
+
+def test_opposing_transfers_neither_deadlock_nor_lose_money():
+    engine = TransactionEngine()
+    accounts = [Account(str(1001 + i), balance=100) for i in range(3)]
+
+    def work(i):
+        # Even threads send a -> b -> c -> a, odd threads the other way round
+        step = 1 if i % 2 == 0 else -1
+        for n in range(ROUNDS):
+            a = accounts[n % 3]
+            b = accounts[(n + step) % 3]
+            engine.transfer(a, b, Money(5 * (1 + n % 4)))
+    run_threads(work)
+    assert sum(acc.balance.cents for acc in accounts) == 30000
+
+
+def test_opposing_service_transfers_are_conserved():
+    alice, bob = User("alice"), User("bob")
+    alice.add_account(Account("1001", balance=50))
+    alice.add_account(Account("1002", balance=50))
+    bob.add_account(Account("2001", balance=50))
+    users = {"alice": alice, "bob": bob}
+    registry = build_registry(users)
+    ledger = Ledger()
+    service = BankService(users, registry, Authenticator(users, registry), TransactionEngine(), ledger,
+                          AuditLog(), LimitTracker([]))
+    routes = [(alice, "1001", "2001"), (bob, "2001", "1001"), (alice, "1002", "1001"), (alice, "1001", "1002")]
+    done = [0] * THREADS
+
+    def work(i):
+        user, from_number, to_number = routes[i % len(routes)]
+        for _ in range(ROUNDS // 4):
+            receipt, error = service.transfer(user, from_number, to_number, "0.10")
+            done[i] += receipt is not None
+    run_threads(work)
+    balances = [acc.balance.cents for user in users.values() for acc in user.accounts]
+    assert sum(balances) == 15000 and min(balances) >= 5
+    assert len(ledger) == 2 * sum(done)
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from bank.account import Account, User
+from bank.audit import AuditLog
+from bank.authentication import Authenticator
+from bank.engine import TransactionEngine
+from bank.idempotency import IdempotencyCache, RequestIdReused
+from bank.ledger import Ledger
+from bank.limits import DAY, Limit, LimitTracker
+from bank.money import Money
+from bank.registry import build_registry
+from bank.service import BankService, _cents_key
+
+
+@pytest.fixture
+def service():
+    alice, bob = User("alice"), User("bob")
+    alice.add_account(Account("1001", balance=500))
+    bob.add_account(Account("2001", balance=800))
+    users = {"alice": alice, "bob": bob}
+    registry = build_registry(users)
+    return BankService(users, registry, Authenticator(users, registry), TransactionEngine(), Ledger(), AuditLog(),
+                       LimitTracker([Limit(Money(90), DAY)]), idempotency=IdempotencyCache())
+
+
+def run_together(threads, call):
+    # call() from `threads` threads released at once; their results
+    start = threading.Barrier(threads)
+    results = [None] * threads
+
+    def worker(i):
+        start.wait()
+        results[i] = call()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join(timeout=10)
+    assert not any(t.is_alive() for t in workers), "threads did not finish"
+    return results
+
+
+def test_eviction_and_expiry():
+    cache = IdempotencyCache(max_entries=3, ttl=10)
+    calls = []
+
+    def run(key, now):
+        return cache.run(key, "request", lambda: calls.append(key) or len(calls), now=now)
+
+    for key in "abcd":
+        run(key, now=100)
+    assert len(cache) == 3 and cache.evictions == 1
+    assert run("d", now=101) == 4 and calls == list("abcd")  # Replayed
+    assert run("a", now=101) == 5  # Evicted, so run again; evicts b
+    assert run("c", now=105) == 3  # Still within its ttl
+    assert run("c", now=110) == 6  # Expired, so run again
+    assert len(cache) == 2  # a and c; d expired at 110
+
+
+def test_replays_wait_for_a_running_request():
+    cache = IdempotencyCache()
+    calls = []
+    results = run_together(16, lambda: cache.run("k", "request",
+                                                 lambda: time.sleep(0.05) or calls.append(1) or object()))
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.replays == 15
+
+
+@pytest.mark.parametrize("op", ["deposit", "transfer"])
+def test_concurrent_retries_move_money_once(service, op):
+    alice = service.users["alice"]
+    acc, other = service.own_account(alice, "1001"), service.registry.get_account("2001")
+    if op == "deposit":
+        call = lambda: service.deposit(alice, "1001", "0.25", request_id="retry")  # noqa: E731
+    else:
+        call = lambda: service.transfer(alice, "1001", "2001", "0.10", request_id="retry")  # noqa: E731
+    results = run_together(16, call)
+    receipt, error = results[0]
+    assert error is None
+    assert all(result[0] is receipt for result in results)
+    assert acc.balance == Money.from_dollars(500) + Money(25 if op == "deposit" else -10)
+    assert other.balance == Money.from_dollars(800) + Money(10 if op == "transfer" else 0)
+    assert len(service.ledger) == (1 if op == "deposit" else 2)
+
+
+def test_request_id_reused_for_another_request(service):
+    alice = service.users["alice"]
+    assert service.deposit(alice, "1001", "0.25", request_id="r1")[1] is None
+    receipt, error = service.deposit(alice, "1001", "0.50", request_id="r1")
+    assert receipt is None and error is not None
+    assert len(service.ledger) == 1
+
+
+def test_retry_may_spell_the_amount_differently(service):
+    alice = service.users["alice"]
+    first = service.deposit(alice, "1001", "0.5", request_id="r1")
+    for amount in ("0.50", Money(50), 0.5):
+        assert service.deposit(alice, "1001", amount, request_id="r1") is first
+    assert len(service.ledger) == 1
+
+
+def test_failed_attempt_is_not_cached():
+    cache = IdempotencyCache()
+    with pytest.raises(ZeroDivisionError):
+        cache.run("k", "request", lambda: 1 / 0)
+    assert cache.run("k", "request", lambda: "second") == "second"
+    with pytest.raises(RequestIdReused):
+        cache.run("k", "other request", lambda: None)
+
+
+def test_fingerprint_keeps_amounts_that_do_not_parse():
+    assert _cents_key("5") == _cents_key(Money(500)) == 500
+    for amount in (None, [5], {"dollars": 5}, b"5", "five"):
+        assert _cents_key(amount) == repr(amount)
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from bank.ledger import Ledger
+from bank.txtypes import DEPOSIT
+
+
+def _pages(ledger, account_numbers=None, limit=7):
+    rows, cursor = [], None
+    while True:
+        page, cursor = ledger.query(account_numbers, cursor=cursor, limit=limit)
+        rows.extend((tx["account_number"], tx["amount"].cents) for tx in page)
+        if cursor is None:
+            return rows
+
+
+def test_late_rows_are_queried_in_time_order():
+    rng = random.Random(7)
+    ledger = Ledger()
+    rows = []
+    for i in range(300):
+        # Mostly increasing timestamps with some rows arriving late
+        ts = 1_700_000_000_000_000 + i * 1000 - (rng.randrange(50_000) if rng.random() < 0.2 else 0)
+        rows.append((str(1000 + rng.randrange(5)), "alice", ts, DEPOSIT, i))
+    for row in rows[:150]:
+        ledger.append_micros(*row)
+    ledger.extend_micros(rows[150:])
+
+    by_time = sorted(range(len(rows)), key=lambda i: (rows[i][2], i))
+    assert _pages(ledger) == [(rows[i][0], rows[i][4]) for i in by_time]
+    assert _pages(ledger, ["1001", "1003"]) == [(rows[i][0], rows[i][4]) for i in by_time
+                                                 if rows[i][0] in ("1001", "1003")]
+
+
+def test_limit_must_be_positive():
+    ledger = Ledger()
+    ledger.append_micros("1001", "alice", 1_700_000_000_000_000, DEPOSIT, 5)
+    for limit in (0, -1, None):
+        with pytest.raises(ValueError):
+            ledger.query(limit=limit)
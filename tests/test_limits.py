@@ -0,0 +1,41 @@
+import datetime
+
+from bank.limits import DAY, HOUR, ROLLING_24H, Limit, LimitTracker
+from bank.money import Money
+
+NOW = datetime.datetime(2026, 3, 4, 12, 30)
+
+
+def used(tracker, number="1001"):
+    return {limit.name: money.cents for limit, money in tracker.usage(number, NOW)}
+
+
+def test_saved_usage_is_matched_to_the_current_windows():
+    tracker = LimitTracker([Limit(Money(90), DAY), Limit(Money(50), HOUR)])
+    tracker.record("1001", Money(40), NOW)
+    state = tracker.state()
+
+    reordered = LimitTracker([Limit(Money(50), HOUR), Limit(Money(90), DAY)])
+    reordered.load_state(state)
+    assert used(reordered) == {"hourly": 40, "daily": 40}
+
+    # A window that was not tracked when the state was saved starts empty
+    changed = LimitTracker([Limit(Money(90), DAY), Limit(Money(100), ROLLING_24H)])
+    changed.load_state(state)
+    assert used(changed) == {"daily": 40, "rolling 24-hour": 0}
+    changed.record("1001", Money(10), NOW)
+    assert used(changed) == {"daily": 50, "rolling 24-hour": 10}
+
+    # Nothing left that fits: the account is not kept at all
+    other = LimitTracker([Limit(Money(100), ROLLING_24H)])
+    other.load_state(state)
+    assert len(other) == 0
+
+
+def test_rings_saved_without_bucket_lengths_still_load():
+    tracker = LimitTracker([Limit(Money(90), DAY), Limit(Money(50), HOUR)])
+    tracker.record("1001", Money(40), NOW)
+    old = {number: [ring[1:] for ring in rings] for number, rings in tracker.state().items()}
+    loaded = LimitTracker([Limit(Money(90), DAY), Limit(Money(50), HOUR)])
+    loaded.load_state(old)
+    assert used(loaded) == {"daily": 40, "hourly": 40}
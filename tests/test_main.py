@@ -0,0 +1,12 @@
+from bank import main as bank
+
+
+def test_running_totals_are_seeded_at_import():
+    # Without init() or open_storage(), the admin totals already cover the
+    # built-in accounts
+    summary = bank.service.summary()
+    balances = [acc.balance.cents for _, acc in bank.registry]
+    assert summary["accounts"] == len(balances) > 0
+    assert summary["money_supply"].cents == sum(balances)
+    assert sum(summary["balance_counts"].values()) == len(balances)
+    assert bank.service.check_aggregates() == []
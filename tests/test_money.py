@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+import pytest
+
+from bank.money import Money
+
+
+@pytest.mark.parametrize("text, cents", [
+    ("0.05", 5), ("12", 1200), ("-1.5", -150), ("+2.30", 230), (" 7.25 ", 725), (".5", 50), ("5.", 500),
+    ("0", 0), ("-0.00", 0),
+])
+def test_parse_reads_exact_cents(text, cents):
+    assert Money.parse(text).cents == cents
+
+
+@pytest.mark.parametrize("text", [
+    "1.005", "0.001", "", " ", "-", ".", "+.", "--1", "1.-5", "1e3", "1,000", "1 000", "$5",
+    "١٢",  # Arabic-Indic digits: isdecimal() but not ASCII
+    "nan", "inf",
+])
+def test_parse_rejects_malformed_amounts(text):
+    with pytest.raises(ValueError):
+        Money.parse(text)
+
+
+def test_from_dollars_rounds_to_the_nearest_cent():
+    assert Money.from_dollars(5).cents == 500
+    assert Money.from_dollars(0.1 + 0.2).cents == 30
+    assert Money.from_dollars(19.99).cents == 1999
+    assert Money.from_dollars(1.255).cents == 125  # 1.255 * 100 is 125.49999999999999 in binary
+    assert Money.from_dollars(0.125).cents == 12  # An exact half goes to even
+    # Decimals round half to even
+    assert Money.from_dollars(Decimal("1.005")).cents == 100
+    assert Money.from_dollars(Decimal("1.015")).cents == 102
+    # Strings are parsed exactly, so more than two decimals is an error
+    assert Money.from_dollars("0.10").cents == 10
+    with pytest.raises(ValueError):
+        Money.from_dollars("0.105")
+    amount = Money(7)
+    assert Money.from_dollars(amount) is amount
+
+
+def test_cents_must_be_an_int():
+    for cents in (5.0, "5", Decimal(5)):
+        with pytest.raises(TypeError):
+            Money(cents)
@@ -0,0 +1,38 @@
+import threading
+
+from bank.notification import Notifier
+
+
+class SlowSink:
+    def __init__(self):
+        self.release = threading.Event()
+        self.messages = []
+        self.closed = False
+
+    def write(self, messages):
+        self.release.wait(10)
+        assert not self.closed, "write after close"
+        self.messages.extend(messages)
+
+    def close(self):
+        self.closed = True
+
+
+def test_close_timeout_leaves_the_sinks_to_the_worker():
+    sink = SlowSink()
+    notifier = Notifier([sink], flush_interval=0).start()
+    for i in range(3):
+        notifier.submit(f"message {i}")
+    worker = notifier._thread
+    notifier.close(timeout=0.05)
+    assert worker.is_alive() and not sink.closed
+    sink.release.set()
+    worker.join(10)
+    assert sink.closed and sink.messages == ["message 0", "message 1", "message 2"]
+    assert notifier.failures == 0
+
+
+def test_close_without_a_worker_closes_the_sinks():
+    sink = SlowSink()
+    Notifier([sink]).close()
+    assert sink.closed
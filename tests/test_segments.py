@@ -0,0 +1,55 @@
+import datetime
+import random
+
+import numpy as np
+
+from bank.columnar import from_micros
+from bank.ledger import Ledger
+from bank.segments import SegmentReader, SegmentWriter
+from bank.txtypes import DEPOSIT, TRANSFER_IN, WITHDRAWAL, for_code
+
+T0 = 1_700_000_000_000_000
+
+
+def build_ledger(rows=50):
+    rng = random.Random(5)
+    ledger = Ledger()
+    for i in range(rows):
+        # Some rows arrive late, so a segment's offset and time orders differ
+        ts = T0 + i * 60_000_000 - (rng.randrange(600_000_000) if rng.random() < 0.2 else 0)
+        ledger.append_micros(str(1001 + rng.randrange(4)), rng.choice(["alice", "bob"]), ts,
+                             rng.choice([DEPOSIT, WITHDRAWAL, TRANSFER_IN]), 5 * (1 + rng.randrange(100)))
+    return ledger
+
+
+def test_segments_read_back_what_was_written(tmp_path):
+    ledger = build_ledger()
+    writer = SegmentWriter(str(tmp_path), segment_rows=16)
+    assert len(writer.write(ledger, flush=False)) == 3  # Full segments only
+    assert writer.written == 48
+    assert len(writer.write(ledger)) == 1 and writer.written == 50
+    assert writer.write(ledger) == []  # Nothing new
+    reader = SegmentReader(str(tmp_path))
+    assert len(reader) == 50
+
+    # Every row, in offset order
+    records = np.concatenate(list(reader.rows()))
+    assert records["offset"].tolist() == list(range(50))
+    assert [(reader.accounts[a], reader.users[u], ts, for_code(code).label, cents)
+            for a, u, ts, code, cents in zip(records["account"].tolist(), records["user"].tolist(),
+                                             records["ts"].tolist(), records["type"].tolist(),
+                                             records["cents"].tolist())] == [ledger.raw(i) for i in range(50)]
+    assert reader.entries(records) == list(ledger)
+    assert reader.counts() == ledger.counts()
+
+    # One account over a time range, oldest first
+    start, end = from_micros(T0 + 600_000_000), from_micros(T0 + 2400_000_000)
+    assert reader.entries(reader.account_records("1002", start, end)) == [
+        tx for tx in ledger.for_account("1002")
+        if start <= datetime.datetime.strptime(tx["datetime"], "%Y-%m-%d %H:%M:%S") < end]
+    assert sum(len(part) for part in reader.scan(start, end)) == len(ledger.query(start=start, end=end, limit=100)[0])
+
+    # Pages in (time, offset) order, as the ledger's own
+    page = reader.page(["1001", "1003"], codes={DEPOSIT.code}, limit=5)
+    assert reader.entries(page) == ledger.query(["1001", "1003"], types=[DEPOSIT], limit=5)[0]
+    reader.close()
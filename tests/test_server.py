@@ -0,0 +1,51 @@
+import asyncio
+import json
+import threading
+import time
+
+from bank import main as bank
+from bank.server import serve
+
+
+async def _client(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def call(request):
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        return json.loads(await reader.readline())
+    return call, writer
+
+
+def test_history_waiting_for_the_ledger_does_not_stall_other_sessions():
+    async def scenario():
+        ready = asyncio.get_running_loop().create_future()
+        server = asyncio.create_task(serve(port=0, ready=ready))
+        port = await ready
+        slow, slow_writer = await _client(port)
+        fast, fast_writer = await _client(port)
+        assert (await slow({"op": "login", "account": "1001", "pin": "1234"}))["ok"]
+        assert (await fast({"op": "login", "account": "2001", "pin": "4321"}))["ok"]
+
+        held, release = threading.Event(), threading.Event()
+
+        def hold_ledger():
+            # Stands in for an admin check holding the ledger lock
+            with bank.transaction_log.locked():
+                held.set()
+                release.wait(5)
+        holder = threading.Thread(target=hold_ledger)
+        holder.start()
+        held.wait(5)
+        history = asyncio.create_task(slow({"op": "history"}))
+        began = time.monotonic()
+        reply = await asyncio.wait_for(fast({"op": "balance", "account": "2001"}), 2)
+        waited = time.monotonic() - began
+        release.set()
+        holder.join()
+        assert reply["ok"] and waited < 1
+        assert (await asyncio.wait_for(history, 5))["ok"]
+        for writer in (slow_writer, fast_writer):
+            writer.close()
+        server.cancel()
+    asyncio.run(scenario())
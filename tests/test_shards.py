@@ -0,0 +1,63 @@
+import pytest
+
+from bank.shards import ShardedEngine, _Shard, shard_for
+from bank.txtypes import TRANSFER_IN, TRANSFER_OUT, TRANSFER_OWN_IN, TRANSFER_OWN_OUT
+
+
+def _numbers_on(shard, shards, count, start=400000):
+    numbers = (str(n) for n in range(start, start + 1000))
+    return [n for n in numbers if shard_for(n, shards) == shard][:count]
+
+
+def test_transfer_rows_name_each_side_and_mark_own_transfers():
+    shard = _Shard()
+    shard.open("1001", "alice", 1000)
+    shard.open("1002", "alice", 1000)
+    shard.open("2001", "bob", 1000)
+    assert shard.transfer("1001", "2001", 100, 0)
+    assert shard.transfer("1001", "1002", 100, 0)
+    rows = [shard.ledger[i] for i in range(len(shard.ledger))]
+    assert [(r["account_number"], r["user"], r["type"]) for r in rows] == [
+        ("1001", "alice", TRANSFER_OUT.label),
+        ("2001", "bob", TRANSFER_IN.label),
+        ("1001", "alice", TRANSFER_OWN_OUT.label),
+        ("1002", "alice", TRANSFER_OWN_IN.label),
+    ]
+
+
+def test_amounts_must_be_multiples_of_five_cents():
+    shard = _Shard()
+    shard.open("1001", "alice", 1000)
+    shard.open("1002", "bob", 1000)
+    assert not shard.deposit("1001", 12)
+    assert not shard.withdraw("1001", 7)
+    assert not shard.transfer("1001", "1002", 3, 0)
+    assert not shard.prepare(1, "1001", -3)
+    assert shard.balances == {"1001": 1000, "1002": 1000}
+    assert len(shard.ledger) == 0
+
+
+@pytest.fixture
+def engine():
+    engine = ShardedEngine(2)
+    yield engine
+    engine.close()
+
+
+def test_cross_shard_own_transfer(engine):
+    a, b = _numbers_on(0, 2, 1)[0], _numbers_on(1, 2, 1)[0]
+    engine.open_account(a, "alice", 10)
+    engine.open_account(b, "alice", 0)
+    assert engine.run_batch([("transfer", a, b, 250, 0), ("transfer", a, b, 251, 0)]) == [True, False]
+    assert engine.balance(a).cents == 750 and engine.balance(b).cents == 250
+
+
+def test_failed_batch_releases_holds(engine):
+    a, b = _numbers_on(0, 2, 1)[0], _numbers_on(1, 2, 1)[0]
+    engine.open_account(a, "alice", 10)
+    engine.open_account(b, "bob", 0)
+    with pytest.raises(AttributeError):
+        engine.run_batch([("transfer", a, b, 1000, 0), ("no_such_op", b)])
+    # The prepared debit was aborted, so the whole balance can still move
+    assert engine.run_batch([("transfer", a, b, 1000, 0)]) == [True]
+    assert engine.total().cents == 1000
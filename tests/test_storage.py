@@ -0,0 +1,155 @@
+import shutil
+import threading
+
+from bank import storage as storage_module
+from bank.account import Account, User
+from bank.aggregates import Aggregates
+from bank.audit import AuditLog
+from bank.authentication import Authenticator
+from bank.engine import TransactionEngine
+from bank.ledger import Ledger
+from bank.limits import LimitTracker
+from bank.registry import build_registry
+from bank.service import BankService
+from bank.storage import Storage, scan_directory
+from bank.txtypes import WITHDRAWAL, for_label
+
+
+def open_bank(directory, engine=None, segment_rows=None):
+    # A service journalling to `directory`, recovered from whatever is there
+    alice, bob = User("alice"), User("bob")
+    alice.add_account(Account("1001", balance=500))
+    bob.add_account(Account("2001", balance=800))
+    users = {"alice": alice, "bob": bob}
+    registry = build_registry(users)
+    ledger, history, limits = Ledger(), AuditLog(), LimitTracker([])
+    engine = engine or TransactionEngine()
+    storage = Storage(str(directory), users, registry, ledger, history, limits, engine=engine,
+                      segment_rows=segment_rows)
+    storage.recover()
+    service = BankService(users, registry, Authenticator(users, registry), engine, ledger, history, limits,
+                          storage=storage)
+    return service, storage
+
+
+def test_scan_retries_when_a_checkpoint_removes_the_journal(tmp_path, monkeypatch):
+    service, storage = open_bank(tmp_path)
+    alice = service.users["alice"]
+    for _ in range(7):
+        service.deposit(alice, "1001", "0.25")
+    storage.checkpoint()
+    for _ in range(7):
+        service.deposit(alice, "1001", "0.25")
+
+    # A checkpoint lands between reading the snapshot and listing the journal
+    listings = []
+    segment_files = storage_module.segment_files
+
+    def racing(directory):
+        listings.append(directory)
+        if len(listings) == 1:
+            storage.checkpoint()  # Its own listing is the second call
+        return segment_files(directory)
+    monkeypatch.setattr(storage_module, "segment_files", racing)
+    balances, chunks = scan_directory(str(tmp_path))
+    assert sum(len(cols["ts"]) for cols in chunks) == 14
+    assert balances["1001"] == 50350
+    assert len(listings) > 2
+    storage.close()
+
+
+def test_recovery_after_a_crash_keeps_every_journalled_change(tmp_path):
+    service, storage = open_bank(tmp_path)
+    alice, bob = service.users["alice"], service.users["bob"]
+    service.deposit(alice, "1001", "0.25")
+    storage.checkpoint()
+    service.transfer(alice, "1001", "2001", "1.00")
+    service.withdraw(bob, "2001", "0.50")
+    # No close(): the process dies here, with the last records only in the journal
+    recovered, again = open_bank(tmp_path)
+    assert {acc.account_number: acc.balance.cents for _, acc in recovered.registry} == {"1001": 49925, "2001": 80050}
+    assert [recovered.ledger.raw(i) for i in range(len(recovered.ledger))] == [
+        service.ledger.raw(i) for i in range(len(service.ledger))]
+    again.close()
+    storage.close()
+
+
+def test_checkpoint_never_captures_half_a_transfer(tmp_path):
+    service, storage = open_bank(tmp_path)
+    alice = service.users["alice"]
+
+    # Pause a transfer after it moved the balances but before its ledger rows
+    # and journal record are written
+    entered, release = threading.Event(), threading.Event()
+    append = service.ledger.append
+
+    def paused(*args, **kwargs):
+        entered.set()
+        release.wait(5)
+        return append(*args, **kwargs)
+    service.ledger.append = paused
+    transfer = threading.Thread(target=service.transfer, args=(alice, "1001", "2001", "1.00"))
+    transfer.start()
+    entered.wait(5)
+    checkpoint = threading.Thread(target=storage.checkpoint)
+    checkpoint.start()
+    checkpoint.join(0.3)
+    # The process dies now: what is on disk must be balances and ledger rows
+    # that agree, either from before the transfer or from after it
+    shutil.copytree(tmp_path, tmp_path / "crash", ignore=shutil.ignore_patterns("crash"))
+    release.set()
+    transfer.join(5)
+    checkpoint.join(5)
+
+    crashed, crashed_storage = open_bank(tmp_path / "crash")
+    moved = {"1001": 0, "2001": 0}
+    for number, _, _, label, cents in map(crashed.ledger.raw, range(len(crashed.ledger))):
+        moved[number] += for_label(label).sign * cents
+    assert {acc.account_number: acc.balance.cents for _, acc in crashed.registry} == {
+        "1001": 50000 + moved["1001"], "2001": 80000 + moved["2001"]}
+    crashed_storage.close()
+    storage.close()
+
+
+def test_checkpoints_seal_full_segments_and_history_reads_them(tmp_path):
+    service, storage = open_bank(tmp_path, segment_rows=4)
+    alice, bob = service.users["alice"], service.users["bob"]
+    for i in range(5):
+        service.deposit(alice, "1001", "0.25")
+        service.transfer(alice, "1001", "2001", "1.00")
+        storage.checkpoint()
+    service.withdraw(bob, "2001", "0.50")
+    storage.checkpoint()
+    # 16 rows: 4 full segments, no partial one, the rest in the tail file
+    assert sorted(p.name for p in (tmp_path / "ledger").iterdir()) == [
+        "seg-000000000000.bin", "seg-000000000004.bin", "seg-000000000008.bin", "seg-000000000012.bin",
+        "tail.log"]
+    service.deposit(alice, "1001", "0.25")
+    storage.close()
+    _, chunks = scan_directory(str(tmp_path))
+    assert sum(len(cols["ts"]) for cols in chunks) == 17
+
+    recovered, again = open_bank(tmp_path, segment_rows=4)
+    ledger = recovered.ledger
+    assert ledger.base == 16 and len(ledger.store) == 1  # Only the tail is in memory
+    assert [ledger.raw(i) for i in range(len(ledger))] == [service.ledger.raw(i) for i in range(len(service.ledger))]
+    assert ledger.counts() == service.ledger.counts()
+    assert ledger.for_account("2001") == service.ledger.for_account("2001")
+    for numbers in (None, ["1001"], ["2001"]):
+        for limit in (1, 3, 50):
+            pages, cursor = [], None
+            while True:
+                page, cursor = recovered.history(numbers, cursor=cursor, limit=limit)
+                pages.extend(page)
+                if cursor is None:
+                    break
+            assert pages == service.history(numbers, limit=50)[0]
+    page, _ = recovered.history(types=[WITHDRAWAL])
+    assert [tx["amount"].cents for tx in page] == [50]
+    totals = []
+    for bank in (service, recovered):
+        aggregates = Aggregates()
+        aggregates.rebuild(bank.ledger, (acc for _, acc in bank.registry))
+        totals.append((aggregates.accounts, aggregates.days, aggregates.summary()))
+    assert totals[0] == totals[1]
+    again.close()
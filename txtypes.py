@@ -0,0 +1,106 @@
+import threading
+
+# Transaction classes used by the reports, by class code
+TX_CLASSES = ("Deposit", "Withdrawal", "Transfer", "Other")
+OTHER = 3
+
+
+class TxType:
+    # One kind of ledger row: its int8 code in the ledger, the label shown in
+    # history listings, its direction (+1 credit, -1 debit) and its class.
+    __slots__ = ("code", "label", "sign", "tx_class")
+
+    def __init__(self, code, label, sign, tx_class):
+        self.code = code
+        self.label = label
+        self.sign = sign
+        self.tx_class = tx_class
+
+    def __str__(self):
+        return self.label
+
+    def __repr__(self):
+        return f"TxType({self.code}, {self.label!r})"
+
+
+def classify_type(tx_type):
+    if "Deposit" in tx_type:
+        return "Deposit"
+    elif "Withdrawal" in tx_type:
+        return "Withdrawal"
+    elif "Transfer" in tx_type:
+        return "Transfer"
+    else:
+        return "Other"
+
+
+_by_code = [None]  # Code 0 is never assigned
+_by_label = {}
+_lock = threading.Lock()
+
+
+def _add(label):
+    sign = 1 if label.startswith("+") else -1 if label.startswith("-") else 0
+    tx_type = TxType(len(_by_code), label, sign, TX_CLASSES.index(classify_type(label)))
+    _by_code.append(tx_type)
+    _by_label[label] = tx_type
+    return tx_type
+
+
+DEPOSIT = _add("+Deposit")
+WITHDRAWAL = _add("-Withdrawal")
+TRANSFER_OWN_OUT = _add("-Transfer (own)")
+TRANSFER_OWN_IN = _add("+Transfer (own)")
+TRANSFER_OUT = _add("-Transfer (to other)")
+TRANSFER_IN = _add("+Transfer (from other)")
+
+
+def for_label(label):
+    # The registered type for a label; labels not seen before (e.g. from an
+    # import) get the next free code, classified once here.
+    tx_type = _by_label.get(label)
+    if tx_type is None:
+        with _lock:
+            tx_type = _by_label.get(label)
+            if tx_type is None:
+                if len(_by_code) > 127:
+                    raise ValueError("Too many transaction types for an int8 code.")
+                tx_type = _add(label)
+    return tx_type
+
+
+def for_code(code):
+    return _by_code[code]
+
+
+def of_class(tx_class):
+    # Every registered type in a class, by class name ("Deposit", ...)
+    index = TX_CLASSES.index(tx_class)
+    return [t for t in _by_code[1:] if t.tx_class == index]
+
+
+def registered():
+    # Every registered type, by code from 1
+    return list(_by_code[1:])
+
+
+def resolve(tx_type):
+    return tx_type if isinstance(tx_type, TxType) else for_label(tx_type)
+
+
+def sign_table():
+    # NumPy int64 array: code -> +1 / -1 / 0
+    import numpy as np
+    return np.array([0] + [t.sign for t in _by_code[1:]], dtype=np.int64)
+
+
+def class_table():
+    # NumPy int64 array: code -> index into TX_CLASSES
+    import numpy as np
+    return np.array([OTHER] + [t.tx_class for t in _by_code[1:]], dtype=np.int64)
+
+
+def label_table():
+    # NumPy object array: code -> label
+    import numpy as np
+    return np.array([""] + [t.label for t in _by_code[1:]], dtype=object)